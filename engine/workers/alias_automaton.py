@@ -0,0 +1,59 @@
+from collections import deque
+
+# Aho-Corasick automaton over token sequences (alias patterns). Every pattern
+# is found in one left-to-right pass over a verse's tokens, instead of one list
+# slice comparison per pattern and word position. Tokens are compared with ==
+# (dict lookups), like the slice comparison it replaces; duplicate patterns keep
+# separate payloads.
+
+
+class TokenAutomaton:
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.own = [[]]  # per state: (payload, length) of the patterns ending here
+        self.out = [[]]  # own + those of the failure chain (set by compile)
+        self.compiled = True
+
+    def add(self, tokens, payload) -> None:
+        state = 0
+        for tok in tokens:
+            nxt = self.goto[state].get(tok)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][tok] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.own.append([])
+            state = nxt
+        self.own[state].append((payload, len(tokens)))
+        self.compiled = False
+
+    def compile(self) -> "TokenAutomaton":
+        """Failure links, breadth first; each state also emits the outputs of its failure state."""
+        self.out = [list(o) for o in self.own]
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and tok not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(tok, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        self.compiled = True
+        return self
+
+    def find(self, tokens):
+        """Yields (payload, start index) for every occurrence of every pattern."""
+        if not self.compiled:
+            self.compile()
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, tok in enumerate(tokens):
+            while state and tok not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tok, 0)
+            for payload, length in out[state]:
+                yield payload, i - length + 1
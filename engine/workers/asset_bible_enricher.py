@@ -3,15 +3,24 @@ import asyncio
 import datetime
 import json
 import os
-import random
 import re
 import sys
 
 import aiohttp
 
+try:
+    from .story_store import load_story
+    from .circuit_breaker import CircuitBreakers, breaker_settings
+except ImportError:
+    from story_store import load_story
+    from circuit_breaker import CircuitBreakers, breaker_settings
+
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
 ENV_FILE = os.path.join(os.path.dirname(__file__), "..", "..", ".env")
+# Attempts per subject when the instance times out or drops the connection
+# (each attempt goes to a model whose circuit is not open).
+LLM_ATTEMPTS = 3
 
 
 def _load_env_file():
@@ -104,8 +113,7 @@ def load_story_data(path: str) -> list:
     if not path or not os.path.exists(path):
         return []
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_story(path, fields=["analysis_websearch"])
     except Exception:
         return []
 
@@ -365,7 +373,15 @@ def _is_stateful_url(url: str) -> bool:
     return "/api/v1/chat" in (url or "")
 
 
-async def call_lmstudio(session: aiohttp.ClientSession, url: str, token: str | None, model: str, prompt: str, max_tokens: int, temperature: float, semaphore: asyncio.Semaphore | None = None) -> str:
+async def _post_json(session: aiohttp.ClientSession, url: str, payload: dict, headers: dict) -> tuple[int, object, str]:
+    async with session.post(url, json=payload, headers=headers, timeout=180) as resp:
+        try:
+            return resp.status, await resp.json(), ""
+        except aiohttp.ContentTypeError:
+            return resp.status, None, await resp.text()
+
+
+async def call_lmstudio(session: aiohttp.ClientSession, url: str, token: str | None, model: str, prompt: str, max_tokens: int, temperature: float, semaphore: asyncio.Semaphore | None = None, breakers: CircuitBreakers | None = None) -> str:
     headers = {"Content-Type": "application/json"}
     if token:
         headers["Authorization"] = f"Bearer {token}"
@@ -387,32 +403,27 @@ async def call_lmstudio(session: aiohttp.ClientSession, url: str, token: str | N
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
-    if semaphore is None:
-        async with session.post(url, json=payload, headers=headers, timeout=180) as resp:
-            try:
-                data = await resp.json()
-            except aiohttp.ContentTypeError:
-                text = await resp.text()
-                print(f"[asset_bible_enricher] HTTP {resp.status} non-JSON response from {url} (first 400 chars):")
-                print(text[:400])
-                # Fallback to stateful endpoint if completions URL is wrong for LM Studio
-                if "/v1/chat/completions" in url:
-                    fallback_url = url.replace("/v1/chat/completions", "/api/v1/chat")
-                    return await call_lmstudio(session, fallback_url, token, model, prompt, max_tokens, temperature, semaphore)
-                return ""
-    else:
-        async with semaphore:
-            async with session.post(url, json=payload, headers=headers, timeout=180) as resp:
-                try:
-                    data = await resp.json()
-                except aiohttp.ContentTypeError:
-                    text = await resp.text()
-                    print(f"[asset_bible_enricher] HTTP {resp.status} non-JSON response from {url} (first 400 chars):")
-                    print(text[:400])
-                    if "/v1/chat/completions" in url:
-                        fallback_url = url.replace("/v1/chat/completions", "/api/v1/chat")
-                        return await call_lmstudio(session, fallback_url, token, model, prompt, max_tokens, temperature, semaphore)
-                    return ""
+    try:
+        if semaphore is None:
+            status, data, text = await _post_json(session, url, payload, headers)
+        else:
+            async with semaphore:
+                status, data, text = await _post_json(session, url, payload, headers)
+    except (asyncio.TimeoutError, aiohttp.ClientError):
+        if breakers is not None:
+            breakers.record(model, True)
+        raise
+    if breakers is not None:
+        # 404 = model unloaded, 5xx = broken instance; anything else proves it is up.
+        breakers.record(model, status == 404 or status >= 500)
+    if data is None:
+        print(f"[asset_bible_enricher] HTTP {status} non-JSON response from {url} (first 400 chars):")
+        print(text[:400])
+        # Fallback to stateful endpoint if completions URL is wrong for LM Studio
+        if "/v1/chat/completions" in url:
+            fallback_url = url.replace("/v1/chat/completions", "/api/v1/chat")
+            return await call_lmstudio(session, fallback_url, token, model, prompt, max_tokens, temperature, semaphore, breakers)
+        return ""
     if not isinstance(data, dict):
         return ""
     if _is_stateful_url(url):
@@ -448,6 +459,7 @@ async def main_async(args):
     token = os.environ.get("LMSTUDIO_API_TOKEN") or os.environ.get("LM_API_TOKEN")
     max_concurrent_per_model = int(config.get("api", {}).get("max_concurrent_per_model", 4) or 4)
     semaphores = {m: asyncio.Semaphore(max_concurrent_per_model) for m in models if m}
+    breakers = CircuitBreakers(models, breaker_settings(config.get("api", {})), log=lambda msg: print(f"[asset_bible_enricher] {msg}"))
 
     story_data = load_story_data(args.data_file)
     web_map = load_websearch_map(story_data)
@@ -526,9 +538,16 @@ async def main_async(args):
                     for lid in linked:
                         web_items.extend(web_map_de.get(lid, []))
                 prompt = build_prompt(subject, web_items, args.max_summary_chars)
-                chosen_model = args.model or random.choice(models)
-                sem = semaphores.get(chosen_model)
-                response = await call_lmstudio(session, lm_url, token, chosen_model, prompt, args.max_output_tokens, args.temperature, sem)
+                response = ""
+                for attempt in range(LLM_ATTEMPTS):
+                    # Skips models whose circuit is open (waits while all of them are).
+                    chosen_model = await breakers.choose([args.model] if args.model else models)
+                    sem = semaphores.get(chosen_model)
+                    try:
+                        response = await call_lmstudio(session, lm_url, token, chosen_model, prompt, args.max_output_tokens, args.temperature, sem, breakers)
+                        break
+                    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                        print(f"[asset_bible_enricher] {sid} [{chosen_model}] attempt {attempt + 1}/{LLM_ATTEMPTS} failed: {e or type(e).__name__}")
 
                 card = None
                 if response:
@@ -591,6 +610,8 @@ async def main_async(args):
     for _ in range(parallel):
         workers.append(asyncio.create_task(worker()))
     await asyncio.gather(*workers)
+    if breakers.settings["enabled"]:
+        print(f"[asset_bible_enricher] Circuits: {breakers.summary()}")
     return 0
 
 
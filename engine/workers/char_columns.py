@@ -0,0 +1,147 @@
+from collections.abc import Sequence
+
+# Columnar in-memory form of the per-character structures of a verse.
+# IDs are contiguous per verse (1..len(text)) and per word, so
+#   base_chars  -> BaseChars(text, start)      instead of one dict per character
+#   char_ids    -> CharIdRange(start, stop)    instead of one int per character
+# Both behave like the old lists for reading (len, index, iteration, min/max,
+# equality with plain lists) and are expanded back to the legacy shape when
+# serialized (pass to_json as `default` to json.dumps / json_stream).
+
+
+class BaseChars(Sequence):
+    __slots__ = ("text", "start")
+
+    def __init__(self, text: str, start: int = 1):
+        self.text = text
+        self.start = start
+
+    def __len__(self):
+        return len(self.text)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.text)))]
+        if index < 0:
+            index += len(self.text)
+        return {"id": self.start + index, "char": self.text[index]}
+
+    def __iter__(self):
+        cid = self.start
+        for char in self.text:
+            yield {"id": cid, "char": char}
+            cid += 1
+
+    def __eq__(self, other):
+        if isinstance(other, BaseChars):
+            return self.text == other.text and self.start == other.start
+        if isinstance(other, list):
+            return len(other) == len(self.text) and list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"BaseChars({self.text!r}, start={self.start})"
+
+    def to_list(self) -> list[dict]:
+        return list(self)
+
+
+class CharIdRange(Sequence):
+    __slots__ = ("first", "stop")
+
+    def __init__(self, first: int, stop: int):
+        self.first = first
+        self.stop = stop
+
+    def _range(self) -> range:
+        return range(self.first, self.stop)
+
+    def __len__(self):
+        return max(0, self.stop - self.first)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._range()[index])
+        return self._range()[index]
+
+    def __iter__(self):
+        return iter(self._range())
+
+    def __contains__(self, value):
+        return value in self._range()
+
+    def __eq__(self, other):
+        if isinstance(other, CharIdRange):
+            return self._range() == other._range()
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self) and list(self._range()) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CharIdRange({self.first}, {self.stop})"
+
+    def to_list(self) -> list[int]:
+        return list(self._range())
+
+
+def to_json(obj):
+    """`default` hook: expands columnar views into the legacy JSON shape."""
+    if isinstance(obj, (BaseChars, CharIdRange)):
+        return obj.to_list()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def pack_base_chars(base_chars):
+    """List of {"id", "char"} -> BaseChars when IDs are contiguous, else unchanged."""
+    if isinstance(base_chars, BaseChars) or not isinstance(base_chars, list) or not base_chars:
+        return base_chars
+    chars = []
+    start = None
+    expected = None
+    for item in base_chars:
+        if not isinstance(item, dict) or len(item) != 2:
+            return base_chars
+        cid = item.get("id")
+        char = item.get("char")
+        if type(cid) is not int or not isinstance(char, str) or len(char) != 1:
+            return base_chars
+        if start is None:
+            start = expected = cid
+        if cid != expected:
+            return base_chars
+        chars.append(char)
+        expected += 1
+    return BaseChars("".join(chars), start)
+
+
+def pack_char_ids(char_ids):
+    """[n, n+1, ...] -> CharIdRange, else unchanged."""
+    if isinstance(char_ids, CharIdRange) or not isinstance(char_ids, list) or not char_ids:
+        return char_ids
+    first = char_ids[0]
+    if type(first) is not int:
+        return char_ids
+    for offset, cid in enumerate(char_ids):
+        if type(cid) is not int or cid != first + offset:
+            return char_ids
+    return CharIdRange(first, first + len(char_ids))
+
+
+def pack_verse(verse: dict) -> dict:
+    """Switches base_chars and word char_ids of a verse to the columnar form (in place)."""
+    if "base_chars" in verse:
+        verse["base_chars"] = pack_base_chars(verse["base_chars"])
+    for w in verse.get("words") or []:
+        if isinstance(w, dict) and "char_ids" in w:
+            w["char_ids"] = pack_char_ids(w["char_ids"])
+    return verse
+
+
+def unpack_verse(verse: dict) -> dict:
+    """Inverse of pack_verse (in place), for code that needs plain lists."""
+    if isinstance(verse.get("base_chars"), BaseChars):
+        verse["base_chars"] = verse["base_chars"].to_list()
+    for w in verse.get("words") or []:
+        if isinstance(w, dict) and isinstance(w.get("char_ids"), CharIdRange):
+            w["char_ids"] = w["char_ids"].to_list()
+    return verse
@@ -0,0 +1,340 @@
+import json
+import os
+import gzip
+import mmap
+import hashlib
+import argparse
+import datetime
+
+try:
+    from .story_index import load_index
+    from .story_store import delta_path, wal_path, clear_deltas
+except ImportError:
+    from story_index import load_index
+    from story_store import delta_path, wal_path, clear_deltas
+
+# Deduplicated checkpoint store for story_data.json (replaces timestamped .bak copies).
+#
+#   <dir>/objects/ab/abcdef....gz          gzip blobs, addressed by sha1 of the raw bytes
+#   <dir>/manifests/<data-name>/<id>.json  one manifest per checkpoint
+#
+# A checkpoint stores every verse of the file as its own blob (byte slice from
+# the offset index) plus the pending delta log/WAL, so a new checkpoint only writes
+# the verses that changed since any earlier one. Files that cannot be indexed
+# are stored as a single blob.
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
+MANIFEST_VERSION = 1
+DEFAULT_DIR = os.path.join("..", "..", "backups", "checkpoints")
+
+
+def load_config():
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _settings() -> dict:
+    try:
+        cfg = load_config().get("checkpoints", {})
+    except (OSError, ValueError):
+        cfg = {}
+    root = cfg.get("dir", DEFAULT_DIR)
+    if not os.path.isabs(root):
+        root = os.path.normpath(os.path.join(os.path.dirname(__file__), root))
+    return {
+        "enabled": bool(cfg.get("enabled", True)),
+        "dir": root,
+        "keep_last": int(cfg.get("keep_last", 10)),
+        "keep_daily": int(cfg.get("keep_daily", 7)),
+    }
+
+
+def _store_name(data_file: str) -> str:
+    path = os.path.abspath(data_file)
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+    return f"{os.path.basename(path)}-{digest}"
+
+
+def _manifest_dir(root: str, data_file: str) -> str:
+    return os.path.join(root, "manifests", _store_name(data_file))
+
+
+def _object_path(root: str, digest: str) -> str:
+    return os.path.join(root, "objects", digest[:2], f"{digest}.gz")
+
+
+def _put_object(root: str, raw: bytes, stats: dict) -> str:
+    digest = hashlib.sha1(raw).hexdigest()
+    path = _object_path(root, digest)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    packed = gzip.compress(raw, compresslevel=6)
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(packed)
+    os.replace(temp, path)
+    stats["new_objects"] += 1
+    stats["bytes_written"] += len(packed)
+    return digest
+
+
+def _get_object(root: str, digest: str) -> bytes:
+    with open(_object_path(root, digest), "rb") as f:
+        return gzip.decompress(f.read())
+
+
+def _file_sig(data_file: str) -> list[int]:
+    st = os.stat(data_file)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def list_checkpoints(data_file: str, root: str | None = None) -> list[dict]:
+    """Manifests of data_file, oldest first."""
+    root = root or _settings()["dir"]
+    mdir = _manifest_dir(root, data_file)
+    if not os.path.isdir(mdir):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(mdir)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(mdir, name), "r", encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return manifests
+
+
+def _split_layout(data_file: str, root: str, stats: dict) -> dict:
+    """Stores the file as prefix + sep.join(verses) + suffix when the layout allows it."""
+    verses = load_index(data_file)
+    with open(data_file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {"blob": _put_object(root, b"", stats)}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if verses:
+                seps = {mm[a["end"]:b["start"]] for a, b in zip(verses, verses[1:])}
+                if len(seps) <= 1:
+                    return {
+                        "prefix": mm[:verses[0]["start"]].decode("utf-8"),
+                        "sep": (seps.pop() if seps else b"").decode("utf-8"),
+                        "suffix": mm[verses[-1]["end"]:].decode("utf-8"),
+                        "verses": [_put_object(root, mm[e["start"]:e["end"]], stats) for e in verses],
+                    }
+            return {"blob": _put_object(root, mm[:], stats)}
+
+
+def create_checkpoint(data_file: str, label: str = "", prune: bool = True) -> dict | None:
+    """
+    Snapshots data_file (+ pending deltas). Returns the manifest, or None when
+    checkpoints are disabled. Unchanged verses are shared with older checkpoints.
+    """
+    cfg = _settings()
+    if not cfg["enabled"] or not os.path.exists(data_file):
+        return None
+    root = cfg["dir"]
+    stats = {"new_objects": 0, "bytes_written": 0}
+
+    sig = _file_sig(data_file)
+    previous = list_checkpoints(data_file, root)
+    last = previous[-1] if previous else None
+    if last and last.get("sig") == sig and last.get("layout"):
+        # File untouched since the last checkpoint (only deltas may differ).
+        layout = last["layout"]
+    else:
+        layout = _split_layout(data_file, root, stats)
+
+    pending = {}
+    for key, path in (("deltas", delta_path(data_file)), ("wal", wal_path(data_file))):
+        pending[key] = None
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                pending[key] = _put_object(root, f.read(), stats)
+
+    now = datetime.datetime.now()
+    cp_id = now.strftime("%Y%m%d_%H%M%S_%f")
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "id": cp_id,
+        "created_at": now.isoformat(timespec="seconds"),
+        "label": label,
+        "data_file": os.path.abspath(data_file),
+        "sig": sig,
+        "layout": layout,
+        "deltas": pending["deltas"],
+        "wal": pending["wal"],
+        "stats": stats,
+    }
+    mdir = _manifest_dir(root, data_file)
+    os.makedirs(mdir, exist_ok=True)
+    with open(os.path.join(mdir, f"{cp_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    if prune:
+        prune_checkpoints(data_file, cfg["keep_last"], cfg["keep_daily"])
+    return manifest
+
+
+def _find(data_file: str, cp_id: str | None, root: str) -> dict | None:
+    manifests = list_checkpoints(data_file, root)
+    if not manifests:
+        return None
+    if not cp_id:
+        return manifests[-1]
+    matches = [m for m in manifests if m.get("id", "").startswith(cp_id)]
+    return matches[-1] if matches else None
+
+
+def restore_checkpoint(data_file: str, cp_id: str | None = None, out_file: str | None = None) -> dict | None:
+    """
+    Rebuilds data_file (or out_file) from a checkpoint (default: latest).
+    Restoring in place snapshots the current state first.
+    """
+    root = _settings()["dir"]
+    manifest = _find(data_file, cp_id, root)
+    if not manifest:
+        return None
+    target = out_file or data_file
+    if target == data_file and os.path.exists(data_file):
+        create_checkpoint(data_file, label=f"before-restore:{manifest['id']}", prune=False)
+
+    layout = manifest["layout"]
+    temp = target + ".tmp"
+    with open(temp, "wb") as f:
+        if "blob" in layout:
+            f.write(_get_object(root, layout["blob"]))
+        else:
+            sep = layout["sep"].encode("utf-8")
+            f.write(layout["prefix"].encode("utf-8"))
+            for i, digest in enumerate(layout["verses"]):
+                if i:
+                    f.write(sep)
+                f.write(_get_object(root, digest))
+            f.write(layout["suffix"].encode("utf-8"))
+    os.replace(temp, target)
+
+    clear_deltas(target)
+    for key, path in (("deltas", delta_path(target)), ("wal", wal_path(target))):
+        if manifest.get(key):
+            with open(path, "wb") as f:
+                f.write(_get_object(root, manifest[key]))
+    return manifest
+
+
+def _referenced_objects(root: str) -> set[str]:
+    refs = set()
+    base = os.path.join(root, "manifests")
+    if not os.path.isdir(base):
+        return refs
+    for dirpath, _, files in os.walk(base):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(dirpath, name), "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            layout = manifest.get("layout") or {}
+            if layout.get("blob"):
+                refs.add(layout["blob"])
+            refs.update(layout.get("verses") or [])
+            for key in ("deltas", "wal"):
+                if manifest.get(key):
+                    refs.add(manifest[key])
+    return refs
+
+
+def prune_checkpoints(data_file: str, keep_last: int, keep_daily: int) -> dict:
+    """
+    Retention: the newest keep_last checkpoints plus the newest checkpoint of each
+    of the last keep_daily days survive. Unreferenced blobs are deleted.
+    """
+    root = _settings()["dir"]
+    manifests = list_checkpoints(data_file, root)
+    keep = {m["id"] for m in manifests[-keep_last:]} if keep_last > 0 else set()
+    if keep_daily > 0:
+        newest_per_day = {}
+        for m in manifests:
+            newest_per_day[m["id"][:8]] = m["id"]
+        for day in sorted(newest_per_day)[-keep_daily:]:
+            keep.add(newest_per_day[day])
+
+    mdir = _manifest_dir(root, data_file)
+    removed = 0
+    for m in manifests:
+        if m["id"] in keep:
+            continue
+        try:
+            os.remove(os.path.join(mdir, f"{m['id']}.json"))
+            removed += 1
+        except OSError:
+            pass
+
+    freed = 0
+    if removed:
+        refs = _referenced_objects(root)
+        objects_dir = os.path.join(root, "objects")
+        for dirpath, _, files in os.walk(objects_dir):
+            for name in files:
+                if name.endswith(".gz") and name[:-3] not in refs:
+                    os.remove(os.path.join(dirpath, name))
+                    freed += 1
+    return {"removed": removed, "kept": len(manifests) - removed, "objects_freed": freed}
+
+
+def describe(manifest: dict) -> str:
+    stats = manifest.get("stats") or {}
+    layout = manifest.get("layout") or {}
+    verses = len(layout.get("verses") or [])
+    return (
+        f"{manifest.get('id')} | {manifest.get('created_at')} | {manifest.get('label') or '-'} | "
+        f"verses={verses} new_objects={stats.get('new_objects', 0)} "
+        f"written={stats.get('bytes_written', 0) // 1024} KB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicated checkpoints of story_data.json")
+    parser.add_argument("command", choices=["list", "create", "restore", "prune"], help="Checkpoint action")
+    parser.add_argument("--data-file", action="append", dest="data_files", help="Override story_data.json path (repeatable)")
+    parser.add_argument("--id", dest="cp_id", help="Checkpoint id (prefix) for restore (default: latest)")
+    parser.add_argument("--out", help="Restore into this path instead of the data file")
+    parser.add_argument("--label", default="manual", help="Label for create")
+    parser.add_argument("--keep-last", type=int, help="Override checkpoints.keep_last for prune")
+    parser.add_argument("--keep-daily", type=int, help="Override checkpoints.keep_daily for prune")
+    args = parser.parse_args()
+
+    config = load_config()
+    cfg = _settings()
+    default_data = os.path.join(os.path.dirname(__file__), config["files"]["data_file"])
+    data_files = args.data_files if args.data_files else [default_data]
+
+    for data_file in data_files:
+        if args.command == "list":
+            manifests = list_checkpoints(data_file)
+            print(f"{data_file}: {len(manifests)} checkpoints")
+            for m in manifests:
+                print(f"  {describe(m)}")
+        elif args.command == "create":
+            if not os.path.exists(data_file):
+                print(f"Data file not found: {data_file}")
+                continue
+            manifest = create_checkpoint(data_file, label=args.label)
+            print(f"📦 Created Checkpoint: {describe(manifest)}" if manifest else "Checkpoints disabled in config.")
+        elif args.command == "restore":
+            manifest = restore_checkpoint(data_file, args.cp_id, args.out)
+            if not manifest:
+                print(f"No checkpoint found for {data_file}")
+                continue
+            print(f"♻️ Restored {args.out or data_file} from {manifest['id']}")
+        else:
+            keep_last = args.keep_last if args.keep_last is not None else cfg["keep_last"]
+            keep_daily = args.keep_daily if args.keep_daily is not None else cfg["keep_daily"]
+            result = prune_checkpoints(data_file, keep_last, keep_daily)
+            print(f"{data_file}: removed={result['removed']} kept={result['kept']} objects_freed={result['objects_freed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import time
+
+# Circuit breaker per LM Studio model identifier.
+#   closed     normal traffic; `failure_threshold` consecutive instance failures
+#              (timeouts, 404 model unloaded, 5xx, connection errors) open it
+#   open       no traffic for `recovery_time` seconds (doubling on every failed
+#              probe, capped at `max_recovery_time`)
+#   half_open  up to `half_open_probes` requests go through; a success closes
+#              the circuit, a failure opens it again
+# Answers that prove the instance is up (200, 400 context errors, parse errors)
+# count as success. Callers route around models whose circuit is open.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def breaker_settings(api_cfg: dict) -> dict:
+    cfg = api_cfg.get("circuit_breaker", {}) or {}
+    return {
+        "enabled": bool(cfg.get("enabled", True)),
+        "failure_threshold": max(1, int(cfg.get("failure_threshold", 5))),
+        "recovery_time": float(cfg.get("recovery_time", 30)),
+        "max_recovery_time": float(cfg.get("max_recovery_time", 300)),
+        "half_open_probes": max(1, int(cfg.get("half_open_probes", 1))),
+    }
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, settings: dict, log=None):
+        self.name = name
+        self.settings = settings
+        self.log = log or print
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = settings["recovery_time"]
+        self.probes = 0
+        self.trips = 0
+
+    def retry_in(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_for - time.monotonic())
+
+    def available(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self.retry_in() <= 0
+        return self.probes < self.settings["half_open_probes"]
+
+    def dispatch(self) -> None:
+        """Called when a request is actually sent to this model."""
+        if self.state == OPEN and self.retry_in() <= 0:
+            self.state = HALF_OPEN
+            self.probes = 0
+            self.log(f"🔌 Circuit HALF-OPEN [{self.name}]: probing")
+        if self.state == HALF_OPEN:
+            self.probes += 1
+
+    def _open(self, reason: str) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probes = 0
+        self.trips += 1
+        self.log(f"⚡ Circuit OPEN [{self.name}] ({reason}); retry in {self.open_for:g}s")
+
+    def success(self) -> None:
+        if self.state == HALF_OPEN:
+            self.log(f"✅ Circuit CLOSED [{self.name}]")
+        self.state = CLOSED
+        self.failures = 0
+        self.probes = 0
+        self.open_for = self.settings["recovery_time"]
+
+    def failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self.open_for = min(self.settings["max_recovery_time"], self.open_for * 2)
+            self._open("probe failed")
+            return
+        if self.state == OPEN:
+            return
+        self.failures += 1
+        if self.failures >= self.settings["failure_threshold"]:
+            self._open(f"{self.failures} consecutive failures")
+
+
+class CircuitBreakers:
+    """One breaker per model; disabled breakers always report the model as available."""
+
+    def __init__(self, models: list[str], settings: dict, log=None):
+        self.settings = settings
+        self.log = log or print
+        self.breakers = {m: CircuitBreaker(m, settings, self.log) for m in models}
+
+    def get(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(model, self.settings, self.log)
+        return self.breakers[model]
+
+    def available(self, model: str) -> bool:
+        return not self.settings["enabled"] or self.get(model).available()
+
+    def usable(self, models: list[str]) -> list[str]:
+        return [m for m in models if self.available(m)]
+
+    def retry_in(self, models: list[str]) -> float:
+        """Seconds until the first of `models` accepts traffic again (0 if one already does)."""
+        if not models or self.usable(models):
+            return 0.0
+        return min(self.get(m).retry_in() for m in models)
+
+    def dispatch(self, model: str) -> None:
+        if self.settings["enabled"]:
+            self.get(model).dispatch()
+
+    def record(self, model: str, failed: bool) -> None:
+        if not self.settings["enabled"]:
+            return
+        if failed:
+            self.get(model).failure()
+        else:
+            self.get(model).success()
+
+    async def choose(self, models: list[str]) -> str:
+        """Random model among those with a closed/probing circuit; waits while all are open."""
+        while True:
+            usable = self.usable(models)
+            if usable:
+                model = random.choice(usable)
+                self.dispatch(model)
+                return model
+            await asyncio.sleep(max(0.2, min(self.retry_in(models), 5.0)))
+
+    def summary(self) -> str:
+        return " | ".join(
+            f"{m}: {b.state} trips={b.trips}" for m, b in self.breakers.items()
+        )
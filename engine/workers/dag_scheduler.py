@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import time
+
+try:
+    from . import stage_registry
+except ImportError:
+    import stage_registry
+
+# Executes a stage_registry.Plan as a task graph.
+#   task   one verse x stage; waits for the same verse's planned input stages
+#   gate   story-scope stages only: waits for every planned task of the input
+#          stages, then runs prepare(stage) (registry build, context map)
+#   final  story-scope stages only: waits for every task of the stage, then runs
+#          finalize(stage) (occurrences, asset bible)
+# Ready tasks go to one queue per kind (llm / local / io) with its own worker
+# pool, so independent branches (translation vs entities -> websearch) and local
+# and LLM work run at the same time. Deeper stages are taken first: a verse's
+# chained follow-up runs soon after its previous stage.
+
+
+class _Node:
+    __slots__ = ("stage", "verse", "role", "level", "seq", "waiting", "dependents")
+
+    def __init__(self, stage: str, verse, role: str, level: int, seq: int):
+        self.stage = stage
+        self.verse = verse
+        self.role = role
+        self.level = level
+        self.seq = seq
+        self.waiting = 0
+        self.dependents = []
+
+
+def _link(before: _Node, after: _Node) -> None:
+    before.dependents.append(after)
+    after.waiting += 1
+
+
+class DagScheduler:
+    def __init__(self, plan, run_task, workers: dict | None = None, prepare=None, finalize=None,
+                 on_done=None, log=None):
+        """
+        run_task(verse, stage) -> bool (result produced) runs one task; prepare /
+        finalize(stage) are optional coroutines for story-scope stages; on_done(verse)
+        is awaited after every task (persistence). `workers` maps kind -> pool size.
+        """
+        self.plan = plan
+        self.run_task = run_task
+        self.prepare = prepare
+        self.finalize = finalize
+        self.on_done = on_done
+        self.log = log or print
+        self.workers = dict(workers or {})
+        self.queues = {}
+        self.counter = itertools.count()
+        self.remaining = 0
+        self.running = {}
+        self.peak_parallel = 0
+        self.stats = {s: {"ok": 0, "empty": 0, "failed": 0, "seconds": 0.0} for s in plan.active_stages()}
+        self.roots = self._build()
+
+    def _kind(self, stage: str) -> str:
+        return stage_registry.kind(stage, self.plan.modes.get(stage))
+
+    def _build(self) -> list[_Node]:
+        active = self.plan.active_stages()
+        depth = stage_registry.levels(active)
+        tasks = {}
+        gates = {}
+        finals = {}
+        nodes = []
+        index = {id(v): i for i, v in enumerate(self.plan.verses)}
+        for stage in active:
+            story = stage_registry.STAGES[stage]["scope"] == "story"
+            if story:
+                gates[stage] = _Node(stage, None, "gate", depth[stage], -1)
+                finals[stage] = _Node(stage, None, "final", depth[stage], -1)
+                nodes += [gates[stage], finals[stage]]
+            deps = [d for d in stage_registry.inputs(stage) if d in depth]
+            if story:
+                for dep in deps:
+                    if dep in finals:
+                        _link(finals[dep], gates[stage])
+                    else:
+                        for node in tasks[dep].values():
+                            _link(node, gates[stage])
+            tasks[stage] = {}
+            for verse in self.plan.tasks[stage]:
+                node = _Node(stage, verse, "task", depth[stage], index[id(verse)])
+                tasks[stage][id(verse)] = node
+                nodes.append(node)
+                if story:
+                    _link(gates[stage], node)
+                    _link(node, finals[stage])
+                for dep in deps:
+                    if dep in finals:
+                        if not story:
+                            _link(finals[dep], node)
+                    elif id(verse) in tasks[dep]:
+                        _link(tasks[dep][id(verse)], node)
+        self.remaining = len(nodes)
+        return [n for n in nodes if n.waiting == 0]
+
+    def _ready(self, node: _Node) -> None:
+        if node.role != "task":
+            asyncio.get_running_loop().create_task(self._run_control(node))
+            return
+        kind = self._kind(node.stage)
+        self.queues[kind].put_nowait((-node.level, node.seq, next(self.counter), node))
+
+    async def _run_control(self, node: _Node) -> None:
+        hook = self.prepare if node.role == "gate" else self.finalize
+        if hook is not None:
+            try:
+                await hook(node.stage)
+            except Exception as e:
+                self.log(f"⚠️ {node.role} {node.stage} failed: {e}")
+        self._complete(node)
+
+    def _complete(self, node: _Node) -> None:
+        for after in node.dependents:
+            after.waiting -= 1
+            if after.waiting == 0:
+                self._ready(after)
+        self.remaining -= 1
+        if self.remaining == 0:
+            for kind, queue in self.queues.items():
+                for _ in range(self.workers[kind]):
+                    queue.put_nowait((float("inf"), 0, next(self.counter), None))
+
+    async def _worker(self, kind: str) -> None:
+        queue = self.queues[kind]
+        while True:
+            _, _, _, node = await queue.get()
+            if node is None:
+                return
+            stage = node.stage
+            self.running[stage] = self.running.get(stage, 0) + 1
+            self.peak_parallel = max(self.peak_parallel, sum(1 for n in self.running.values() if n))
+            started = time.monotonic()
+            outcome = "failed"
+            try:
+                outcome = "ok" if await self.run_task(node.verse, stage) else "empty"
+            except Exception as e:
+                self.log(f"⚠️ {stage} failed for {node.verse.get('verse_id', 'unknown')}: {e}")
+            self.running[stage] -= 1
+            self.stats[stage][outcome] += 1
+            self.stats[stage]["seconds"] += time.monotonic() - started
+            if self.on_done is not None:
+                await self.on_done(node.verse)
+            self._complete(node)
+
+    async def run(self) -> dict:
+        if not self.remaining:
+            return self.stats
+        kinds = {self._kind(s) for s in self.plan.active_stages()}
+        for kind in kinds:
+            self.workers[kind] = max(1, int(self.workers.get(kind, 1)))
+            self.queues[kind] = asyncio.PriorityQueue()
+        for node in self.roots:
+            self._ready(node)
+        await asyncio.gather(*(self._worker(kind) for kind in kinds for _ in range(self.workers[kind])))
+        return self.stats
+
+    def summary(self) -> str:
+        parts = []
+        for stage, st in self.stats.items():
+            part = f"{stage}: ok={st['ok']}"
+            if st["empty"]:
+                part += f" empty={st['empty']}"
+            if st["failed"]:
+                part += f" failed={st['failed']}"
+            parts.append(part + f" busy={st['seconds']:.1f}s")
+        return " | ".join(parts) + f" | peak parallel stages={self.peak_parallel}"
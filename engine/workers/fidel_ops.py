@@ -1,4 +1,15 @@
 # fidel_ops.py
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from .lexicon_index import LexiconIndex, load_lexicon
+    from .lexicon_store import LexiconStore, is_lexicon_db, DEFAULT_CACHE_SIZE, DEFAULT_MMAP_MB
+except ImportError:
+    from lexicon_index import LexiconIndex, load_lexicon
+    from lexicon_store import LexiconStore, is_lexicon_db, DEFAULT_CACHE_SIZE, DEFAULT_MMAP_MB
 
 # -----------------------------------------------------------------------------
 # GE'EZ SUFFIX MATHEMATICS (Constraints for the Model)
@@ -16,7 +27,8 @@ GEZ_SUFFIX_MATH = {
 # -----------------------------------------------------------------------------
 # ROOT LOOKUP (Simulation of Vocabulary DB)
 # -----------------------------------------------------------------------------
-# In a real scenario, this would be a large JSON or SQLite lookup.
+# A real lexicon is a JSON file or an indexed SQLite database (config "lexicon",
+# see LEXICON INDEX below); these inline tables are the defaults.
 # Root DB uses normalized (1st order) Ge'ez keys.
 ROOT_DB = {
     "ቀለ": {"root": "Q-L", "greek_anchor": "λόγος (logos)", "gloss": "word | voice | message"},
@@ -95,30 +107,38 @@ SUFFIX_RULES = {
     7: {"syntax_role": "OBJECT_SUFFIX", "asset_rule": "Verb object"},
 }
 
+# -----------------------------------------------------------------------------
+# FIDEL TABLES (precomputed over the Ethiopic block)
+# -----------------------------------------------------------------------------
+# Ge'ez syllables are often blocks of 8 (including 2 special). Common Syllables:
+# 1: ä, 2: u, 3: i, 4: a, 5: e, 6: ə, 7: o
+# U+1200 matches HA (1). U+1201 HU (2)...
+# CAUTION: Not all blocks are 8 chars long strictly, but many are.
+# This is strictly a helper for the "Compiler" effect demonstration.
+FIDEL_ORDER = {
+    chr(code): (code - 0x1200) % 8 + 1
+    for code in range(0x1200, 0x137D)
+    if (code - 0x1200) % 8 < 7
+}
+# Syllables U+1200..U+135A -> the 1st order of their block (str.translate table).
+ROOT_KEY_TABLE = {
+    code: chr(code - (code - 0x1200) % 8)
+    for code in range(0x1200, 0x135B)
+    if (code - 0x1200) % 8
+}
+_BATCH_SEP = "\x1f"
+
 def get_fidel_order(char):
     """
-    Returns the order (1-7) of a Ge'ez character.
+    Returns the order (1-7) of a Ge'ez character, 0 for non-syllables.
     This is a simplified heuristic. A full implementation would need a comprehensive map.
     """
-    # Basic heuristic: Ge'ez syllables are often blocks of 8 (including 2 special).
-    # Common Syllables:
-    # 1: ä, 2: u, 3: i, 4: a, 5: e, 6: ə, 7: o
-    # We can try to deduce from unicode, but for the "Linguistic Compiler" demo,
-    # we might just simulate or handle specific ranges.
-    
-    # For now, let's just return a placeholder or simple logic if feasible.
-    # U+1200 matches HA (1). U+1201 HU (2)...
-    
-    val = ord(char)
-    if 0x1200 <= val <= 0x137C: 
-        # CAUTION: Not all blocks are 8 chars long strictly, but many are.
-        # This is strictly a helper for the "Compiler" effect demonstration.
-        offset = (val - 0x1200) % 8
-        if offset < 7:
-            return offset + 1
-            
-    # Default to 0 or 'unknown' for non-syllables
-    return 0
+    return FIDEL_ORDER.get(char, 0)
+
+def fidel_orders(text: str) -> list[int]:
+    """get_fidel_order of every character."""
+    order = FIDEL_ORDER.get
+    return [order(ch, 0) for ch in text]
 
 def normalize_geez_to_root_key(text: str) -> str:
     """
@@ -127,31 +147,37 @@ def normalize_geez_to_root_key(text: str) -> str:
     """
     if not text:
         return ""
-    normalized = []
-    for char in text:
-        code = ord(char)
-        # Ge'ez syllables are primarily in U+1200..U+135A
-        if 0x1200 <= code <= 0x135A:
-            base_code = code - ((code - 0x1200) % 8)
-            normalized.append(chr(base_code))
-        else:
-            normalized.append(char)
-    return "".join(normalized)
+    return text.translate(ROOT_KEY_TABLE)
+
+def normalize_geez_batch(texts: list[str]) -> list[str]:
+    """normalize_geez_to_root_key for many strings (e.g. a verse's words) in one translate call."""
+    texts = [t or "" for t in texts]
+    if not texts:
+        return []
+    joined = _BATCH_SEP.join(texts)
+    if joined.count(_BATCH_SEP) != len(texts) - 1:
+        return [t.translate(ROOT_KEY_TABLE) for t in texts]
+    return joined.translate(ROOT_KEY_TABLE).split(_BATCH_SEP)
+
+def fidel_orders_batch(texts: list[str]) -> list[list[int]]:
+    """fidel_orders for many strings; one pass over the concatenated text."""
+    texts = [t or "" for t in texts]
+    flat = fidel_orders("".join(texts))
+    out = []
+    pos = 0
+    for t in texts:
+        out.append(flat[pos:pos + len(t)])
+        pos += len(t)
+    return out
 
 def decompose_word(surface):
     """
     Decomposes a word into its Fidel constituents with math properties.
     """
-    math_tokens = []
-    for char in surface:
-        order = get_fidel_order(char)
-        # Compact format for LLM context optimization
-        # Use simple keys: c=Char, o=Order. The model looks up Suffix Math in the Prompt Reference.
-        math_tokens.append({
-            "c": char,
-            "o": order
-        })
-    
+    # Compact format for LLM context optimization
+    # Use simple keys: c=Char, o=Order. The model looks up Suffix Math in the Prompt Reference.
+    math_tokens = [{"c": char, "o": FIDEL_ORDER.get(char, 0)} for char in surface]
+
     # Check DB
     lex_info = lookup_lex(surface) or {
         "root": "?",
@@ -185,41 +211,83 @@ def lookup_root_ontology(root: str):
         return None
     return ROOT_ONTOLOGY_MATRIX_NORM.get(key)
 
-ROOT_DB_NORM = {normalize_geez_to_root_key(k): v for k, v in ROOT_DB.items()}
+ROOT_DB_NORM = dict(zip(normalize_geez_batch(list(ROOT_DB)), ROOT_DB.values()))
 
 ALIAS_NORM_MAP = {
     "ከነ": "ከወነ"  # K-W-N (ex: ይኩኑ -> ኩኑ -> ከነ)
 }
 
-def _lookup_norm_key(norm_key: str):
+# -----------------------------------------------------------------------------
+# LEXICON INDEX (trie / longest match over ROOT_DB_NORM + ALIAS_NORM_MAP)
+# -----------------------------------------------------------------------------
+# config "lexicon.file" (relative to engine/workers) replaces the inline tables
+# above. A database built by lexicon_store.py is queried in place through an
+# LRU (nothing loaded at import); JSON / plain SQLite files are loaded into
+# memory, sections missing from the file keep the inline ones.
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
+
+def _load_lexicon_config() -> dict:
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return json.load(f).get("lexicon") or {}
+    except (OSError, ValueError):
+        return {}
+
+LEXICON_CONFIG = _load_lexicon_config()
+LEXICON_SOURCE = "inline"
+LEXICON_INDEX = LexiconIndex(ROOT_DB_NORM, ALIAS_NORM_MAP, LEXICON_CONFIG.get("max_suffix", 1))
+
+def use_lexicon(roots: dict | None = None, ontology: dict | None = None, aliases: dict | None = None, source: str = "inline") -> None:
+    """Swaps in lexicon tables (None keeps the current one), rebuilds the index and drops cached pre-processing."""
+    global ROOT_DB, ROOT_DB_NORM, ROOT_ONTOLOGY_MATRIX, ROOT_ONTOLOGY_MATRIX_NORM, ALIAS_NORM_MAP, LEXICON_INDEX, LEXICON_SOURCE
+    if roots is not None:
+        ROOT_DB = roots
+        ROOT_DB_NORM = dict(zip(normalize_geez_batch(list(ROOT_DB)), ROOT_DB.values()))
+    if ontology is not None:
+        ROOT_ONTOLOGY_MATRIX = ontology
+        ROOT_ONTOLOGY_MATRIX_NORM = {normalize_root_key(k): v for k, v in ROOT_ONTOLOGY_MATRIX.items()}
+    if aliases is not None:
+        ALIAS_NORM_MAP = aliases
+    LEXICON_INDEX = LexiconIndex(ROOT_DB_NORM, ALIAS_NORM_MAP, LEXICON_CONFIG.get("max_suffix", 1))
+    LEXICON_SOURCE = source
+    clear_pre_processing_cache()
+
+def use_lexicon_store(path: str) -> None:
+    """Serves every lexicon table from a lexicon_store.py database (read-only views)."""
+    global ROOT_DB, ROOT_DB_NORM, ROOT_ONTOLOGY_MATRIX, ROOT_ONTOLOGY_MATRIX_NORM, ALIAS_NORM_MAP, LEXICON_INDEX, LEXICON_SOURCE
+    store = LexiconStore(
+        path,
+        cache_size=LEXICON_CONFIG.get("cache_size", DEFAULT_CACHE_SIZE),
+        max_suffix=LEXICON_CONFIG.get("max_suffix", 1),
+        mmap_mb=LEXICON_CONFIG.get("mmap_mb", DEFAULT_MMAP_MB),
+    )
+    ROOT_DB = store.table("roots")
+    ROOT_DB_NORM = store.table("roots_norm")
+    ROOT_ONTOLOGY_MATRIX = store.table("ontology")
+    ROOT_ONTOLOGY_MATRIX_NORM = store.table("ontology_norm")
+    ALIAS_NORM_MAP = store.table("aliases")
+    LEXICON_INDEX = store
+    LEXICON_SOURCE = path
+    clear_pre_processing_cache()
+
+def use_lexicon_file(path: str) -> None:
+    if is_lexicon_db(path):
+        use_lexicon_store(path)
+        return
+    lexicon = load_lexicon(path)
+    use_lexicon(lexicon["roots"], lexicon["ontology"], lexicon["aliases"], source=path)
+
+def _lookup_norm_key(norm_key: str, start: int = 0):
+    # Longest root / alias key at norm_key[start:], at most max_suffix chars left over.
     if not norm_key:
         return None
-    lex = ROOT_DB_NORM.get(norm_key)
-    if lex:
-        return lex
-    alias = ALIAS_NORM_MAP.get(norm_key)
-    if alias:
-        lex = ROOT_DB_NORM.get(alias)
-        if lex:
-            return lex
-    if len(norm_key) > 1:
-        trimmed = norm_key[:-1]
-        lex = ROOT_DB_NORM.get(trimmed)
-        if lex:
-            return lex
-        alias_trim = ALIAS_NORM_MAP.get(trimmed)
-        if alias_trim:
-            lex = ROOT_DB_NORM.get(alias_trim)
-            if lex:
-                return lex
-    return None
+    return LEXICON_INDEX.match(norm_key, start)
 
 def lookup_lex(surface: str):
     if not surface:
         return None
     # Normalized (vowel-agnostic) match first
-    norm = normalize_geez_to_root_key(surface)
-    lex = _lookup_norm_key(norm)
+    lex = _lookup_norm_key(normalize_geez_to_root_key(surface))
     if lex:
         return lex
     # Fallback: exact match (compat)
@@ -238,11 +306,7 @@ def infer_syntax_role(order: int) -> str:
 def build_unknown_fallback(surface: str) -> dict:
     if not surface:
         return {"orders": [], "pattern": "", "last_order": 0, "length": 0}
-    orders = []
-    for ch in surface:
-        order = get_fidel_order(ch)
-        if order:
-            orders.append(order)
+    orders = [FIDEL_ORDER[ch] for ch in surface if ch in FIDEL_ORDER]
     pattern = "-".join(str(o) for o in orders) if orders else ""
     return {
         "orders": orders,
@@ -264,7 +328,7 @@ def _infer_pos_from_asset_tag(asset_tag: str | None) -> str:
         return "N"
     return "N"
 
-def build_pre_processing(surface: str) -> dict:
+def _build_pre_processing(surface: str) -> dict:
     surface = surface or ""
     order = infer_grammatical_vowel(surface)
 
@@ -274,25 +338,28 @@ def build_pre_processing(surface: str) -> dict:
 
     # Always attempt de-prefixing first (longest prefix wins), but fall back if no match.
     prefix_candidate = None
-    base_candidates = [(surface, None)]
+    base_candidates = [(surface, None, 0)]
     for p in PREFIXES:
         if surface.startswith(p) and len(surface) > len(p):
             core_text = surface[len(p):]
             prefix_candidate = p
-            base_candidates = [(core_text, p), (surface, None)]
+            base_candidates = [(core_text, p, len(p)), (surface, None, 0)]
             break
 
     candidates = []
-    for cand, pref in base_candidates:
+    for cand, pref, start in base_candidates:
         # Optional nominal prefix stripping (safe with fallback)
         if any(cand.startswith(np) and len(cand) > len(np) for np in NOMINAL_PREFIXES):
-            candidates.append((cand[1:], pref, "መ"))
-        candidates.append((cand, pref, None))
+            candidates.append((cand[1:], pref, "መ", start + 1))
+        candidates.append((cand, pref, None, start))
 
+    # Normalization is per character: every candidate is an offset into one
+    # normalized surface, matched by a single index walk (core + suffix).
+    norm_surface = normalize_geez_to_root_key(surface)
     lex_info = None
     matched_candidate = surface
-    for cand, pref, n_pref in candidates:
-        candidate_lex = lookup_lex(cand)
+    for cand, pref, n_pref, start in candidates:
+        candidate_lex = _lookup_norm_key(norm_surface, start) or ROOT_DB.get(cand)
         if candidate_lex:
             lex_info = candidate_lex
             matched_candidate = cand
@@ -370,3 +437,102 @@ def build_pre_processing(surface: str) -> dict:
         "spatial": spatial,
         "unknown_fallback": unknown_fallback
     }
+
+# -----------------------------------------------------------------------------
+# PRE-PROCESSING CACHE (keyed by surface form)
+# -----------------------------------------------------------------------------
+# A book has far fewer distinct surfaces than word tokens; the result depends
+# only on the surface and the lexicon tables above. Entries are shared, callers
+# always get copies. clear_pre_processing_cache() after editing the tables.
+PRE_PROCESSING_CACHE_SIZE = 65536
+
+
+class SurfaceCache:
+    """Bounded LRU of _build_pre_processing results with hit/miss counters."""
+
+    def __init__(self, maxsize: int = PRE_PROCESSING_CACHE_SIZE):
+        self.maxsize = max(1, int(maxsize))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, surface: str) -> dict:
+        """Shared entry, do not mutate."""
+        surface = surface or ""
+        with self.lock:
+            pp = self.entries.get(surface)
+            if pp is not None:
+                self.entries.move_to_end(surface)
+                self.hits += 1
+                return pp
+            self.misses += 1
+        pp = _build_pre_processing(surface)
+        with self.lock:
+            self.entries[surface] = pp
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return pp
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+PRE_PROCESSING_CACHE = SurfaceCache()
+
+
+def _copy_pre_processing(pp: dict) -> dict:
+    # Mirrors the nesting of _build_pre_processing (faster than copy.deepcopy).
+    out = pp.copy()
+    out["ontology"] = pp["ontology"].copy()
+    if pp["spatial"] is not None:
+        out["spatial"] = pp["spatial"].copy()
+    fallback = pp["unknown_fallback"]
+    if fallback is not None:
+        out["unknown_fallback"] = fallback = fallback.copy()
+        fallback["orders"] = list(fallback["orders"])
+    return out
+
+
+def build_pre_processing(surface: str) -> dict:
+    return _copy_pre_processing(PRE_PROCESSING_CACHE.get(surface))
+
+
+def pre_process_words(words: list) -> list[dict]:
+    """
+    pre_processing for each word of a verse (by its "text"); every distinct
+    surface is looked up once, each word gets its own copy.
+    """
+    shared = {}
+    out = []
+    for w in words:
+        surface = w.get("text", "") or ""
+        pp = shared.get(surface)
+        if pp is None:
+            pp = shared[surface] = PRE_PROCESSING_CACHE.get(surface)
+        out.append(_copy_pre_processing(pp))
+    return out
+
+
+def pre_processing_cache_stats() -> dict:
+    return PRE_PROCESSING_CACHE.stats()
+
+
+def clear_pre_processing_cache() -> None:
+    PRE_PROCESSING_CACHE.clear()
+
+
+if LEXICON_CONFIG.get("file"):
+    use_lexicon_file(os.path.join(os.path.dirname(__file__), LEXICON_CONFIG["file"]))
@@ -0,0 +1,183 @@
+import json
+import os
+import hashlib
+import argparse
+
+try:
+    from . import prompts
+    from . import stage_registry
+    from .char_columns import to_json
+    from .fidel_ops import pre_process_words
+    from .init_structure import load_aliases, find_alias_hits, AliasIndex, compute_verse_metrics, _detect_language, _resolve_alias_files
+    from .story_store import load_story, rewrite_story
+except ImportError:
+    import prompts
+    import stage_registry
+    from char_columns import to_json
+    from fidel_ops import pre_process_words
+    from init_structure import load_aliases, find_alias_hits, AliasIndex, compute_verse_metrics, _detect_language, _resolve_alias_files
+    from story_store import load_story, rewrite_story
+
+# Input fingerprints of stage results: verse["fingerprints"][result_key] is a sha1
+# over what the stage read when the result was written:
+#   fields    the verse fields in the stage's `reads` (stage_registry); LLM modes
+#             also send the verse meta (verse_metrics, alias_hits, state_*)
+#   inputs    the result fields of its required / used stages
+#   aliases   the aliases.json labels of the aliases in the verse's alias_hits
+#   config    mode plus the stage's `config` paths
+#   prompt    the stage's *_PROMPT_VERSION for LLM modes
+# The lexicon (ROOT_DB, ROOT_ONTOLOGY_MATRIX, ALIAS_NORM_MAP) reaches the stages
+# only through words[].pre_processing and alias_hits. refresh_inputs() rebuilds
+# those from the current tables, so after an edit only the verses whose words or
+# alias matches actually changed get a different fingerprint.
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
+LLM_META_FIELDS = ("verse_metrics", "alias_hits", "state_triggers", "state_updates")
+REFRESH_FIELDS = ("words", "alias_hits", "verse_metrics")
+
+
+def load_config():
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def digest(value) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=to_json)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _config_value(config: dict, path: str):
+    node = config
+    for part in path.split("."):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node
+
+
+def load_alias_table(language: str | None = None, alias_files: list[str] | None = None) -> list:
+    """aliases.json (+ aliases_de.json for language "de") in the find_alias_hits format."""
+    return load_aliases(_resolve_alias_files(language, alias_files or []))
+
+
+class Fingerprinter:
+    def __init__(self, config: dict, aliases: list, modes: dict | None = None):
+        self.config = config
+        self.aliases = aliases
+        self.alias_index = AliasIndex(aliases)
+        # Patterns only matter through alias_hits; the labels are what stages read
+        # (sorted: load_aliases merges them through a set).
+        self.alias_labels = {a.get("id"): sorted(a.get("labels") or []) for a in aliases}
+        self.modes = modes or {}
+
+    def fingerprint(self, verse: dict, stage: str, mode: str | None = None) -> str:
+        spec = stage_registry.STAGES[stage]
+        mode = mode or self.modes.get(stage) or spec.get("default_mode")
+        llm = stage_registry.kind(stage, mode) == "llm"
+        fields = list(spec.get("reads") or [])
+        if llm:
+            fields += [f for f in LLM_META_FIELDS if f not in fields]
+        parts = {
+            "stage": stage,
+            "mode": mode,
+            "fields": {f: verse.get(f) for f in fields},
+            "inputs": {s: verse.get(stage_registry.STAGES[s]["key"]) for s in stage_registry.inputs(stage)},
+            "config": {p: _config_value(self.config, p) for p in spec.get("config") or []},
+        }
+        if "alias_hits" in fields:
+            ids = sorted({str(h.get("alias_id")) for h in verse.get("alias_hits") or [] if isinstance(h, dict)})
+            parts["aliases"] = {aid: self.alias_labels.get(aid) for aid in ids}
+        if llm and spec.get("prompt_version"):
+            parts["prompt"] = getattr(prompts, spec["prompt_version"], None)
+        return digest(parts)
+
+    def stored(self, verse: dict, stage: str, mode: str | None = None) -> str | None:
+        fps = verse.get("fingerprints")
+        if not isinstance(fps, dict):
+            return None
+        return fps.get(stage_registry.output_key(stage, mode or self.modes.get(stage)))
+
+    def stamp(self, verse: dict, stage: str, mode: str | None = None) -> str:
+        fp = self.fingerprint(verse, stage, mode)
+        if not isinstance(verse.get("fingerprints"), dict):
+            verse["fingerprints"] = {}
+        verse["fingerprints"][stage_registry.output_key(stage, mode or self.modes.get(stage))] = fp
+        return fp
+
+    def changed(self, verse: dict, stage: str, mode: str | None = None) -> bool:
+        """True when the stored fingerprint is missing or differs from the current inputs."""
+        stored = self.stored(verse, stage, mode)
+        return stored is None or stored != self.fingerprint(verse, stage, mode)
+
+    def refresh_inputs(self, verse: dict) -> list[str]:
+        """
+        Rebuilds words[].pre_processing, verse_metrics and the pattern alias_hits
+        from the current lexicon and alias tables (capitalized DE hits are kept).
+        Returns the fields that changed.
+        """
+        changed = []
+        words = verse.get("words") or []
+        for w, pp in zip(words, pre_process_words(words)):
+            if w.get("pre_processing") != pp:
+                w["pre_processing"] = pp
+                if "words" not in changed:
+                    changed.append("words")
+        if "words" in changed:
+            metrics = compute_verse_metrics(words)
+            if verse.get("verse_metrics") != metrics:
+                verse["verse_metrics"] = metrics
+                changed.append("verse_metrics")
+        old_hits = verse.get("alias_hits") or []
+        hits = find_alias_hits(words, self.alias_index)
+        hits += [h for h in old_hits if isinstance(h, dict) and "alias_label" in h]
+        if hits != old_hits:
+            verse["alias_hits"] = hits
+            changed.append("alias_hits")
+        return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or record the input fingerprints of stage results")
+    parser.add_argument("command", choices=["status", "stamp"],
+                        help="status: changed verses per stage | stamp: record fingerprints of present results as current")
+    parser.add_argument("--stage", action="append", dest="stages", help="Limit to this stage (repeatable)")
+    parser.add_argument("--data-file", help="Override story_data.json path")
+    parser.add_argument("--language", help="Override language hint (e.g., de, gez)")
+    args = parser.parse_args()
+
+    config = load_config()
+    data_file = args.data_file or os.path.join(os.path.dirname(__file__), config["files"]["data_file"])
+    if not os.path.exists(data_file):
+        print(f"Data file not found: {data_file}")
+        return
+    stages = args.stages or stage_registry.order()
+    for stage in stages:
+        if stage not in stage_registry.STAGES:
+            parser.error(f"unknown stage: {stage}")
+    modes = stage_registry.config_modes(config.get("processing"))
+    fp = Fingerprinter(config, load_alias_table(_detect_language(None, data_file, args.language)), modes)
+
+    if args.command == "stamp":
+        counts = {s: 0 for s in stages}
+
+        def stamp_verse(verse):
+            for stage in stages:
+                if verse.get(stage_registry.output_key(stage, modes.get(stage))) is not None:
+                    fp.stamp(verse, stage)
+                    counts[stage] += 1
+
+        total = rewrite_story(data_file, stamp_verse)
+        print(f"🧬 Stamped {data_file} | verses={total} | " + " ".join(f"{s}={n}" for s, n in counts.items()))
+        return
+
+    data = load_story(data_file)
+    refreshed = sum(1 for v in data if fp.refresh_inputs(v))
+    print(f"🧬 {data_file}: {len(data)} verses | lexicon/alias inputs out of date in {refreshed}")
+    for stage in stages:
+        present = [v for v in data if v.get(stage_registry.output_key(stage, modes.get(stage))) is not None]
+        unstamped = sum(1 for v in present if fp.stored(v, stage) is None)
+        changed = sum(1 for v in present if fp.changed(v, stage)) - unstamped
+        print(f"  {stage:<12} results={len(present)} changed={changed} unstamped={unstamped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,17 @@ import os
 import re
 
 try:
-    from .fidel_ops import build_pre_processing, normalize_root_key, normalize_geez_to_root_key
+    from .fidel_ops import pre_process_words, pre_processing_cache_stats, normalize_root_key, normalize_geez_to_root_key
+    from .story_store import clear_deltas
+    from .json_stream import dump_compact_file
+    from .char_columns import BaseChars, CharIdRange, to_json
+    from .alias_automaton import TokenAutomaton
 except ImportError:
-    from fidel_ops import build_pre_processing, normalize_root_key, normalize_geez_to_root_key
+    from fidel_ops import pre_process_words, pre_processing_cache_stats, normalize_root_key, normalize_geez_to_root_key
+    from story_store import clear_deltas
+    from json_stream import dump_compact_file
+    from char_columns import BaseChars, CharIdRange, to_json
+    from alias_automaton import TokenAutomaton
 
 # CONFIG (Loaded from ../config/config.json)
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
@@ -105,14 +113,15 @@ def parse_input_file(filepath):
 def generate_ids(text, separator):
     """
     Erzeugt atomare IDs (base_chars) und Wort-Gruppierungen (words).
+    IDs sind pro Vers fortlaufend: base_chars ist ein BaseChars-View über den
+    Text, char_ids pro Wort ein CharIdRange (serialisiert wie bisher).
     """
     if not text:
         return [], []
 
-    base_chars = []
     words = []
     
-    current_word_char_ids = []
+    current_word_start = None
     current_word_text = []
     
     global_char_id = 1
@@ -123,39 +132,39 @@ def generate_ids(text, separator):
     all_separators.add("።") 
 
     for char in text:
-        # 1. Jedes Zeichen bekommt eine ID -> base_chars
-        base_chars.append({"id": global_char_id, "char": char})
+        # 1. Jedes Zeichen bekommt eine ID -> base_chars (implizit: start + Index)
         
         # 2. Wort-Logik
         is_sep = char in all_separators
         
         if is_sep:
-            if current_word_char_ids:
+            if current_word_text:
                 word_text_str = "".join(current_word_text)
                 words.append({
                     "word_id": word_id,
                     "text": word_text_str,
-                    "char_ids": list(current_word_char_ids)
+                    "char_ids": CharIdRange(current_word_start, global_char_id)
                 })
                 word_id += 1
                 
-                current_word_char_ids = []
+                current_word_start = None
                 current_word_text = []
         else:
-            current_word_char_ids.append(global_char_id)
+            if current_word_start is None:
+                current_word_start = global_char_id
             current_word_text.append(char)
         
         global_char_id += 1
         
-    if current_word_char_ids:
+    if current_word_text:
         word_text_str = "".join(current_word_text)
         words.append({
             "word_id": word_id,
             "text": word_text_str,
-            "char_ids": list(current_word_char_ids)
+            "char_ids": CharIdRange(current_word_start, global_char_id)
         })
         
-    return base_chars, words
+    return BaseChars(text, 1), words
 
 def _get_punct_set():
     if GRAPHEMATIC_PUNCTUATIONS:
@@ -461,87 +470,102 @@ def find_capitalized_hits(words, cfg: dict, counts: dict, alias_label_index: dic
         })
     return hits
 
-def find_alias_hits(words, aliases, language: str | None = None, cap_counts: dict | None = None, cap_cfg: dict | None = None):
-    hits = []
-    if not aliases:
-        aliases = []
-    alias_label_index = _build_alias_label_index(aliases)
-    def _contains_geez(text):
-        return any(0x1200 <= ord(ch) <= 0x137F for ch in text)
-
-    def _normalize_surface_token(token):
-        if not token:
-            return ""
-        if _contains_geez(token):
-            return normalize_geez_to_root_key(token)
-        # For non-Ge'ez (e.g., DE), casefold + strip punctuation
-        t = token.casefold()
-        t = re.sub(r"[^\w]+", "", t, flags=re.UNICODE)
-        return t
-
-    def _looks_like_root(token):
-        if not token:
-            return False
-        if _contains_geez(token):
-            return False
-        if any(ch in token for ch in ["-", "ʾ", "ʿ", "'"]):
-            return True
-        t = re.sub(r"[^A-Za-z0-9]+", "", token)
-        if not t:
-            return False
-        return len(t) <= 5 and t.upper() == t
-
-    roots = []
-    norm_surfaces = []
-    for w in words:
-        pp = w.get("pre_processing", {})
-        roots.append(pp.get("ontology", {}).get("root_key") or "")
-        norm_surfaces.append(_normalize_surface_token(w.get("text", "")))
-    for alias in aliases:
-        alias_mode = (alias.get("mode") or "").strip().lower()
-        for pattern in alias.get("patterns", []):
-            if not pattern:
-                continue
-            # Decide whether this pattern is Ge'ez-form or root-key form
-            is_geez = any(_contains_geez(part) for part in pattern)
-            if alias_mode in ("root", "surface"):
-                mode = alias_mode
-            elif is_geez:
-                mode = "surface"
-            elif all(_looks_like_root(p) for p in pattern):
-                mode = "root"
-            else:
-                mode = "surface"
-
-            if mode == "surface":
-                norm_pattern = [_normalize_surface_token(p) for p in pattern]
-                if len(norm_pattern) > len(norm_surfaces):
-                    continue
-                for i in range(0, len(norm_surfaces) - len(norm_pattern) + 1):
-                    if norm_surfaces[i:i + len(norm_pattern)] == norm_pattern:
-                        word_ids = [words[i + j].get("word_id") for j in range(len(norm_pattern))]
-                        hits.append({
-                            "alias_id": alias.get("id"),
-                            "pattern": pattern,
-                            "word_ids": word_ids
-                        })
-            else:
-                norm_pattern = [normalize_root_key(p) for p in pattern]
-                if len(norm_pattern) > len(roots):
+def _contains_geez(text) -> bool:
+    return any(0x1200 <= ord(ch) <= 0x137F for ch in text)
+
+def _normalize_surface_token(token) -> str:
+    if not token:
+        return ""
+    if _contains_geez(token):
+        return normalize_geez_to_root_key(token)
+    # For non-Ge'ez (e.g., DE), casefold + strip punctuation
+    t = token.casefold()
+    t = re.sub(r"[^\w]+", "", t, flags=re.UNICODE)
+    return t
+
+def _looks_like_root(token) -> bool:
+    if not token:
+        return False
+    if _contains_geez(token):
+        return False
+    if any(ch in token for ch in ["-", "ʾ", "ʿ", "'"]):
+        return True
+    t = re.sub(r"[^A-Za-z0-9]+", "", token)
+    if not t:
+        return False
+    return len(t) <= 5 and t.upper() == t
+
+def _alias_pattern_mode(pattern, alias_mode: str) -> str:
+    # Decide whether this pattern is Ge'ez-form or root-key form
+    if alias_mode in ("root", "surface"):
+        return alias_mode
+    if any(_contains_geez(part) for part in pattern):
+        return "surface"
+    if all(_looks_like_root(p) for p in pattern):
+        return "root"
+    return "surface"
+
+class AliasIndex:
+    """
+    An alias list compiled for find_alias_hits: one token automaton over the
+    normalized surface patterns and one over the root-key patterns, so a verse
+    is matched in one pass per mode. Build it once per alias set and pass it
+    instead of the list.
+    """
+
+    def __init__(self, aliases):
+        self.aliases = aliases or []
+        self.label_index = _build_alias_label_index(self.aliases)
+        self.patterns = []  # payload -> (alias_id, pattern); payload order = alias / pattern order
+        self.surface = TokenAutomaton()
+        self.root = TokenAutomaton()
+        self._surface_norm = {}
+        for alias in self.aliases:
+            alias_mode = (alias.get("mode") or "").strip().lower()
+            for pattern in alias.get("patterns", []):
+                if not pattern:
                     continue
-                for i in range(0, len(roots) - len(norm_pattern) + 1):
-                    if roots[i:i + len(norm_pattern)] == norm_pattern:
-                        word_ids = [words[i + j].get("word_id") for j in range(len(norm_pattern))]
-                        hits.append({
-                            "alias_id": alias.get("id"),
-                            "pattern": pattern,
-                            "word_ids": word_ids
-                        })
-    # Capitalized heuristic (DE)
-    if language == "de" and cap_cfg:
-        hits.extend(find_capitalized_hits(words, cap_cfg, cap_counts or {}, alias_label_index))
+                payload = len(self.patterns)
+                self.patterns.append((alias.get("id"), pattern))
+                if _alias_pattern_mode(pattern, alias_mode) == "surface":
+                    self.surface.add([_normalize_surface_token(p) for p in pattern], payload)
+                else:
+                    self.root.add([normalize_root_key(p) for p in pattern], payload)
+        self.surface.compile()
+        self.root.compile()
+
+    def _norm_surface(self, token) -> str:
+        norm = self._surface_norm.get(token)
+        if norm is None:
+            norm = self._surface_norm[token] = _normalize_surface_token(token)
+        return norm
+
+    def find(self, words, language: str | None = None, cap_counts: dict | None = None, cap_cfg: dict | None = None):
+        roots = []
+        norm_surfaces = []
+        for w in words:
+            pp = w.get("pre_processing", {})
+            roots.append(pp.get("ontology", {}).get("root_key") or "")
+            norm_surfaces.append(self._norm_surface(w.get("text", "")))
+        # Sorted by (alias, pattern, position): the order of the per-pattern scan.
+        found = sorted(list(self.surface.find(norm_surfaces)) + list(self.root.find(roots)))
+        hits = []
+        for payload, start in found:
+            alias_id, pattern = self.patterns[payload]
+            hits.append({
+                "alias_id": alias_id,
+                "pattern": pattern,
+                "word_ids": [words[start + j].get("word_id") for j in range(len(pattern))]
+            })
+        # Capitalized heuristic (DE)
+        if language == "de" and cap_cfg:
+            hits.extend(find_capitalized_hits(words, cap_cfg, cap_counts or {}, self.label_index))
+        return hits
 
-    return hits
+def find_alias_hits(words, aliases, language: str | None = None, cap_counts: dict | None = None, cap_cfg: dict | None = None):
+    """Alias hits of one verse; `aliases` is an alias list or a prebuilt AliasIndex (reused across verses)."""
+    index = aliases if isinstance(aliases, AliasIndex) else AliasIndex(aliases)
+    return index.find(words, language=language, cap_counts=cap_counts, cap_cfg=cap_cfg)
 
 def register_asset(registry, pp, verse_id):
     asset_id = pp.get("asset_id")
@@ -652,44 +676,9 @@ def apply_state_triggers(words, registry):
 #   ...
 # ]
 def custom_json_dump(data, filepath):
-    # Standard dump first to get valid structure
-    raw_json = json.dumps(data, ensure_ascii=False, indent=2)
-    
-    # Post-process via Regex to collapse small objects
-    # Pattern: Look for objects like:
-    # {
-    #   "id": 1,
-    #   "char": "X"
-    # }
-    # and replace with { "id": 1, "char": "X" }
-    
-    import re
-    
-    def collapse_match(match):
-        content = match.group(0)
-        # Collapse whitespace/newlines within this block
-        collapsed = re.sub(r'\s+', ' ', content)
-        # Fix spaces around braces
-        collapsed = collapsed.replace('{ ', '{').replace(' }', '}')
-        collapsed = collapsed.replace('{', '{ ').replace('}', ' }')
-        return collapsed
-
-    # Regex for simple objects containing 'id' and 'char' keys (and maybe others)
-    # Be careful not to match too much.
-    # Matches: {\s*"id": \d+,\s*"char": "[^"]+"\s*} 
-    pattern_char = re.compile(r'\{\s*"id":\s*\d+,\s*"char":\s*"[^"]+"\s*\}')
-    
-    # Matches: words objects with 'word_id', 'text', 'char_ids'
-    # {\s*"word_id": \d+,\s*"text": "[^"]+",\s*"char_ids": \[[^\]]+\]\s*}
-    pattern_word = re.compile(r'\{\s*"word_id":\s*\d+,\s*"text":\s*"[^"]+",\s*"char_ids":\s*\[[^\]]+\]\s*\}')
-    
-    # Apply replacements
-    # Since re.sub processes the whole string, this is efficient enough for this file size
-    better_json = re.sub(pattern_char, collapse_match, raw_json)
-    better_json = re.sub(pattern_word, collapse_match, better_json)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(better_json)
+    # Streamed compact layout: one-line { "id": 1, "char": "X" } objects,
+    # written verse by verse into a temp file and swapped in.
+    dump_compact_file(data, filepath, inline_int_lists=False, default=to_json)
 
 
 def main():
@@ -753,8 +742,8 @@ def main():
         chars, word_list = generate_ids(text, SEPARATOR)
 
         # Pre-processing for words (root, vowel order, stopword flag)
-        for w in word_list:
-            w["pre_processing"] = build_pre_processing(w.get("text", ""))
+        for w, pp in zip(word_list, pre_process_words(word_list)):
+            w["pre_processing"] = pp
             w["genre_overlay"] = {
                 "current_genre": None,
                 "timeline": None,
@@ -818,15 +807,18 @@ def main():
         
         count += 1
 
+    stats = pre_processing_cache_stats()
+    print(f"🧮 Pre-processing: {stats['misses']} distinct surfaces, {stats['hits']} cache hits ({stats['hit_rate'] * 100:.0f}%)")
 
     # 3. Alias Hits (post-pass, supports DE capitalized heuristic)
     cap_counts = {}
     if language == "de" and DE_ENTITIES_CFG.get("enable_capitalized_heuristic"):
         cap_counts = compute_capitalized_counts(data, DE_ENTITIES_CFG)
+    alias_index = AliasIndex(aliases)
     for entry in data:
         entry["alias_hits"] = find_alias_hits(
             entry.get("words", []) or [],
-            aliases,
+            alias_index,
             language=language,
             cap_counts=cap_counts,
             cap_cfg=DE_ENTITIES_CFG
@@ -835,6 +827,7 @@ def main():
     # 4. Speichern
     print(f"💾 Speichere {DATA_FILE}...")
     custom_json_dump(data, DATA_FILE) # Use custom dumper
+    clear_deltas(DATA_FILE) # Deltas of a previous init no longer apply
 
     # 5. Registry speichern
     try:
@@ -0,0 +1,196 @@
+import os
+from json.encoder import encode_basestring
+
+# Streaming writer for the "compact" story_data.json layout.
+# Emits the same text as json.dumps(indent=2) followed by the old regex
+# post-processing, but walks the data once and writes verse by verse, so a
+# save never holds the full pretty-printed string (plus regex copies) in memory.
+#
+#   char objects:  { "id": 1, "char": "X" }
+#   int lists:     [1, 2, 3]                (inline_int_lists=True, run_stage layout)
+#   word objects:  { "word_id": 1, "text": "...", "char_ids": [1, 2] }
+#
+# inline_int_lists=False reproduces init_structure's layout, where int lists
+# keep the standard multi-line indentation.
+
+INDENT = "  "
+
+
+def _key(key) -> str:
+    if isinstance(key, str):
+        return encode_basestring(key)
+    if key is True:
+        return '"true"'
+    if key is False:
+        return '"false"'
+    if key is None:
+        return '"null"'
+    if isinstance(key, float):
+        return encode_basestring(_float(key))
+    return encode_basestring(str(int(key)))
+
+
+def _float(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "Infinity"
+    if value == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def _scalar(value) -> str | None:
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _float(value)
+    return None
+
+
+def _is_uint(value) -> bool:
+    return type(value) is int and value >= 0
+
+
+def _is_uint_list(value) -> bool:
+    return isinstance(value, (list, tuple)) and len(value) > 0 and all(_is_uint(v) for v in value)
+
+
+def _plain_text(value) -> bool:
+    # The old regexes matched string bodies with [^"]+ (no escaped quotes).
+    return isinstance(value, str) and '"' not in value
+
+
+def _char_line(obj: dict) -> str | None:
+    if len(obj) != 2 or next(iter(obj)) != "id" or "char" not in obj:
+        return None
+    cid = obj["id"]
+    char = obj["char"]
+    if not _is_uint(cid) or not char or not _plain_text(char):
+        return None
+    return f'{{ "id": {cid}, "char": {encode_basestring(char)} }}'
+
+
+def _word_line(obj: dict, inline_int_lists: bool, default=None) -> str | None:
+    if len(obj) != 3 or list(obj) != ["word_id", "text", "char_ids"]:
+        return None
+    word_id = obj["word_id"]
+    text = obj["text"]
+    char_ids = obj["char_ids"]
+    if default is not None and not isinstance(char_ids, (list, tuple)):
+        try:
+            char_ids = default(char_ids)
+        except TypeError:
+            return None
+    if not _is_uint(word_id) or not _plain_text(text):
+        return None
+    if inline_int_lists:
+        if isinstance(char_ids, (list, tuple)) and not char_ids:
+            ids = "[]"
+        elif _is_uint_list(char_ids):
+            ids = "[" + ", ".join(map(str, char_ids)) + "]"
+        else:
+            return None
+    else:
+        if not text or not _is_uint_list(char_ids):
+            return None
+        ids = "[ " + ", ".join(map(str, char_ids)) + " ]"
+    return f'{{ "word_id": {word_id}, "text": {encode_basestring(text)}, "char_ids": {ids} }}'
+
+
+def _encode(obj, level: int, parts: list, inline_int_lists: bool, default=None) -> None:
+    text = _scalar(obj)
+    if text is not None:
+        parts.append(text)
+        return
+
+    if isinstance(obj, dict):
+        line = _char_line(obj)
+        if line is None:
+            line = _word_line(obj, inline_int_lists, default)
+        if line is not None:
+            parts.append(line)
+            return
+        if not obj:
+            parts.append("{}")
+            return
+        inner = "\n" + INDENT * (level + 1)
+        first = True
+        parts.append("{")
+        for key, value in obj.items():
+            parts.append(inner if first else "," + inner)
+            first = False
+            parts.append(_key(key))
+            parts.append(": ")
+            _encode(value, level + 1, parts, inline_int_lists, default)
+        parts.append("\n" + INDENT * level + "}")
+        return
+
+    if isinstance(obj, (list, tuple)):
+        if not obj:
+            parts.append("[]")
+            return
+        if inline_int_lists and _is_uint_list(obj):
+            parts.append("[" + ", ".join(map(str, obj)) + "]")
+            return
+        inner = "\n" + INDENT * (level + 1)
+        first = True
+        parts.append("[")
+        for value in obj:
+            parts.append(inner if first else "," + inner)
+            first = False
+            _encode(value, level + 1, parts, inline_int_lists, default)
+        parts.append("\n" + INDENT * level + "]")
+        return
+
+    if default is not None:
+        _encode(default(obj), level, parts, inline_int_lists, default)
+        return
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def write_compact_items(items, f, inline_int_lists: bool = True, default=None) -> int:
+    """
+    Writes an iterable as a top-level JSON list, flushing one element at a
+    time (items may be a generator). Returns the number of elements written.
+    """
+    count = 0
+    for item in items:
+        parts = ["[\n" + INDENT if count == 0 else ",\n" + INDENT]
+        count += 1
+        _encode(item, 1, parts, inline_int_lists, default)
+        f.write("".join(parts))
+    f.write("\n]" if count else "[]")
+    return count
+
+
+def write_compact(data, f, inline_int_lists: bool = True, default=None) -> None:
+    """Writes data to an open text file in the compact layout."""
+    if isinstance(data, (list, tuple)) and data and not (inline_int_lists and _is_uint_list(data)):
+        write_compact_items(data, f, inline_int_lists=inline_int_lists, default=default)
+        return
+    parts = []
+    _encode(data, 0, parts, inline_int_lists, default)
+    f.write("".join(parts))
+
+
+def dumps_compact(data, inline_int_lists: bool = True, default=None) -> str:
+    parts = []
+    _encode(data, 0, parts, inline_int_lists, default)
+    return "".join(parts)
+
+
+def dump_compact_file(data, filepath: str, inline_int_lists: bool = True, default=None) -> None:
+    # Stream into <file>.tmp and swap, so readers never see a half-written file.
+    temp = filepath + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        write_compact(data, f, inline_int_lists=inline_int_lists, default=default)
+    os.replace(temp, filepath)
@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import argparse
+
+# Longest-match index over normalized (1st order) lexicon keys.
+# A trie node carries the lexicon entry of its key; alias keys (ALIAS_NORM_MAP)
+# carry the entry of their target unless the key is itself a root. One walk
+# from a start offset (after a prefix) finds the longest key that leaves at most
+# `max_suffix` characters, i.e. prefix | core | suffix in one pass instead of
+# probing full / alias / trimmed / alias-of-trimmed keys one by one.
+#
+# Lexicon files (same tables as the inline dicts in fidel_ops.py):
+#   .json                 {"roots": {geez_key: entry}, "ontology": {root_key: entry},
+#                          "aliases": {norm_key: norm_target}}
+#   .sqlite / .db         tables roots(key, data), ontology(key, data),
+#                         aliases(key, target); data is the entry as JSON
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+
+class LexiconIndex:
+    def __init__(self, roots: dict, aliases: dict | None = None, max_suffix: int = 1):
+        """roots: normalized key -> entry; aliases: normalized key -> normalized root key."""
+        self.max_suffix = max(0, int(max_suffix))
+        self.trie = [{}, None]  # node = [children by char, entry]
+        self.size = 0
+        for key, target in (aliases or {}).items():
+            entry = roots.get(target)
+            if entry and not roots.get(key):
+                self._insert(key, entry)
+        for key, entry in roots.items():
+            self._insert(key, entry)
+
+    def _insert(self, key: str, entry: dict) -> None:
+        if not key or not entry:
+            return
+        node = self.trie
+        for ch in key:
+            child = node[0].get(ch)
+            if child is None:
+                child = node[0][ch] = [{}, None]
+            node = child
+        if node[1] is None:
+            self.size += 1
+        node[1] = entry
+
+    def match(self, norm: str, start: int = 0):
+        """Entry of the longest key at norm[start:] that leaves <= max_suffix chars, else None."""
+        node = self.trie
+        best = None
+        shortest = len(norm) - self.max_suffix
+        for i in range(start, len(norm)):
+            node = node[0].get(norm[i])
+            if node is None:
+                break
+            if node[1] is not None and i + 1 >= shortest:
+                best = node[1]
+        return best
+
+
+def _read_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {table: raw.get(table) for table in ("roots", "ontology", "aliases")}
+
+
+def _read_sqlite(path: str) -> dict:
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        out = {"roots": None, "ontology": None, "aliases": None}
+        for table in ("roots", "ontology"):
+            if table in tables:
+                out[table] = {key: json.loads(data) for key, data in con.execute(f"SELECT key, data FROM {table}")}
+        if "aliases" in tables:
+            out["aliases"] = dict(con.execute("SELECT key, target FROM aliases"))
+        return out
+    finally:
+        con.close()
+
+
+def load_lexicon(path: str) -> dict:
+    """{"roots", "ontology", "aliases"} from a JSON or SQLite lexicon file (None = section absent)."""
+    if path.lower().endswith(SQLITE_SUFFIXES):
+        return _read_sqlite(path)
+    return _read_json(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or query the root lexicon index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="Write the active lexicon tables as a JSON lexicon file")
+    p_export.add_argument("--out", required=True)
+    p_lookup = sub.add_parser("lookup", help="Show the pre-processing lexicon match of words")
+    p_lookup.add_argument("words", nargs="+")
+    args = parser.parse_args()
+
+    try:
+        from . import fidel_ops
+    except ImportError:
+        import fidel_ops
+
+    if args.command == "export":
+        lexicon = {
+            "roots": dict(fidel_ops.ROOT_DB.items()),
+            "ontology": dict(fidel_ops.ROOT_ONTOLOGY_MATRIX.items()),
+            "aliases": dict(fidel_ops.ALIAS_NORM_MAP.items()),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(lexicon, f, ensure_ascii=False, indent=2)
+        print(f"📚 Lexicon exported: {args.out} | roots={len(lexicon['roots'])} ontology={len(lexicon['ontology'])} aliases={len(lexicon['aliases'])}")
+        return
+
+    print(f"📚 Lexicon: {fidel_ops.LEXICON_SOURCE} | keys={fidel_ops.LEXICON_INDEX.size}")
+    for word in args.words:
+        pp = fidel_ops.build_pre_processing(word)
+        print(f"  {word}: root={pp['root']} prefix={pp['prefix']} nominal={pp['nominal_prefix']} core={pp['core_text']} asset={pp['asset_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import json
+import os
+import sqlite3
+import threading
+import argparse
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    from .lexicon_index import load_lexicon, SQLITE_SUFFIXES
+except ImportError:
+    from lexicon_index import load_lexicon, SQLITE_SUFFIXES
+
+# Indexed lexicon database (SQLite, built by `lexicon_store.py build`).
+# Nothing is loaded up front: lookups are primary-key reads through an LRU,
+# and the file is opened read-only with mmap, so worker processes share the
+# OS page cache of one file. Normalized keys are precomputed at build time:
+#   roots / ontology / aliases   the source tables (ROOT_DB, ROOT_ONTOLOGY_MATRIX,
+#                                ALIAS_NORM_MAP; the lexicon_index.py SQLite layout)
+#   roots_norm / ontology_norm   normalized key -> entry (ROOT_DB_NORM, ..._NORM)
+#   lex_keys                     the LexiconIndex keys: root keys + alias keys
+#                                resolved to their target entry (roots win)
+#   meta                         schema_version, source, built_at, counts
+SCHEMA_VERSION = "1"
+DEFAULT_CACHE_SIZE = 65536
+DEFAULT_MMAP_MB = 256
+TABLES = ("roots", "ontology", "aliases", "roots_norm", "ontology_norm", "lex_keys")
+
+
+def is_lexicon_db(path: str) -> bool:
+    """True for a SQLite file written by build_lexicon_db (has the meta table)."""
+    if not path.lower().endswith(SQLITE_SUFFIXES) or not os.path.exists(path):
+        return False
+    try:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = con.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return False
+    return bool(row) and row[0] == SCHEMA_VERSION
+
+
+class StoreTable(Mapping):
+    """Read-only dict view of one store table; item reads go through the store LRU."""
+
+    def __init__(self, store: "LexiconStore", table: str):
+        self.store = store
+        self.table = table
+
+    def __getitem__(self, key):
+        value = self.store.get(self.table, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self.store.get(self.table, key)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self.store.get(self.table, key) is not None
+
+    def __iter__(self):
+        return iter([key for (key,) in self.store.rows(f"SELECT key FROM {self.table}")])
+
+    def __len__(self):
+        return self.store.count(self.table)
+
+    def items(self):
+        # One scan instead of a lookup per key.
+        return [(key, self.store.decode(self.table, raw)) for key, raw in self.store.rows(f"SELECT * FROM {self.table}")]
+
+    def values(self):
+        return [value for _key, value in self.items()]
+
+
+class LexiconStore:
+    def __init__(self, path: str, cache_size: int = DEFAULT_CACHE_SIZE, max_suffix: int = 1, mmap_mb: int = DEFAULT_MMAP_MB):
+        self.path = path
+        self.max_suffix = max(0, int(max_suffix))
+        self.mmap_size = max(0, int(mmap_mb)) * 1024 * 1024
+        self.lock = threading.Lock()
+        self._con = None
+        self._pid = None
+        self._get = lru_cache(maxsize=max(1, int(cache_size)))(self._get_uncached)
+        self.meta = dict(self.rows("SELECT key, value FROM meta"))
+
+    def _connection(self):
+        # sqlite connections must not cross a fork: reopen in each worker process.
+        if self._con is None or self._pid != os.getpid():
+            con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            con.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+            self._con, self._pid = con, os.getpid()
+        return self._con
+
+    def rows(self, sql: str, params: tuple = ()) -> list:
+        with self.lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    def count(self, table: str) -> int:
+        value = self.meta.get(f"count_{table}")
+        if value is None:
+            return self.rows(f"SELECT COUNT(*) FROM {table}")[0][0]
+        return int(value)
+
+    @staticmethod
+    def decode(table: str, raw: str):
+        return raw if table == "aliases" else json.loads(raw)
+
+    def _get_uncached(self, table: str, key: str):
+        column = "target" if table == "aliases" else "data"
+        found = self.rows(f"SELECT {column} FROM {table} WHERE key = ?", (key,))
+        return self.decode(table, found[0][0]) if found else None
+
+    def get(self, table: str, key):
+        if not isinstance(key, str):
+            return None
+        return self._get(table, key)
+
+    def table(self, name: str) -> StoreTable:
+        return StoreTable(self, name)
+
+    @property
+    def size(self) -> int:
+        return self.count("lex_keys")
+
+    def match(self, norm: str, start: int = 0):
+        """LexiconIndex.match on the stored keys: longest key at norm[start:] leaving <= max_suffix chars."""
+        for end in range(len(norm), max(start, len(norm) - self.max_suffix - 1), -1):
+            entry = self._get("lex_keys", norm[start:end])
+            if entry:
+                return entry
+        return None
+
+    def stats(self) -> dict:
+        info = self._get.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def build_lexicon_db(lexicon: dict, out_path: str, geez_key, root_key, source: str = "") -> dict:
+    """
+    Writes the indexed database for {"roots", "ontology", "aliases"} (plain dicts).
+    geez_key / root_key are the fidel_ops normalizers. Written to a temp file and
+    swapped in, so running workers keep reading the previous file. Returns the counts.
+    """
+    roots = dict(lexicon.get("roots") or {})
+    ontology = dict(lexicon.get("ontology") or {})
+    aliases = dict(lexicon.get("aliases") or {})
+    roots_norm = {geez_key(k): v for k, v in roots.items()}
+    ontology_norm = {root_key(k): v for k, v in ontology.items()}
+    lex_keys = {}
+    for key, target in aliases.items():
+        entry = roots_norm.get(target)
+        if key and entry and not roots_norm.get(key):
+            lex_keys[key] = entry
+    for key, entry in roots_norm.items():
+        if key and entry:
+            lex_keys[key] = entry
+
+    def dumps(value):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+    tables = {
+        "roots": [(k, dumps(v)) for k, v in roots.items()],
+        "ontology": [(k, dumps(v)) for k, v in ontology.items()],
+        "aliases": list(aliases.items()),
+        "roots_norm": [(k, dumps(v)) for k, v in roots_norm.items()],
+        "ontology_norm": [(k, dumps(v)) for k, v in ontology_norm.items()],
+        "lex_keys": [(k, dumps(v)) for k, v in lex_keys.items()],
+    }
+    counts = {name: len(rows) for name, rows in tables.items()}
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    try:
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        for name, rows in tables.items():
+            column = "target" if name == "aliases" else "data"
+            con.execute(f"CREATE TABLE {name} (key TEXT PRIMARY KEY, {column} TEXT NOT NULL) WITHOUT ROWID")
+            con.executemany(f"INSERT INTO {name} VALUES (?, ?)", rows)
+        meta = {
+            "schema_version": SCHEMA_VERSION,
+            "source": source,
+            "built_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        meta.update({f"count_{name}": str(n) for name, n in counts.items()})
+        con.executemany("INSERT INTO meta VALUES (?, ?)", list(meta.items()))
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp_path, out_path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the indexed lexicon database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="Compile a JSON (or SQLite) lexicon into the indexed database")
+    p_build.add_argument("--source", help="Lexicon source file (default: the inline fidel_ops tables)")
+    p_build.add_argument("--out", required=True, help="Output .sqlite path")
+    p_stats = sub.add_parser("stats", help="Show meta data and table sizes")
+    p_stats.add_argument("--db", required=True)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        if not is_lexicon_db(args.db):
+            print(f"⚠️ Not a lexicon database (schema {SCHEMA_VERSION}): {args.db}")
+            return
+        store = LexiconStore(args.db)
+        for key, value in sorted(store.meta.items()):
+            print(f"  {key:<20} {value}")
+        return
+
+    try:
+        from . import fidel_ops
+    except ImportError:
+        import fidel_ops
+
+    # Sections missing from the source keep the inline tables, as when loading it directly.
+    lexicon = load_lexicon(args.source) if args.source else {}
+    inline = {
+        "roots": fidel_ops.ROOT_DB,
+        "ontology": fidel_ops.ROOT_ONTOLOGY_MATRIX,
+        "aliases": fidel_ops.ALIAS_NORM_MAP,
+    }
+    for name, table in inline.items():
+        if lexicon.get(name) is None:
+            lexicon[name] = dict(table.items())
+    counts = build_lexicon_db(
+        lexicon,
+        args.out,
+        fidel_ops.normalize_geez_to_root_key,
+        fidel_ops.normalize_root_key,
+        source=os.path.abspath(args.source) if args.source else "inline",
+    )
+    print(f"📚 Lexicon database written: {args.out} | " + " ".join(f"{k}={v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,20 @@ import os
 import argparse
 import datetime
 
+try:
+    from .story_store import load_story
+except ImportError:
+    from story_store import load_story
+
 SCHEMA_VERSION = "interlanguage.links.v1"
 
 
+# Only the fields _build_index reads; base_chars/words stay on disk.
+LINK_FIELDS = ["verse_id", "chapter", "verse", "analysis_entities", "alias_hits"]
+
+
 def load_data(path: str) -> list:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_story(path, fields=LINK_FIELDS)
 
 
 def _collect_subjects(verse: dict) -> list[str]:
@@ -0,0 +1,222 @@
+import json
+import os
+import time
+import hashlib
+import argparse
+
+try:
+    import prompts
+except ImportError:
+    from . import prompts
+
+# Persistent cache of raw LLM responses (one JSON file per request).
+# Key = sha1 over stage, the request payload (model, input, previous_response_id,
+# temperature, max_output_tokens, tool integrations; "stream" ignored) and the
+# prompts.py *_PROMPT_VERSION constants, so a prompt change invalidates entries
+# while a re-run after a reset or parser fix is answered from disk.
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
+PRUNE_EVERY = 50
+
+STATS = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0, "discarded": 0}
+_writes_since_prune = 0
+
+
+def load_config():
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _settings() -> dict:
+    try:
+        cfg = load_config().get("llm_cache", {})
+    except (OSError, ValueError):
+        cfg = {}
+    root = cfg.get("dir", "cache/llm")
+    if not os.path.isabs(root):
+        root = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", root))
+    return {
+        "enabled": bool(cfg.get("enabled", True)),
+        "dir": root,
+        "max_entries": int(cfg.get("max_entries", 20000) or 0),
+        "max_mb": float(cfg.get("max_mb", 500) or 0),
+        "ttl_hours": float(cfg.get("ttl_hours", 0) or 0),
+    }
+
+
+SETTINGS = _settings()
+
+
+def enabled() -> bool:
+    return SETTINGS["enabled"]
+
+
+def prompt_versions() -> dict:
+    return {name: getattr(prompts, name) for name in sorted(dir(prompts)) if name.endswith("_PROMPT_VERSION")}
+
+
+def make_key(stage: str, payload: dict) -> str:
+    request = {k: v for k, v in payload.items() if k != "stream"}
+    material = json.dumps(
+        {"stage": stage, "request": request, "versions": prompt_versions()},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(SETTINGS["dir"], key[:2], f"{key}.json")
+
+
+def _read(key: str) -> dict | None:
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    ttl = SETTINGS["ttl_hours"]
+    if ttl > 0 and time.time() - os.path.getmtime(path) > ttl * 3600:
+        discard(key)
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception:
+        return None
+    try:
+        # mtime doubles as "last used" for LRU eviction
+        os.utime(path, None)
+    except OSError:
+        pass
+    return entry.get("response")
+
+
+def get(key: str) -> dict | None:
+    result = _read(key)
+    STATS["hits" if result is not None else "misses"] += 1
+    return result
+
+
+def lookup(keys: list[str]) -> tuple[str | None, dict | None]:
+    """First hit among equivalent keys (counted as one lookup)."""
+    for key in keys:
+        result = _read(key)
+        if result is not None:
+            STATS["hits"] += 1
+            return key, result
+    STATS["misses"] += 1
+    return None, None
+
+
+def put(key: str, response: dict, stage: str = "", model: str = "") -> None:
+    global _writes_since_prune
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({
+                "stage": stage,
+                "model": model,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "response": response,
+            }, f, ensure_ascii=False)
+        os.replace(temp, path)
+        STATS["writes"] += 1
+    except Exception:
+        return
+    _writes_since_prune += 1
+    if _writes_since_prune >= PRUNE_EVERY:
+        _writes_since_prune = 0
+        prune()
+
+
+def discard(key: str) -> None:
+    """Drops an entry whose response could not be used (e.g. parse error)."""
+    try:
+        os.remove(_path(key))
+        STATS["discarded"] += 1
+    except OSError:
+        pass
+
+
+def _entries() -> list[tuple[float, int, str]]:
+    rows = []
+    root = SETTINGS["dir"]
+    if not os.path.isdir(root):
+        return rows
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            rows.append((st.st_mtime, st.st_size, path))
+    return rows
+
+
+def prune(max_entries: int | None = None, max_mb: float | None = None) -> int:
+    """LRU eviction (least recently used first) down to max_entries / max_mb; expired entries go first."""
+    max_entries = SETTINGS["max_entries"] if max_entries is None else max_entries
+    max_mb = SETTINGS["max_mb"] if max_mb is None else max_mb
+    rows = sorted(_entries())
+    ttl = SETTINGS["ttl_hours"]
+    now = time.time()
+    total = sum(size for _, size, _ in rows)
+    removed = 0
+    for mtime, size, path in rows:
+        over_count = max_entries > 0 and len(rows) - removed > max_entries
+        over_size = max_mb > 0 and total > max_mb * 1024 * 1024
+        expired = ttl > 0 and now - mtime > ttl * 3600
+        if not (over_count or over_size or expired):
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        total -= size
+    STATS["evicted"] += removed
+    return removed
+
+
+def summary() -> str:
+    lookups = STATS["hits"] + STATS["misses"]
+    rate = (STATS["hits"] / lookups * 100.0) if lookups else 0.0
+    return (
+        f"hits={STATS['hits']} misses={STATS['misses']} ({rate:.1f}% hit rate) "
+        f"writes={STATS['writes']} evicted={STATS['evicted']} discarded={STATS['discarded']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the LLM response cache")
+    parser.add_argument("command", choices=["stats", "prune", "clear"], help="stats | prune (LRU to limits) | clear (remove all)")
+    parser.add_argument("--max-entries", type=int, help="Override llm_cache.max_entries for prune")
+    parser.add_argument("--max-mb", type=float, help="Override llm_cache.max_mb for prune")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        rows = _entries()
+        size_mb = sum(size for _, size, _ in rows) / (1024 * 1024)
+        print(f"{SETTINGS['dir']}: entries={len(rows)} size={size_mb:.1f} MB "
+              f"(limits: entries={SETTINGS['max_entries']} size={SETTINGS['max_mb']:g} MB ttl={SETTINGS['ttl_hours']:g}h)")
+        return
+    if args.command == "clear":
+        removed = 0
+        for _, _, path in _entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        print(f"🧹 Cleared {removed} cached responses")
+        return
+    removed = prune(args.max_entries, args.max_mb)
+    print(f"🧹 Evicted {removed} cached responses")
+
+
+if __name__ == "__main__":
+    main()
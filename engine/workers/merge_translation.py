@@ -2,20 +2,24 @@ import json
 import os
 import re
 import argparse
-import datetime
 
 from init_structure import (
     custom_json_dump,
     load_aliases,
     find_alias_hits,
+    AliasIndex,
     compute_capitalized_counts,
     DE_ENTITIES_CFG,
 )
+from story_store import read_deltas, replay_deltas, clear_deltas
+from checkpoints import create_checkpoint
 
 
 def load_story(path: str) -> list:
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        data = json.load(f)
+    replay_deltas(data, read_deltas(path))
+    return data
 
 
 def build_translation_map(data: list, prefer_field: str = "text") -> dict:
@@ -76,7 +80,7 @@ def main():
                         choices=["text", "analysis_translation_draft", "analysis_translation"],
                         help="Field to copy from translation-data (default: text)")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing analysis_translation_draft")
-    parser.add_argument("--backup", action="store_true", help="Create a .bak copy of the target file")
+    parser.add_argument("--backup", action="store_true", help="Create a checkpoint of the target file (checkpoints.py)")
     parser.add_argument("--update-alias-hits", action="store_true", help="Also compute alias_hits from translation text")
     parser.add_argument("--aliases-file", action="append", dest="aliases_files",
                         help="Alias JSON path(s) to use for translation hits (repeatable)")
@@ -91,13 +95,9 @@ def main():
     tmap = build_translation_map(tdata, prefer_field=args.prefer_field)
 
     if args.backup:
-        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        bak = f"{args.data}.{ts}.bak"
-        with open(args.data, "r", encoding="utf-8") as f:
-            raw = f.read()
-        with open(bak, "w", encoding="utf-8") as f:
-            f.write(raw)
-        print(f"Backup written: {bak}")
+        manifest = create_checkpoint(args.data, label="merge_translation")
+        if manifest:
+            print(f"Checkpoint written: {manifest['id']}")
 
     # Optional: build alias hits from translation text
     aliases = []
@@ -108,6 +108,7 @@ def main():
             # Default to German alias seed if none provided
             alias_files = [os.path.join(os.path.dirname(__file__), "..", "config", "aliases_de.json")]
         aliases = load_aliases(alias_files)
+        alias_index = AliasIndex(aliases)
         if args.language == "de" and DE_ENTITIES_CFG.get("enable_capitalized_heuristic"):
             cap_data = []
             for vid, text in tmap.items():
@@ -138,7 +139,7 @@ def main():
             merged += 1
         if args.update_alias_hits and aliases:
             words = tokenize_translation(tval)
-            new_hits = find_alias_hits(words, aliases, language=args.language, cap_counts=cap_counts, cap_cfg=DE_ENTITIES_CFG)
+            new_hits = find_alias_hits(words, alias_index, language=args.language, cap_counts=cap_counts, cap_cfg=DE_ENTITIES_CFG)
             for h in new_hits:
                 if "alias_label" not in h:
                     h["alias_label"] = None
@@ -148,6 +149,7 @@ def main():
             alias_updated += 1
 
     custom_json_dump(data, args.data)
+    clear_deltas(args.data)
     print(f"Merged translations: {merged}")
     print(f"Skipped existing: {skipped_existing}")
     print(f"Missing in source: {missing}")
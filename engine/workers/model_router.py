@@ -0,0 +1,235 @@
+import asyncio
+import random
+import time
+
+# Least-loaded routing across the LM Studio model identifiers in config["models"].
+# Every request takes a slot on one model (acquire) and gives it back with its
+# outcome (release). A fresh request goes to the model with the most free slots;
+# ties are broken by observed latency and error rate (EWMA). Stateful chained
+# requests are pinned to the model that holds their previous_response_id.
+#
+# With adaptive concurrency the per-model slot count follows AIMD: +1 after a
+# full window of healthy answers (window = current limit; healthy = latency EWMA
+# within latency_factor x the slow baseline EWMA, or below latency_slo seconds), and
+# x decrease_factor on overload signals (timeouts, 400 context errors, 500s),
+# at most once per cooldown so one burst of failures only backs off once.
+#
+# An optional CircuitBreakers board removes models whose circuit is open from
+# routing until a half-open probe succeeds.
+LATENCY_ALPHA = 0.2
+BASELINE_ALPHA = 0.02
+ERROR_ALPHA = 0.1
+ERROR_WEIGHT = 4.0
+
+
+def adaptive_settings(api_cfg: dict) -> dict:
+    """Reads config["api"]["concurrency"]; static max_concurrent_per_model when disabled."""
+    base = int(api_cfg.get("max_concurrent_per_model", 4))
+    cfg = api_cfg.get("concurrency", {}) or {}
+    enabled = bool(cfg.get("adaptive", False))
+    initial = int(cfg.get("initial", base))
+    return {
+        "adaptive": enabled,
+        "initial": initial,
+        "min": max(1, int(cfg.get("min", 1))) if enabled else initial,
+        "max": max(initial, int(cfg.get("max", initial))) if enabled else initial,
+        "decrease_factor": float(cfg.get("decrease_factor", 0.5)),
+        "latency_factor": float(cfg.get("latency_factor", 2.0)),
+        "latency_slo": float(cfg.get("latency_slo", 0) or 0),
+        "cooldown": float(cfg.get("cooldown", 5.0)),
+    }
+
+
+class ModelRouter:
+    def __init__(self, models: list[str], limit: int, strategy: str = "least_loaded", adaptive: dict | None = None, log=None, breakers=None):
+        self.models = list(models)
+        self.breakers = breakers
+        self.strategy = strategy
+        self.adaptive = adaptive or {"adaptive": False, "initial": limit, "min": limit, "max": limit}
+        self.log = log or print
+        start = self.adaptive.get("initial", limit) if self.adaptive.get("adaptive") else limit
+        self.limits = {m: max(1, int(start)) for m in self.models}
+        self.min_limit = {m: self.limits[m] for m in self.models}
+        self.max_limit = {m: self.limits[m] for m in self.models}
+        self.healthy_streak = {m: 0 for m in self.models}
+        self.last_decrease = {m: 0.0 for m in self.models}
+        self.baseline = {m: None for m in self.models}
+        self.inflight = {m: 0 for m in self.models}
+        self.peak = {m: 0 for m in self.models}
+        self.requests = {m: 0 for m in self.models}
+        self.errors = {m: 0 for m in self.models}
+        self.latency = {m: None for m in self.models}
+        self.error_rate = {m: 0.0 for m in self.models}
+        self._cond = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the router can be built before the event loop runs.
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _ensure(self, model: str) -> None:
+        if model in self.inflight:
+            return
+        self.models.append(model)
+        self.limits[model] = max(self.limits.values(), default=1)
+        self.min_limit[model] = self.limits[model]
+        self.max_limit[model] = self.limits[model]
+        self.healthy_streak[model] = 0
+        self.last_decrease[model] = 0.0
+        self.baseline[model] = None
+        self.inflight[model] = 0
+        self.peak[model] = 0
+        self.requests[model] = 0
+        self.errors[model] = 0
+        self.latency[model] = None
+        self.error_rate[model] = 0.0
+
+    def free(self, model: str) -> int:
+        return self.limits[model] - self.inflight[model]
+
+    def _cost(self, model: str) -> float:
+        latency = self.latency[model]
+        if latency is None:
+            return 0.0  # unobserved models are tried first
+        return latency * (1.0 + ERROR_WEIGHT * self.error_rate[model])
+
+    def _eligible(self, candidates=None) -> list[str]:
+        free = [m for m in (candidates or self.models) if self.free(m) > 0]
+        if self.breakers is not None:
+            free = self.breakers.usable(free)
+        return free
+
+    def available(self, model: str) -> bool:
+        return self.breakers is None or self.breakers.available(model)
+
+    def pick(self, candidates=None) -> str | None:
+        """Model for the next request (without taking a slot), or None when all are busy."""
+        free = self._eligible(candidates)
+        if not free:
+            return None
+        if self.strategy == "random":
+            return random.choice(free)
+        return max(free, key=lambda m: (self.free(m), -self._cost(m)))
+
+    def preferred(self, candidates=None) -> str:
+        """Best guess for the next request, used before a slot is taken (payload/cache key)."""
+        pool = candidates or self.models
+        return self.pick(pool) or min(pool, key=lambda m: (self.inflight[m] - self.limits[m], self._cost(m)))
+
+    async def acquire(self, pinned: str | None = None, candidates=None) -> str:
+        """Waits for a free slot (on `pinned` if given) and returns the chosen model."""
+        if pinned:
+            self._ensure(pinned)
+            candidates = [pinned]
+        cond = self._condition()
+        async with cond:
+            while True:
+                model = self.pick(candidates)
+                if model is not None:
+                    break
+                # Open circuits re-admit traffic on a timer, not on a release.
+                wait = self.breakers.retry_in(candidates or self.models) if self.breakers is not None else 0
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=min(wait, 5.0))
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await cond.wait()
+            if self.breakers is not None:
+                self.breakers.dispatch(model)
+            self.inflight[model] += 1
+            self.requests[model] += 1
+            if self.inflight[model] > self.peak[model]:
+                self.peak[model] = self.inflight[model]
+            return model
+
+    def capacity(self) -> int:
+        """Upper bound of concurrent requests across all models (sizes the worker pool)."""
+        if self.adaptive.get("adaptive"):
+            return int(self.adaptive["max"]) * len(self.models)
+        return sum(self.limits.values())
+
+    def _healthy(self, model: str) -> bool:
+        latency = self.latency[model]
+        slo = self.adaptive.get("latency_slo", 0)
+        if slo:
+            return latency <= slo
+        return latency <= self.baseline[model] * self.adaptive.get("latency_factor", 2.0)
+
+    def _set_limit(self, model: str, limit: int, reason: str) -> None:
+        old = self.limits[model]
+        limit = max(int(self.adaptive["min"]), min(int(self.adaptive["max"]), limit))
+        if limit == old:
+            return
+        self.limits[model] = limit
+        self.min_limit[model] = min(self.min_limit[model], limit)
+        self.max_limit[model] = max(self.max_limit[model], limit)
+        arrow = "📈" if limit > old else "📉"
+        self.log(f"{arrow} Concurrency [{model}]: {old} -> {limit} ({reason})")
+
+    def _adapt(self, model: str, elapsed: float | None, ok: bool, overloaded: bool) -> None:
+        if not self.adaptive.get("adaptive"):
+            return
+        if overloaded:
+            self.healthy_streak[model] = 0
+            now = time.monotonic()
+            if now - self.last_decrease[model] < self.adaptive.get("cooldown", 5.0):
+                return
+            self.last_decrease[model] = now
+            self._set_limit(model, int(self.limits[model] * self.adaptive.get("decrease_factor", 0.5)), "overload")
+            return
+        if not ok or elapsed is None:
+            return
+        if not self._healthy(model):
+            self.healthy_streak[model] = 0
+            return
+        self.healthy_streak[model] += 1
+        # Additive increase only while the current limit is actually in use.
+        if self.healthy_streak[model] >= self.limits[model] and self.inflight[model] >= self.limits[model]:
+            self.healthy_streak[model] = 0
+            self._set_limit(model, self.limits[model] + 1, "healthy")
+
+    async def release(self, model: str, started: float | None = None, ok: bool = True, overloaded: bool = False, failed: bool = False) -> None:
+        """
+        Returns a slot. overloaded=True marks timeouts / 400 / 500 answers (backs off
+        the limit); failed=True marks instance failures for the circuit breaker.
+        """
+        cond = self._condition()
+        async with cond:
+            if self.breakers is not None:
+                self.breakers.record(model, failed)
+            elapsed = None
+            if started is not None and ok:
+                elapsed = time.monotonic() - started
+                prev = self.latency[model]
+                self.latency[model] = elapsed if prev is None else prev + LATENCY_ALPHA * (elapsed - prev)
+                base = self.baseline[model]
+                self.baseline[model] = elapsed if base is None else base + BASELINE_ALPHA * (elapsed - base)
+            if not ok:
+                self.errors[model] += 1
+            self.error_rate[model] += ERROR_ALPHA * ((0.0 if ok else 1.0) - self.error_rate[model])
+            self._adapt(model, elapsed, ok, overloaded)
+            self.inflight[model] = max(0, self.inflight[model] - 1)
+            cond.notify_all()
+
+    def limits_line(self) -> str:
+        return ", ".join(f"{m}={self.limits[m]}" for m in self.models)
+
+    def load(self, model: str) -> str:
+        return f"{self.inflight[model]}/{self.limits[model]}"
+
+    def summary(self) -> str:
+        parts = []
+        for m in self.models:
+            latency = self.latency[m]
+            lat = f"{latency:.2f}s" if latency is not None else "-"
+            limit = f"limit={self.limits[m]}"
+            if self.adaptive.get("adaptive"):
+                limit += f" (range {self.min_limit[m]}-{self.max_limit[m]})"
+            parts.append(
+                f"{m}: requests={self.requests[m]} errors={self.errors[m]} "
+                f"peak_inflight={self.peak[m]} {limit} latency={lat}"
+            )
+        return " | ".join(parts)
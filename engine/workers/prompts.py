@@ -1,22 +1,38 @@
 import json
+import re
 try:
-    from .fidel_ops import GEZ_SUFFIX_MATH, decompose_word
+    from .fidel_ops import GEZ_SUFFIX_MATH, decompose_word, fidel_orders
 except ImportError:
-    from fidel_ops import GEZ_SUFFIX_MATH, decompose_word
+    from fidel_ops import GEZ_SUFFIX_MATH, decompose_word, fidel_orders
 
-MORPHOLOGY_PROMPT_VERSION = "v1.0.0"
-SYNTAX_PROMPT_VERSION = "v1.0.0"
-SEMANTIC_PROMPT_VERSION = "v1.0.0"
-TRANSLATION_PROMPT_VERSION = "v1.0.0"
+MORPHOLOGY_PROMPT_VERSION = "v1.1.0"
+SYNTAX_PROMPT_VERSION = "v1.1.0"
+SEMANTIC_PROMPT_VERSION = "v1.1.0"
+TRANSLATION_PROMPT_VERSION = "v1.1.0"
+BATCH_PROMPT_VERSION = "v1.1.0"
+
+# Prompt layout: every builder returns the static part (instructions, reference
+# tables, output format) first, then PROMPT_INPUT_MARKER, then the verse data.
+# Identical leading bytes across verses let the server reuse its cached prefix;
+# split_prompt() separates both parts for the system-message mode.
+PROMPT_INPUT_MARKER = "=== INPUT ==="
+
+
+def _layout(static: str, variable: str) -> str:
+    return f"{static}{PROMPT_INPUT_MARKER}\n{variable}"
+
+
+def split_prompt(prompt: str) -> tuple[str, str]:
+    """(static prefix, variable part); ("", prompt) for prompts without the marker."""
+    static, sep, variable = str(prompt).partition(PROMPT_INPUT_MARKER + "\n")
+    if not sep:
+        return "", str(prompt)
+    return static.rstrip(), variable
 
 # -----------------------------------------------------------------------------
 # 0. GRAPHEMATIC
 # -----------------------------------------------------------------------------
-def build_graphematic_prompt(text: str, verse_meta: dict | None = None) -> str:
-    payload = {"text": text}
-    if verse_meta:
-        payload["verse_meta"] = verse_meta
-        
+def _graphematic_instructions() -> str:
     return (
         "SYSTEM CHECK: Did you receive the input text completely? Confirm with 'OK'. "
         "If the text is incomplete or cut off, output ONLY the error location.\n\n"
@@ -27,19 +43,20 @@ def build_graphematic_prompt(text: str, verse_meta: dict | None = None) -> str:
         "2. Identify any scanning artifacts or anomalies.\n"
         "3. Provide a brief status report.\n"
         "4. Do NOT output JSON.\n\n"
-        f"Input Text:\n{text}\n\n"
-        "REVIEW:"
     )
 
+
+def build_graphematic_prompt(text: str, verse_meta: dict | None = None) -> str:
+    payload = {"text": text}
+    if verse_meta:
+        payload["verse_meta"] = verse_meta
+
+    return _layout(_graphematic_instructions(), f"Input Text:\n{text}\n\nREVIEW:")
+
 # -----------------------------------------------------------------------------
 # 1. MORPHOLOGY (With Fidel Math)
 # -----------------------------------------------------------------------------
-def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict | None = None, registry_context: list | None = None, compact: bool = False) -> str:
-    """
-    Constructs the prompt injecting Fidel Math to guide the small model.
-    Input "tokens" should be a list of surface strings or pre-decomposed objects.
-    """
-    
+def _morph_processed_tokens(tokens: list, compact: bool = False) -> list:
     # Pre-process tokens using the Linguistic Compiler logic
     processed_tokens = []
     for t in tokens:
@@ -47,12 +64,10 @@ def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict
             surface = t.get("surface") or t.get("text") or ""
             if not surface:
                 continue
-            decomp = decompose_word(surface)
             if compact:
                 pp = t.get("pre_processing", {})
                 ont = pp.get("ontology", {})
-                fm = decomp.get("fidel_math") or []
-                order_seq = [m.get("o") for m in fm if isinstance(m, dict) and m.get("o")]
+                order_seq = [o for o in fidel_orders(surface) if o]
                 entry = {
                     "i": t.get("word_id"),
                     "s": surface,
@@ -70,6 +85,7 @@ def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict
                 # drop empty keys
                 entry = {k: v for k, v in entry.items() if v is not None and v != "" and v != []}
             else:
+                decomp = decompose_word(surface)
                 entry = {
                     "surface": surface,
                     "fidel_math": decomp.get("fidel_math"),
@@ -78,29 +94,28 @@ def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict
                 for key in ["word_id", "char_ids", "pre_processing"]:
                     if key in t:
                         entry[key] = t[key]
+                if "char_ids" in entry:
+                    # May be a columnar CharIdRange view; the payload goes through json.dumps.
+                    entry["char_ids"] = list(entry["char_ids"])
             processed_tokens.append(entry)
         else:
             surface = t if isinstance(t, str) else str(t)
             if surface:
                 if compact:
-                    decomp = decompose_word(surface)
-                    fm = decomp.get("fidel_math") or []
-                    order_seq = [m.get("o") for m in fm if isinstance(m, dict) and m.get("o")]
-                    processed_tokens.append({"s": surface, "fm": order_seq})
+                    processed_tokens.append({"s": surface, "fm": [o for o in fidel_orders(surface) if o]})
                 else:
                     processed_tokens.append(decompose_word(surface))
+    return processed_tokens
 
-    payload = {
-        "tokens_context": processed_tokens,
-        "available_pos_tags": pos_tags
-    }
-    if verse_meta:
-        payload["verse_meta"] = verse_meta
-    if registry_context:
-        payload["registry_context"] = registry_context
 
+def _morph_input_json(payload: dict, compact: bool) -> str:
+    if compact:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(payload, ensure_ascii=False, indent=2)
+
+
+def _morph_instructions(compact: bool) -> str:
     if compact:
-        input_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
         suffix_line = "; ".join([f"{k}={v}" for k, v in GEZ_SUFFIX_MATH.items()])
         keys_line = (
             "Keys: s=surface, fm=order-seq, o=last-order, rk=root_key, a=asset_tag, "
@@ -116,7 +131,22 @@ def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict
             "1. Analyze the 'fm' sequence for each token.\n"
             "2. If rk/a are provided, USE THEM strictly.\n"
             "3. Derive POS and syntax role from suffix order.\n\n"
-            f"INPUT DATA:\n{input_json}\n\n"
+        )
+    return (
+        "Instruction: Use Ge'ez Suffix Mathematics to decode tokens.\n"
+        "Context: You are a logic engine for an Abugida script. Do NOT translate freely.\n\n"
+        "REFERENCE TABLE (Suffix Math):\n"
+        f"{json.dumps(GEZ_SUFFIX_MATH, indent=2, ensure_ascii=False)}\n\n"
+        "TASK:\n"
+        "1. Analyze the 'fidel_math' (c=Char, o=Order) for each token.\n"
+        "2. If 'lexical_info' is provided (from DB), USE IT strictly.\n"
+        "3. Determine the POS and Morphological breakdown based on the suffix order.\n\n"
+    )
+
+
+def _morph_output_format(compact: bool) -> str:
+    if compact:
+        return (
             "OUTPUT FORMAT (Strict JSON):\n"
             "{\n"
             "  \"schema\": \"morph.v2.compact\",\n"
@@ -131,19 +161,9 @@ def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict
             "      \"fx\": [\"OPTIONAL_FLAGS\"]\n"
             "    }\n"
             "  ]\n"
-            "}"
+            "}\n\n"
         )
-
     return (
-        "Instruction: Use Ge'ez Suffix Mathematics to decode tokens.\n"
-        "Context: You are a logic engine for an Abugida script. Do NOT translate freely.\n\n"
-        "REFERENCE TABLE (Suffix Math):\n"
-        f"{json.dumps(GEZ_SUFFIX_MATH, indent=2, ensure_ascii=False)}\n\n"
-        "TASK:\n"
-        "1. Analyze the 'fidel_math' (c=Char, o=Order) for each token.\n"
-        "2. If 'lexical_info' is provided (from DB), USE IT strictly.\n"
-        "3. Determine the POS and Morphological breakdown based on the suffix order.\n\n"
-        f"INPUT DATA:\n{json.dumps(payload, ensure_ascii=False, indent=2)}\n\n"
         "OUTPUT FORMAT (Strict JSON):\n"
         "{\n"
         "  \"tokens\": [\n"
@@ -158,7 +178,27 @@ def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict
         "      }\n"
         "    }\n"
         "  ]\n"
-        "}"
+        "}\n\n"
+    )
+
+
+def build_morphology_prompt(tokens: list, pos_tags: list[str], verse_meta: dict | None = None, registry_context: list | None = None, compact: bool = False) -> str:
+    """
+    Constructs the prompt injecting Fidel Math to guide the small model.
+    Input "tokens" should be a list of surface strings or pre-decomposed objects.
+    """
+    payload = {
+        "tokens_context": _morph_processed_tokens(tokens, compact),
+        "available_pos_tags": pos_tags
+    }
+    if verse_meta:
+        payload["verse_meta"] = verse_meta
+    if registry_context:
+        payload["registry_context"] = registry_context
+
+    return _layout(
+        _morph_instructions(compact) + _morph_output_format(compact),
+        f"INPUT DATA:\n{_morph_input_json(payload, compact)}\n\nJSON:"
     )
 
 def build_morphology_prompt_text(tokens: list, pos_tags: list[str], verse_meta: dict | None = None) -> str:
@@ -178,9 +218,7 @@ def build_morphology_prompt_text(tokens: list, pos_tags: list[str], verse_meta:
         order = pp.get("grammatical_vowel")
         pattern = (pp.get("unknown_fallback") or {}).get("pattern")
         if not pattern:
-            decomp = decompose_word(surface)
-            fm = decomp.get("fidel_math") or []
-            pattern = "-".join(str(m.get("o")) for m in fm if isinstance(m, dict) and m.get("o"))
+            pattern = "-".join(str(o) for o in fidel_orders(surface) if o)
         root_key = ont.get("root_key") or "?"
         asset_tag = ont.get("asset_tag") or "?"
         prefix = pp.get("prefix") or ""
@@ -202,16 +240,16 @@ def build_morphology_prompt_text(tokens: list, pos_tags: list[str], verse_meta:
     if verse_meta:
         meta_line = f"Verse: {verse_meta.get('verse_id')} | pacing={verse_meta.get('verse_metrics')}\n"
 
-    return (
+    return _layout(
         "Instruction: Perform Morphological Analysis (Level B) for each token.\n"
         "Goal: Determine POS and syntax role using suffix math and the hints.\n"
         "Do NOT translate or paraphrase the verse.\n"
         "Do NOT output JSON or bullet lists.\n"
         "Write one short line per token, in the same order, starting with the token id (t1, t2, ...).\n"
         "Each line must include POS=<tag> and ROLE=<tag> and may include ROOT=<root_key>.\n\n"
-        f"{meta_line}"
         f"Allowed POS tags: {pos_line}\n"
-        f"Suffix Math: {suffix_line}\n\n"
+        f"Suffix Math: {suffix_line}\n\n",
+        f"{meta_line}"
         "TOKENS:\n"
         + "\n".join(lines)
         + "\n\n"
@@ -220,10 +258,10 @@ def build_morphology_prompt_text(tokens: list, pos_tags: list[str], verse_meta:
 
 def build_morphology_review_prompt(morph_data: dict, verse_meta: dict | None = None) -> str:
     meta = verse_meta or {}
-    return (
+    return _layout(
         "Instruction: Review the Morphological Analysis (Level B).\n"
         "Goal: Identify errors or inconsistencies. If none, say 'OK'.\n"
-        "Format: Plain text review. Do NOT output JSON.\n\n"
+        "Format: Plain text review. Do NOT output JSON.\n\n",
         f"MORPHOLOGIC DATA:\n{json.dumps(morph_data, ensure_ascii=False, indent=2)}\n\n"
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
         "REVIEW:"
@@ -232,6 +270,23 @@ def build_morphology_review_prompt(morph_data: dict, verse_meta: dict | None = N
 # -----------------------------------------------------------------------------
 # 2. SYNTAX
 # -----------------------------------------------------------------------------
+def _syntax_output_format(structure_example: str) -> str:
+    return (
+        "OUTPUT FORMAT (Strict JSON):\n"
+        "{\n"
+        "  \"syntax\": {\n"
+        "    \"parses\": [\n"
+        "      {\n"
+        "        \"id\": \"S1\",\n"
+        f"        \"structure_type\": \"{structure_example}\",\n"
+        "        \"bracket_notation\": \"[NP ...]\",\n"
+        "        \"dependencies\": [\"t1->t2\"]\n"
+        "      }\n"
+        "    ]\n"
+        "  }\n"
+        "}\n\n"
+    )
+
 def build_syntax_prompt(morph_analysis: dict, verse_meta: dict | None = None, registry_context: list | None = None) -> str:
     # Legacy / Standalone Mode
     meta = {}
@@ -245,33 +300,27 @@ def build_syntax_prompt(morph_analysis: dict, verse_meta: dict | None = None, re
             "Compact Morph Schema: tokens[i,s,r,p,role,o,fx]. "
             "Use r=root, p=POS, role=syntax role, o=order.\n\n"
         )
-    return (
+    return _layout(
         "Instruction: Perform Syntactic Analysis (Level C).\n"
         "Goal: Link the analyzed tokens based on their Grammatical Notes.\n\n"
+        + _syntax_output_format("Nominal Chain"),
         f"{compact_hint}"
         f"Morphological Data:\n{json.dumps(morph_analysis, ensure_ascii=False, indent=2)}\n\n"
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
-        "OUTPUT FORMAT (Strict JSON):\n"
-        "{\n"
-        "  \"syntax\": {\n"
-        "    \"parses\": [\n"
-        "      {\n"
-        "        \"id\": \"S1\",\n"
-        "        \"structure_type\": \"Nominal Chain\",\n"
-        "        \"bracket_notation\": \"[NP ...]\",\n"
-        "        \"dependencies\": [\"t1->t2\"]\n"
-        "      }\n"
-        "    ]\n"
-        "  }\n"
-        "}"
+        "JSON:"
     )
 
-def build_syntax_review_prompt(syntax_data: dict, verse_meta: dict | None = None) -> str:
-    meta = verse_meta or {}
+def _syntax_review_instructions() -> str:
     return (
         "Instruction: Review the Syntactic Analysis (Level C).\n"
         "Goal: Identify errors or inconsistencies. If none, say 'OK'.\n"
         "Format: Plain text review. Do NOT output JSON.\n\n"
+    )
+
+def build_syntax_review_prompt(syntax_data: dict, verse_meta: dict | None = None) -> str:
+    meta = verse_meta or {}
+    return _layout(
+        _syntax_review_instructions(),
         f"SYNTACTIC DATA:\n{json.dumps(syntax_data, ensure_ascii=False, indent=2)}\n\n"
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
         "REVIEW:"
@@ -284,24 +333,13 @@ def build_syntax_prompt_chained(verse_meta: dict | None = None, registry_context
         meta["verse_meta"] = verse_meta
     if registry_context:
         meta["registry_context"] = registry_context
-    return (
+    return _layout(
         "Instruction: Perform Syntactic Analysis (Level C) on the tokens you just analyzed.\n"
         "Goal: Link the tokens based on the Grammatical Notes you identified.\n\n"
         "If previous morphology was compact, tokens use keys: i,s,r,p,role,o,fx.\n\n"
+        + _syntax_output_format("Nominal Chain (e.g., Construct State)"),
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
-        "OUTPUT FORMAT (Strict JSON):\n"
-        "{\n"
-        "  \"syntax\": {\n"
-        "    \"parses\": [\n"
-        "      {\n"
-        "        \"id\": \"S1\",\n"
-        "        \"structure_type\": \"Nominal Chain (e.g., Construct State)\",\n"
-        "        \"bracket_notation\": \"[NP ...]\",\n"
-        "        \"dependencies\": [\"t1->t2\"]\n"
-        "      }\n"
-        "    ]\n"
-        "  }\n"
-        "}"
+        "JSON:"
     )
 
 # -----------------------------------------------------------------------------
@@ -319,7 +357,7 @@ def build_semantic_prompt_with_skins(parses: list[dict], genre: str = "neutral",
     if registry_context:
         meta["registry_context"] = registry_context
     
-    return (
+    return _layout(
         f"Instruction: Perform a com Semantic and Historical Analysis of the verse.\n"
         f"Context: Apply the '{genre}' perspective. {genre_rules.get(genre, genre_rules['neutral'])}\n\n"
         "TASK:\n"
@@ -327,7 +365,7 @@ def build_semantic_prompt_with_skins(parses: list[dict], genre: str = "neutral",
         "2. discuss historical context, theological implications, or parallels (e.g., Book of Enoch, Bible).\n"
         "3. Explain specific word choices or ambiguities.\n"
         "4. Provide a coherent interpretation.\n\n"
-        "Write a clear, structured essay.\n\n"
+        "Write a clear, structured essay.\n\n",
         f"Input Syntax Parses:\n{json.dumps(parses, ensure_ascii=False, indent=2)}\n\n"
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
         "ANALYSIS:"
@@ -345,7 +383,7 @@ def build_semantic_prompt_chained(genre: str = "neutral", verse_meta: dict | Non
     if registry_context:
         meta["registry_context"] = registry_context
     
-    return (
+    return _layout(
         f"Instruction: Perform a deep Semantic and Historical Analysis based on your previous syntax work.\n"
         f"Context: Apply the '{genre}' perspective. {genre_rules.get(genre, genre_rules['neutral'])}\n\n"
         "TASK:\n"
@@ -353,7 +391,7 @@ def build_semantic_prompt_chained(genre: str = "neutral", verse_meta: dict | Non
         "2. Discuss historical context, theological implications, or parallels.\n"
         "3. Explain specific word choices or ambiguities.\n"
         "4. Provide a coherent interpretation.\n\n"
-        "Write a clear, structured essay.\n\n"
+        "Write a clear, structured essay.\n\n",
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
         "ANALYSIS:"
     )
@@ -361,6 +399,24 @@ def build_semantic_prompt_chained(genre: str = "neutral", verse_meta: dict | Non
 # -----------------------------------------------------------------------------
 # 4. TRANSLATION SPACE
 # -----------------------------------------------------------------------------
+def _translation_output_format() -> str:
+    return (
+        "Output strictly valid JSON:\n"
+        "{\n"
+        "  \"translation_space\": {\n"
+        "    \"variants\": [\n"
+        "      {\n"
+        "        \"id\": \"T1\",\n"
+        "        \"text\": \"...\",\n"
+        "        \"parse_ref\": \"S1\",\n"
+        "        \"token_map\": [{\"token_id\": \"t1\", \"option_id\": \"A\"}],\n"
+        "        \"notes\": \"\"\n"
+        "      }\n"
+        "    ]\n"
+        "  }\n"
+        "}\n\n"
+    )
+
 def build_translation_prompt(parses: list, tokens: list, semantic_analysis: str | dict | None = None, verse_meta: dict | None = None, registry_context: list | None = None) -> str:
     # Prepare payload with syntactic and morphologic data
     data_context = {"parses": parses, "tokens": tokens}
@@ -378,30 +434,18 @@ def build_translation_prompt(parses: list, tokens: list, semantic_analysis: str
     if registry_context:
         meta["registry_context"] = registry_context
 
-    return (
+    return _layout(
         "Instruction: Generate a constrained translation space.\n"
         "Goal: Provide literal variants mapped to parse + token option IDs.\n\n"
         "Rules:\n"
         "1. Use the provided Semantic Analysis as the guide for meaning.\n"
         "2. Map each variant to parse_ref and token_map.\n"
         "3. No free paraphrase outside the variants.\n\n"
+        + _translation_output_format(),
         f"SEMANTIC ANALYSIS (Guide):\n{sem_text}\n\n"
         f"SYNTAX & MORPHOLOGY (Data):\n{json.dumps(data_context, ensure_ascii=False, indent=2)}\n\n"
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
-        "Output strictly valid JSON:\n"
-        "{\n"
-        "  \"translation_space\": {\n"
-        "    \"variants\": [\n"
-        "      {\n"
-        "        \"id\": \"T1\",\n"
-        "        \"text\": \"...\",\n"
-        "        \"parse_ref\": \"S1\",\n"
-        "        \"token_map\": [{\"token_id\": \"t1\", \"option_id\": \"A\"}],\n"
-        "        \"notes\": \"\"\n"
-        "      }\n"
-        "    ]\n"
-        "  }\n"
-        "}"
+        "JSON:"
     )
 
 def build_translation_draft_prompt(parses: list, tokens: list, semantic_analysis: str | None = None, verse_meta: dict | None = None) -> str:
@@ -409,7 +453,7 @@ def build_translation_draft_prompt(parses: list, tokens: list, semantic_analysis
     data_context = {"parses": parses, "tokens": tokens}
     meta = verse_meta or {}
 
-    return (
+    return _layout(
         "Instruction: Draft a Translation Strategy (Reasoning Phase).\n"
         "Goal: Explore translation options, ambiguities, and style before finalizing.\n\n"
         "TASK:\n"
@@ -417,7 +461,7 @@ def build_translation_draft_prompt(parses: list, tokens: list, semantic_analysis
         "2. Discuss difficult terms or grammatical constructs.\n"
         "3. Propose 2-3 variants (Literal vs. Fluent).\n"
         "4. Justify your choices.\n\n"
-        "Provide a draft translation and reasoning.\n\n"
+        "Provide a draft translation and reasoning.\n\n",
         f"SEMANTIC CONTEXT:\n{sem_text}\n\n"
         f"SYNTACTIC DATA:\n{json.dumps(data_context, ensure_ascii=False, indent=2)}\n\n"
         "DRAFT:"
@@ -431,27 +475,15 @@ def build_translation_prompt_chained(verse_meta: dict | None = None, registry_co
         meta["verse_meta"] = verse_meta
     if registry_context:
         meta["registry_context"] = registry_context
-    return (
+    return _layout(
         "Instruction: Based on your Semantic Analysis above, generate the constrained translation space now.\n"
         "Goal: Convert your analysis into the formal JSON format.\n\n"
         "Rules:\n"
         "1. Map variants to the syntax structure you analyzed.\n"
         "2. Output strictly valid JSON.\n\n"
+        + _translation_output_format(),
         f"Context Meta:\n{json.dumps(meta, ensure_ascii=False, indent=2)}\n\n"
-        "Output strictly valid JSON:\n"
-        "{\n"
-        "  \"translation_space\": {\n"
-        "    \"variants\": [\n"
-        "      {\n"
-        "        \"id\": \"T1\",\n"
-        "        \"text\": \"...\",\n"
-        "        \"parse_ref\": \"S1\",\n"
-        "        \"token_map\": [{\"token_id\": \"t1\", \"option_id\": \"A\"}],\n"
-        "        \"notes\": \"\"\n"
-        "      }\n"
-        "    ]\n"
-        "  }\n"
-        "}"
+        "JSON:"
     )
 
 # -----------------------------------------------------------------------------
@@ -519,3 +551,96 @@ def build_websearch_summary_prompt(
             lines.append(text)
     lines.append("")
     return "\n".join(lines)
+
+
+# -----------------------------------------------------------------------------
+# 6. BATCHES (several short verses per request)
+# -----------------------------------------------------------------------------
+# Every verse section starts with a delimiter line; the answer must repeat it
+# so split_batch_response can map each section back to its verse.
+BATCH_DELIMITER = "###VERSE {verse_id}###"
+_BATCH_SPLIT_RE = re.compile(r"^[ \t>*_`]*#{2,}\s*VERSE\s+(.+?)\s*#{2,}[ \t*_`]*$", re.MULTILINE)
+
+
+def batch_delimiter(verse_id) -> str:
+    return BATCH_DELIMITER.format(verse_id=verse_id)
+
+
+def _batch_sections(sections: list[tuple[str, str]]) -> str:
+    return "\n\n".join(f"{batch_delimiter(vid)}\n{body}" for vid, body in sections)
+
+
+def _batch_rules(answer: str) -> str:
+    # No verse count here: the rules belong to the static prompt prefix.
+    return (
+        "BATCH: independent verses follow. Each verse starts with a line ###VERSE <verse_id>###.\n"
+        f"Answer EVERY verse separately: repeat its ###VERSE <verse_id>### line exactly, then {answer}.\n"
+        "Do not merge verses and do not write anything outside the verse sections.\n\n"
+    )
+
+
+def build_graphematic_batch_prompt(items: list[dict]) -> str:
+    """items: [{"verse_id", "text"}] -> one Graphematic Review request."""
+    sections = [(item["verse_id"], f"Input Text:\n{item.get('text', '')}") for item in items]
+    return _layout(
+        _graphematic_instructions() + _batch_rules("its brief REVIEW"),
+        _batch_sections(sections) + "\n\nREVIEW:"
+    )
+
+
+def build_syntax_review_batch_prompt(items: list[dict]) -> str:
+    """items: [{"verse_id", "syntax_data", "verse_meta"}] -> one Syntactic Review request."""
+    sections = [
+        (
+            item["verse_id"],
+            f"SYNTACTIC DATA:\n{json.dumps(item.get('syntax_data') or {}, ensure_ascii=False, indent=2)}\n\n"
+            f"Context Meta:\n{json.dumps(item.get('verse_meta') or {}, ensure_ascii=False, indent=2)}"
+        )
+        for item in items
+    ]
+    return _layout(
+        _syntax_review_instructions() + _batch_rules("its plain text review (or 'OK')"),
+        _batch_sections(sections) + "\n\nREVIEW:"
+    )
+
+
+def build_morphology_batch_prompt(items: list[dict], pos_tags: list[str], compact: bool = False) -> str:
+    """
+    items: [{"verse_id", "tokens", "verse_meta", "registry_context"}] -> one
+    morphology request; same instructions and output schema as build_morphology_prompt.
+    """
+    sections = []
+    for item in items:
+        payload = {"tokens_context": _morph_processed_tokens(item.get("tokens") or [], compact)}
+        if item.get("verse_meta"):
+            payload["verse_meta"] = item["verse_meta"]
+        if item.get("registry_context"):
+            payload["registry_context"] = item["registry_context"]
+        sections.append((item["verse_id"], _morph_input_json(payload, compact)))
+    tags = json.dumps(pos_tags, ensure_ascii=False)
+    return _layout(
+        _morph_instructions(compact)
+        + _morph_output_format(compact)
+        + f"available_pos_tags (all verses): {tags}\n\n"
+        + _batch_rules("its Strict JSON object"),
+        f"INPUT DATA:\n{_batch_sections(sections)}"
+    )
+
+
+def split_batch_response(content: str, verse_ids: list) -> dict:
+    """
+    Splits a batched answer at the ###VERSE <id>### lines.
+    Returns {verse_id: section_text} for the requested ids that were answered.
+    """
+    wanted = {str(vid): vid for vid in verse_ids}
+    marks = list(_BATCH_SPLIT_RE.finditer(content or ""))
+    sections = {}
+    for idx, m in enumerate(marks):
+        vid = wanted.get(m.group(1).strip())
+        if vid is None or vid in sections:
+            continue
+        end = marks[idx + 1].start() if idx + 1 < len(marks) else len(content)
+        body = content[m.end():end].strip()
+        if body:
+            sections[vid] = body
+    return sections
@@ -1,12 +1,12 @@
 import json
 import os
 import argparse
-import datetime
 
 try:
     from .init_structure import (
         load_aliases,
         find_alias_hits,
+        AliasIndex,
         compute_capitalized_counts,
         _detect_language,
         _resolve_alias_files,
@@ -16,12 +16,20 @@ except ImportError:
     from init_structure import (
         load_aliases,
         find_alias_hits,
+        AliasIndex,
         compute_capitalized_counts,
         _detect_language,
         _resolve_alias_files,
         DE_ENTITIES_CFG
     )
 
+try:
+    from .story_store import load_story, rewrite_story
+    from .checkpoints import create_checkpoint
+except ImportError:
+    from story_store import load_story, rewrite_story
+    from checkpoints import create_checkpoint
+
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
 
 
@@ -32,9 +40,10 @@ def load_config():
 
 def refresh_aliases(data: list, aliases: list, update_entities: bool = True) -> int:
     changed = 0
+    alias_index = aliases if isinstance(aliases, AliasIndex) else AliasIndex(aliases)
     for verse in data:
         words = verse.get("words", []) or []
-        new_hits = find_alias_hits(words, aliases)
+        new_hits = find_alias_hits(words, alias_index)
         verse["alias_hits"] = new_hits
         if update_entities and isinstance(verse.get("analysis_entities"), dict):
             verse["analysis_entities"]["alias_hits"] = new_hits
@@ -61,20 +70,20 @@ def main():
         if not aliases:
             print("⚠️ No aliases loaded. Nothing to refresh.")
             return
+        alias_index = AliasIndex(aliases)
         if not os.path.exists(data_file):
             print(f"Data file not found: {data_file}")
             continue
 
-        with open(data_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
         cap_counts = {}
         if language == "de" and DE_ENTITIES_CFG.get("enable_capitalized_heuristic"):
-            cap_counts = compute_capitalized_counts(data, DE_ENTITIES_CFG)
-        for verse in data:
+            # Corpus-wide counts only need the words of each verse.
+            cap_counts = compute_capitalized_counts(load_story(data_file, fields=["words"]), DE_ENTITIES_CFG)
+
+        def refresh_verse(verse):
             new_hits = find_alias_hits(
                 verse.get("words", []) or [],
-                aliases,
+                alias_index,
                 language=language,
                 cap_counts=cap_counts,
                 cap_cfg=DE_ENTITIES_CFG
@@ -82,18 +91,11 @@ def main():
             verse["alias_hits"] = new_hits
             if not args.no_update_entities and isinstance(verse.get("analysis_entities"), dict):
                 verse["analysis_entities"]["alias_hits"] = new_hits
-        changed = len(data)
-
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = f"{data_file}.{timestamp}.bak"
-        try:
-            os.replace(data_file, backup_file)
-            print(f"Created backup: {backup_file}")
-        except Exception:
-            print("Warning: backup rename failed; continuing.")
-
-        with open(data_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        manifest = create_checkpoint(data_file, label="refresh_aliases:aliases")
+        if manifest:
+            print(f"Created checkpoint: {manifest['id']} (restore: checkpoints.py restore --id {manifest['id']})")
+        changed = rewrite_story(data_file, refresh_verse)
 
         print(f"Alias refresh complete: {data_file} | verses={changed}")
 
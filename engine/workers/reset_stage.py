@@ -1,28 +1,22 @@
 import json
 import os
 import sys
-import datetime
 import argparse
 
+try:
+    from .story_store import rewrite_story
+    from .checkpoints import create_checkpoint
+    from . import stage_registry
+except ImportError:
+    from story_store import rewrite_story
+    from checkpoints import create_checkpoint
+    import stage_registry
+
 # Config path
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
 
-STAGE_ORDER = [
-    "graphematic",
-    "morphologic",
-    "syntactic",
-    "semantic",
-    "websearch",
-    "translation_draft",
-    "translation",
-    "entities",
-    "asset_cards",
-]
-
-STAGE_KEY_MAP = {
-    "translation_draft": "analysis_translation_draft",
-    "translation": "analysis_translation",
-}
+# Stage names (plus mode aliases like translation_draft) in dependency order.
+STAGE_ORDER = stage_registry.stage_names(include_aliases=True)
 
 
 def load_config():
@@ -45,12 +39,17 @@ def resolve_stages(stage, downstream):
         raise ValueError(f"Unknown stage: {stage}")
     if not downstream:
         return [stage]
-    idx = STAGE_ORDER.index(stage)
-    return STAGE_ORDER[idx:]
+    # Dependents per stage_registry (requires/uses), not the position in STAGE_ORDER.
+    base, _ = stage_registry.alias_target(stage)
+    stages = [stage]
+    for name in stage_registry.downstream(base):
+        variants = [name] if name == base else stage_registry.aliases(name) + [name]
+        stages += [n for n in variants if n not in stages]
+    return stages
 
 
 def reset_entry_stage(entry, stage):
-    key = STAGE_KEY_MAP.get(stage, f"analysis_{stage}")
+    key = stage_registry.result_key(stage)
     if stage == "graphematic":
         val = entry.get(key)
         if isinstance(val, dict):
@@ -68,10 +67,10 @@ def reset_entry_stage(entry, stage):
 
     state_ids = entry.get("state_ids")
     if isinstance(state_ids, dict):
-        if stage in state_ids:
-            state_ids[stage] = {"id": None, "model": None}
-        if stage == "translation_draft" and "translation" in state_ids:
-            state_ids["translation"] = {"id": None, "model": None}
+        # Mode aliases share the state id of their stage (translation_draft -> translation).
+        state_stage, _ = stage_registry.alias_target(stage)
+        if state_stage in state_ids:
+            state_ids[state_stage] = {"id": None, "model": None}
 
 
 def main():
@@ -99,23 +98,14 @@ def main():
             print(f"Data file not found: {data_file}")
             continue
 
-        with open(data_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        for entry in data:
+        def reset_verse(entry):
             for st in stages_to_reset:
                 reset_entry_stage(entry, st)
 
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = f"{data_file}.{timestamp}.bak"
-        try:
-            os.replace(data_file, backup_file)
-            print(f"Created backup: {backup_file}")
-        except Exception:
-            print("Warning: backup rename failed; continuing.")
-
-        with open(data_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        manifest = create_checkpoint(data_file, label=f"reset_stage:{stage}")
+        if manifest:
+            print(f"Created checkpoint: {manifest['id']} (restore: checkpoints.py restore --id {manifest['id']})")
+        rewrite_story(data_file, reset_verse)
 
         print(f"Reset stages in {data_file}: {', '.join(stages_to_reset)}")
 
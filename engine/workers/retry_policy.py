@@ -0,0 +1,111 @@
+import asyncio
+import random
+import time
+
+# Retry policy for LLM requests: exponential backoff with full jitter per error
+# class, plus one retry budget shared by all verses of a run. Fresh requests
+# earn budget (ratio per request, plus a slow time-based refill); every retry
+# spends one token. When the budget is empty, retries wait for tokens instead of
+# piling onto a backend that is already failing.
+#
+# Error classes:
+#   timeout      request_timeout exceeded
+#   not_found    404 (model unloaded / reloading)
+#   bad_request  400 (context window; max_output_tokens is reduced before the retry)
+#   server       5xx
+#   network      connection errors and other exceptions
+#   parse        200 with an answer the stage parser rejected
+#   stale_state  previous_response_id rejected -> immediate full-prompt retry (free)
+DEFAULT_CLASSES = {
+    "timeout": {"base_delay": 2.0},
+    "not_found": {"base_delay": 0.5},
+    "bad_request": {"base_delay": 1.0},
+    "server": {"base_delay": 2.0},
+    "network": {"base_delay": 1.0},
+    "parse": {"base_delay": 0.1},
+    "stale_state": {"base_delay": 0.0, "free": True},
+}
+
+
+def classify_status(status: int) -> str:
+    if status == 404:
+        return "not_found"
+    if status == 400:
+        return "bad_request"
+    if status >= 500:
+        return "server"
+    return "network"
+
+
+class RetryPolicy:
+    def __init__(self, cfg: dict | None = None, max_attempts: int = 50):
+        cfg = cfg or {}
+        self.max_attempts = max(1, int(cfg.get("max_attempts", max_attempts)))
+        self.max_delay = float(cfg.get("max_delay", 30.0))
+        self.budget_ratio = float(cfg.get("budget_ratio", 0.2))
+        self.budget_per_sec = float(cfg.get("budget_per_sec", 1.0))
+        self.budget_max = float(cfg.get("budget_max", 50))
+        self.classes = {name: dict(rule) for name, rule in DEFAULT_CLASSES.items()}
+        for name, rule in (cfg.get("classes") or {}).items():
+            self.classes.setdefault(name, {}).update(rule or {})
+        self.tokens = self.budget_max
+        self._refilled = time.monotonic()
+        self.counts = {}
+        self.budget_waits = 0
+        self.gave_up = {}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.budget_max, self.tokens + (now - self._refilled) * self.budget_per_sec)
+        self._refilled = now
+
+    def on_request(self) -> None:
+        """A fresh (first-attempt) request earns budget_ratio retry tokens."""
+        self.tokens = min(self.budget_max, self.tokens + self.budget_ratio)
+
+    def delay(self, error_class: str, attempt: int) -> float:
+        rule = self.classes.get(error_class, {})
+        base = float(rule.get("base_delay", 1.0))
+        if base <= 0:
+            return 0.0
+        cap = min(float(rule.get("max_delay", self.max_delay)), base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def allowed(self, error_class: str, class_attempts: int) -> bool:
+        limit = self.classes.get(error_class, {}).get("max_attempts")
+        return limit is None or class_attempts < int(limit)
+
+    def record(self, stage: str, error_class: str) -> None:
+        per_stage = self.counts.setdefault(stage, {})
+        per_stage[error_class] = per_stage.get(error_class, 0) + 1
+
+    def give_up(self, stage: str) -> None:
+        self.gave_up[stage] = self.gave_up.get(stage, 0) + 1
+
+    async def backoff(self, stage: str, error_class: str, attempt: int) -> None:
+        """Counts the retry, waits for a budget token (unless free) and sleeps the jittered delay."""
+        self.record(stage, error_class)
+        rule = self.classes.get(error_class, {})
+        if not rule.get("free"):
+            self._refill()
+            waited = False
+            while self.tokens < 1.0:
+                waited = True
+                await asyncio.sleep(max(0.05, (1.0 - self.tokens) / max(self.budget_per_sec, 0.01)))
+                self._refill()
+            self.tokens -= 1.0
+            if waited:
+                self.budget_waits += 1
+        delay = self.delay(error_class, attempt)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def summary(self, stage: str) -> str:
+        per_stage = self.counts.get(stage, {})
+        total = sum(per_stage.values())
+        detail = " ".join(f"{k}={v}" for k, v in sorted(per_stage.items()))
+        line = f"{stage}: retries={total}"
+        if detail:
+            line += f" ({detail})"
+        line += f" | budget_waits={self.budget_waits} gave_up={self.gave_up.get(stage, 0)}"
+        return line
@@ -5,17 +5,40 @@ import asyncio
 import aiohttp
 import os
 import sys
-import random
 import subprocess
 import time
-import shutil
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 import prompts  # Importing the prompt definitions we just created
 import urllib.parse
 try:
     from fidel_ops import lookup_lex, ROOT_DB
 except ImportError:
     from .fidel_ops import lookup_lex, ROOT_DB
+try:
+    import story_store
+    import checkpoints
+    import llm_cache
+    import token_counter
+    import stage_registry
+    import fingerprints
+    import task_order
+    from dag_scheduler import DagScheduler
+    from model_router import ModelRouter, adaptive_settings
+    from circuit_breaker import CircuitBreakers, breaker_settings
+    from retry_policy import RetryPolicy, classify_status
+except ImportError:
+    from . import story_store
+    from . import checkpoints
+    from . import llm_cache
+    from . import token_counter
+    from . import stage_registry
+    from . import fingerprints
+    from . import task_order
+    from .dag_scheduler import DagScheduler
+    from .model_router import ModelRouter, adaptive_settings
+    from .circuit_breaker import CircuitBreakers, breaker_settings
+    from .retry_policy import RetryPolicy, classify_status
 
 # CONFIG LOADING
 # -----------------------------------------------------------------------------
@@ -66,6 +89,8 @@ DRY_RUN_OUT = None
 LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "logs"))
 ERROR_LOG_PATH = os.path.join(LOG_DIR, "error_log.txt")
 DRY_RUN_LOCK = None
+TIMING_OUT = None
+TIMING_STATS = {}
 FORCE_STAGE = False
 LMSTUDIO_API_TOKEN = os.getenv("LMSTUDIO_API_TOKEN") or os.getenv("LM_API_TOKEN")
 API_HEADERS = {"Authorization": f"Bearer {LMSTUDIO_API_TOKEN}"} if LMSTUDIO_API_TOKEN else None
@@ -94,10 +119,26 @@ CONTEXT_WINDOW_ASSUMPTION = config["processing"]["adaptive_token"]["context_wind
 ADAPTIVE_OUTPUT_MULTIPLIER = config["processing"]["adaptive_token"].get("multiplier", 1.0)
 ADAPTIVE_MIN_OUTPUT = config["processing"]["adaptive_token"].get("min_output", ADAPTIVE_NUM_PREDICT_BASE)
 ADAPTIVE_CHAR_PER_TOKEN = config["processing"]["adaptive_token"].get("char_per_token", 3.5)
+# Tokenizer file / per-script calibration; char_per_token only when the counter is disabled.
+TOKEN_SETTINGS = token_counter.counter_settings(config["processing"].get("token_counter", {}))
+TOKEN_COUNTER = token_counter.TokenCounter(TOKEN_SETTINGS, log=_log) if TOKEN_SETTINGS["enabled"] else None
 STAGE_MAX_OUTPUT = config["processing"].get("stage_max_output_tokens", {})
 STREAM_LM = bool(config.get("api", {}).get("stream", False))
 PROMPT_COMPACT_MODE = config["processing"].get("prompt_compact_mode", "auto")
 PROMPT_COMPACT_THRESHOLD = config["processing"].get("prompt_compact_threshold", 12000)
+# Opt-in multi-verse requests for the short stages (morphologic json, graphematic/syntactic review)
+BATCHING_CONFIG = config["processing"].get("batching", {})
+BATCH_SIZE = int(BATCHING_CONFIG.get("max_verses", 8)) if BATCHING_CONFIG.get("enabled", False) else 1
+BATCH_STATS = {"batches": 0, "verses": 0, "answered": 0, "fallback": 0}
+# Dispatch order of LLM work (task_order.py: file / sjf / interleave, priority chapters first)
+SCHEDULING_CONFIG = config["processing"].get("scheduling", {}) or {}
+TASK_ORDER = SCHEDULING_CONFIG.get("order", "file")
+TASK_PRIORITY = task_order.parse_priority(SCHEDULING_CONFIG.get("priority"))
+FORECAST_EVERY = int(SCHEDULING_CONFIG.get("forecast_every", 25) or 25)
+FORECAST = None
+# "inline": system message + static prompt part lead the input (byte-identical prefix across verses);
+# "system": the same prefix is sent as system_prompt and only the verse part as input.
+PROMPT_PREFIX_MODE = config["processing"].get("prompt_prefix", "inline")
 MAX_ITEMS = config["processing"].get("max_items", 0)
 GRAPHEMATIC_MODE = config["processing"].get("graphematic_mode", "local")
 GRAPHEMATIC_PUNCTUATIONS = config["processing"].get("graphematic_punctuations", [])
@@ -105,6 +146,31 @@ MORPHOLOGIC_MODE = config["processing"].get("morphologic_mode", "json")
 SYNTACTIC_MODE = config["processing"].get("syntactic_mode", "llm")
 TRANSLATION_MODE = "text" # Default to Draft/Text mode
 
+# Persistence: "delta" appends per-verse results to story_data.json.delta.jsonl,
+# "json" rewrites the full file after every chunk (legacy behaviour).
+STORAGE_CONFIG = config.get("storage", {})
+STORAGE_MODE = STORAGE_CONFIG.get("mode", "json")
+STORAGE_COMPACT_ON_FINISH = bool(STORAGE_CONFIG.get("compact_on_finish", True))
+# Every LLM result is also fsync'd to <data-file>.wal.jsonl right away.
+STORAGE_WAL = bool(STORAGE_CONFIG.get("wal", True))
+# Background writer (LLM stages): flush after N finished verses or T seconds.
+STORAGE_FLUSH_EVERY = int(STORAGE_CONFIG.get("flush_every", 50) or 50)
+STORAGE_FLUSH_INTERVAL = float(STORAGE_CONFIG.get("flush_interval", 30) or 30)
+# Local (Python-only) builders run on a process pool for larger runs: verses are
+# sent in chunks with only the fields the builder reads (workers 0 = all cores).
+LOCAL_POOL_CONFIG = config["processing"].get("local_pool", {}) or {}
+LOCAL_POOL_ENABLED = bool(LOCAL_POOL_CONFIG.get("enabled", True))
+LOCAL_POOL_WORKERS = int(LOCAL_POOL_CONFIG.get("workers", 0) or 0)
+LOCAL_POOL_CHUNK = max(1, int(LOCAL_POOL_CONFIG.get("chunk_size", 64) or 64))
+LOCAL_POOL_MIN_VERSES = int(LOCAL_POOL_CONFIG.get("min_verses", 200) or 0)
+
+# Input fingerprints per stage result (fingerprints.py); changed_only re-runs
+# stages only where the fingerprint no longer matches the current inputs.
+FINGERPRINT_CONFIG = config["processing"].get("fingerprints", {}) or {}
+FINGERPRINTS_ENABLED = bool(FINGERPRINT_CONFIG.get("enabled", True))
+CHANGED_ONLY = bool(FINGERPRINT_CONFIG.get("changed_only", False))
+FINGERPRINTS = None
+
 # Websearch settings (LLM + tools)
 WEBSEARCH_CONFIG = config.get("websearch", {})
 WEBSEARCH_MODE = WEBSEARCH_CONFIG.get("mode", "fetch")
@@ -171,7 +237,7 @@ WEBSEARCH_STOPWORDS = set([
 ])
 
 VERSE_CONTEXT_MAP = {}
-ROOT_LABEL_BY_KEY = {}
+ROOT_LABEL_BY_KEY = None
 PARALLEL_LINKS_MAP = {}
 
 def _normalize_root_key(root: str) -> str:
@@ -221,13 +287,60 @@ PHASE_LABELS = SUBJECTS_CONFIG.get("dynamic_phase_labels", []) or []
 
 # Per-model concurrency limit
 MAX_CONCURRENT_PER_MODEL = config["api"]["max_concurrent_per_model"]
-model_semaphores = {} 
+# "least_loaded" (most free slots, then latency/error rate) or "random"
+MODEL_ROUTING = config["api"].get("routing", "least_loaded")
+# Optional AIMD concurrency ("api.concurrency.adaptive"); otherwise the static limit above.
+CONCURRENCY = adaptive_settings(config["api"])
+# Per-model circuit breakers ("api.circuit_breaker") take unloaded instances out of routing.
+MODEL_BREAKERS = CircuitBreakers(MODELS, breaker_settings(config["api"]), log=_log)
+MODEL_ROUTER = ModelRouter(MODELS, MAX_CONCURRENT_PER_MODEL, MODEL_ROUTING, CONCURRENCY, log=_log, breakers=MODEL_BREAKERS)
+# Backoff + jitter per error class and a retry budget shared by all verses ("api.retry").
+RETRY_POLICY = RetryPolicy(config["api"].get("retry"), MAX_RETRIES)
 last_reload_time = {} 
 
 # Choose which stage to run: 'graphematic', 'morphologic', 'syntactic', 'semantic', 'entities', 'websearch'
+# ('pipeline' streams every verse through PIPELINE_STAGES, 'dag' schedules DAG_STAGES)
 CURRENT_STAGE = 'graphematic'  
+
+# Dependencies, result keys and pending rules live in stage_registry.STAGES.
+RUNNABLE_STAGES = [s for s in stage_registry.order() if stage_registry.STAGES[s]["runner"] == "run_stage"]
+# Per-verse stages in dependency order; entities/websearch work on the whole story (registry).
+PIPELINE_ORDER = [
+    s for s in RUNNABLE_STAGES
+    if all(stage_registry.STAGES[a]["scope"] == "verse" for a in stage_registry.ancestors(s) | {s})
+]
+PIPELINE_STAGES = config["processing"].get("pipeline_stages", ["morphologic", "syntactic", "semantic", "translation"])
+PIPELINE_STATS = {"verses": 0, "results": 0, "latencies": []}
+# DAG mode: target stages (missing required inputs are planned too) and worker pools per kind.
+DAG_CONFIG = config["processing"].get("dag", {}) or {}
+DAG_STAGES = DAG_CONFIG.get("stages", ["morphologic", "syntactic", "semantic", "translation", "entities", "websearch"])
+DAG_WORKERS = DAG_CONFIG.get("workers", {"local": 2, "io": 4})
+ACTIVE_STAGES = []
+SHOW_PLAN = False
+# Stored response ids older than this (seconds) are not chained to; 0 = no limit.
+STATE_MAX_AGE = float(config["api"].get("state_max_age", 0) or 0)
 # -----------------------------------------------------------------------------
 
+def _set_stage_mode(stage: str, mode: str):
+    """--mode / --stages stage=mode override of the configured processing mode."""
+    global GRAPHEMATIC_MODE, MORPHOLOGIC_MODE, SYNTACTIC_MODE, TRANSLATION_MODE, WEBSEARCH_MODE
+    if stage == 'graphematic':
+        GRAPHEMATIC_MODE = mode
+    elif stage == 'morphologic':
+        MORPHOLOGIC_MODE = mode
+    elif stage == 'syntactic':
+        SYNTACTIC_MODE = mode # e.g. 'heuristic' vs 'llm'
+    elif stage == 'translation':
+        TRANSLATION_MODE = mode # 'text' (draft) or 'json' (final)
+    elif stage == 'websearch':
+        if mode in ("local", "fetch"):
+            WEBSEARCH_MODE = mode
+        elif mode == "llm":
+            WEBSEARCH_MODE = "fetch"
+            print("ℹ️ Websearch internal LLM summary is removed. Using fetch mode.")
+        else:
+            print("⚠️ Websearch mode supports only local|fetch. Using config default.")
+
 async def touch_heartbeat():
     """Updates a heartbeat file so external managers know we are alive."""
     try:
@@ -696,8 +809,7 @@ def _compute_dynamic_max_tokens(prompt_str: str) -> int:
         target_max_tokens = max(target_max_tokens, int(ADAPTIVE_MIN_OUTPUT))
     if ADAPTIVE_NUM_PREDICT_MAX:
         target_max_tokens = min(target_max_tokens, ADAPTIVE_NUM_PREDICT_MAX)
-    est_div = ADAPTIVE_CHAR_PER_TOKEN if ADAPTIVE_CHAR_PER_TOKEN else 3.5
-    estimated_input_tokens = int(len(prompt_str) / est_div)
+    estimated_input_tokens = _estimate_input_tokens(prompt_str)
     projected_total = estimated_input_tokens + target_max_tokens
     if CONTEXT_WINDOW_ASSUMPTION and projected_total > (CONTEXT_WINDOW_ASSUMPTION - 100):
         available = CONTEXT_WINDOW_ASSUMPTION - estimated_input_tokens - 100
@@ -708,7 +820,10 @@ def _compute_dynamic_max_tokens(prompt_str: str) -> int:
             target_max_tokens = max(200, min(target_max_tokens, 512))
     return int(target_max_tokens)
 
-def _estimate_input_tokens(prompt_str: str) -> int:
+def _estimate_input_tokens(prompt_str: str, model: str | None = None) -> int:
+    if TOKEN_COUNTER is not None:
+        # Before routing the model is unknown: count for the most expensive configured one.
+        return TOKEN_COUNTER.count(prompt_str, model) if model else TOKEN_COUNTER.count_max(prompt_str, MODELS)
     est_div = ADAPTIVE_CHAR_PER_TOKEN if ADAPTIVE_CHAR_PER_TOKEN else 3.5
     return int(len(prompt_str) / est_div)
 
@@ -717,6 +832,10 @@ def _get_state_entry(state_ids: dict, stage: str):
     val = state_ids.get(stage)
     if isinstance(val, dict):
         state_id = val.get("id") or val.get("response_id")
+        saved_at = val.get("at")
+        if STATE_MAX_AGE and saved_at and time.time() - float(saved_at) > STATE_MAX_AGE:
+            # Likely evicted by the server: send the full prompt instead of a stale chain.
+            return None, None
         return state_id, val.get("model")
     if isinstance(val, str):
         return val, None
@@ -727,32 +846,34 @@ def _state_model_allowed(state_model) -> bool:
         return True
     return state_model in MODELS
 
+def _stage_mode(stage: str) -> str | None:
+    """Current processing mode of a stage (config default or --mode / --stages override)."""
+    return {
+        "graphematic": GRAPHEMATIC_MODE,
+        "morphologic": MORPHOLOGIC_MODE,
+        "syntactic": SYNTACTIC_MODE,
+        "translation": TRANSLATION_MODE,
+        "websearch": WEBSEARCH_MODE,
+    }.get(stage)
+
+def _stage_modes() -> dict:
+    return {s: _stage_mode(s) for s in stage_registry.STAGES}
+
+def _has_prerequisite(verse_obj, stage: str) -> bool:
+    # Lenient: an empty (but present) previous result still counts.
+    return not stage_registry.missing_inputs(verse_obj, stage)
+
 def _is_stage_pending(verse_obj, stage: str) -> bool:
     """Determine if a stage should be processed."""
     if FORCE_STAGE:
         return True
-    # Special handling for LLM Review Modes
-    if stage == "graphematic" and GRAPHEMATIC_MODE == "llm":
-        return verse_obj.get("analysis_graphematic_review") is None
-    if stage == "morphologic" and MORPHOLOGIC_MODE == "llm":
-        return verse_obj.get("analysis_morphologic_review") is None
-    if stage == "syntactic" and SYNTACTIC_MODE == "llm":
-        return verse_obj.get("analysis_syntactic_review") is None
-    if stage == "translation" and TRANSLATION_MODE != "json":
-        return verse_obj.get("analysis_translation_draft") is None
-
-    key = f"analysis_{stage}"
-    val = verse_obj.get(key)
-    if val is None:
+    if stage_registry.is_pending(verse_obj, stage, _stage_mode(stage)):
         return True
-    if stage == "websearch":
-        if not isinstance(val, dict):
-            return True
-        status = val.get("status")
-        return status not in ("complete", "done")
-    if stage == "graphematic" and isinstance(val, dict):
-        return val.get("status") != "complete"
-    return False
+    return CHANGED_ONLY and FINGERPRINTS is not None and FINGERPRINTS.changed(verse_obj, stage, _stage_mode(stage))
+
+def _stamp_fingerprint(verse_obj, stage: str):
+    if FINGERPRINTS is not None and not DRY_RUN:
+        FINGERPRINTS.stamp(verse_obj, stage, _stage_mode(stage))
 
 def _build_graphematic_local(text: str):
     graphematic_string = text or ""
@@ -1016,6 +1137,61 @@ def _build_entities_local(verse_obj: dict) -> dict:
         "state_updates": verse_obj.get("state_updates") or []
     }
 
+# Verse fields each local builder reads (all that is pickled to a pool process).
+_LOCAL_FIELDS = {
+    "graphematic": ("text", "words"),
+    "morphologic": ("text", "words"),
+    "syntactic": ("words",),
+    "entities": ("words", "alias_hits", "state_triggers", "state_updates"),
+}
+
+def _morph_token_source(verse_obj: dict) -> list:
+    # Linguistic Compiler Mode: We tokenize first
+    words = verse_obj.get("words") or []
+    if words:
+        return words
+    raw_tokens = re.split(r'[፡።\s]+', verse_obj.get("text", ""))
+    return [t.strip() for t in raw_tokens if t.strip()]
+
+def _build_local_result(stage: str, verse_obj: dict):
+    """Result of a local stage builder (graphematic local, morphologic text, syntactic heuristic, entities)."""
+    if stage == "graphematic":
+        return _build_graphematic_local_v2(verse_obj.get("text", ""), verse_obj.get("words"))
+    if stage == "morphologic":
+        return _build_morphologic_local(_morph_token_source(verse_obj))
+    if stage == "syntactic":
+        return _build_syntax_heuristic(verse_obj)
+    if stage == "entities":
+        return _build_entities_local(verse_obj)
+    raise ValueError(f"no local builder for {stage}")
+
+def _local_rows(stage: str, verses: list) -> list[dict]:
+    fields = _LOCAL_FIELDS[stage]
+    return [{k: v[k] for k in fields if k in v} for v in verses]
+
+def _local_pool_init(registry_file: str, registry):
+    # Runs in each pool process; registry None = load registry_file on first use.
+    global REGISTRY_FILE, REGISTRY_CACHE
+    REGISTRY_FILE = registry_file
+    REGISTRY_CACHE = registry
+
+def _local_build_chunk(stage: str, rows: list[dict]) -> list:
+    return [_build_local_result(stage, row) for row in rows]
+
+def _local_pool_size(stage: str, count: int) -> int:
+    """Processes for `count` verses of a local stage; 0 = run in-process."""
+    if not LOCAL_POOL_ENABLED or DRY_RUN or stage not in _LOCAL_FIELDS:
+        return 0
+    if stage_registry.kind(stage, _stage_mode(stage)) != "local":
+        return 0
+    workers = LOCAL_POOL_WORKERS or os.cpu_count() or 1
+    if workers < 2 or count < LOCAL_POOL_MIN_VERSES:
+        return 0
+    return workers
+
+def _local_pool(workers: int, registry=None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=_local_pool_init, initargs=(REGISTRY_FILE, registry))
+
 def _entities_stats(verse_obj: dict) -> dict:
     ent = verse_obj.get("analysis_entities") or {}
     return {
@@ -1566,7 +1742,6 @@ def _extract_label_from_lex(lex: dict | None) -> str | None:
             return gloss
     return None
 
-ROOT_LABEL_BY_KEY = _build_root_label_map()
 
 def _is_de_context() -> bool:
     candidates = [DATA_FILE, SUBJECTS_DIR, REGISTRY_FILE, REGISTRY_PUBLIC_FILE]
@@ -1822,6 +1997,7 @@ async def _build_websearch_python(session: aiohttp.ClientSession, jobs: list[dic
     }
 
 def _entity_query_label(entity: dict, alias_registry: dict | None) -> tuple[str | None, str | None]:
+    global ROOT_LABEL_BY_KEY
     asset_id = entity.get("asset_id")
     if alias_registry and asset_id in alias_registry:
         labels = alias_registry[asset_id].get("labels") or []
@@ -1835,6 +2011,9 @@ def _entity_query_label(entity: dict, alias_registry: dict | None) -> tuple[str
             return label, surface
     root = entity.get("root") or ""
     if root:
+        if ROOT_LABEL_BY_KEY is None:
+            # Built on first use: the lexicon may be a large database.
+            ROOT_LABEL_BY_KEY = _build_root_label_map()
         label = ROOT_LABEL_BY_KEY.get(_normalize_root_key(root))
         if label:
             return label, None
@@ -2406,7 +2585,7 @@ def _websearch_tool_defs() -> list[dict]:
         }
     }]
 
-async def _read_sse_response(response: aiohttp.ClientResponse) -> tuple[str, str | None, dict | None]:
+async def _read_sse_response(response: aiohttp.ClientResponse, timing: dict | None = None) -> tuple[str, str | None, dict | None]:
     buffer = ""
     content_parts: list[str] = []
     response_id = None
@@ -2438,6 +2617,8 @@ async def _read_sse_response(response: aiohttp.ClientResponse) -> tuple[str, str
             if event_type in ("message.delta", "output_text.delta", "response.output_text.delta"):
                 delta = data.get("content") or data.get("delta") or ""
                 if delta:
+                    if timing is not None and "first_token" not in timing:
+                        timing["first_token"] = time.monotonic()
                     content_parts.append(str(delta))
             elif event_type in ("message", "message.completed", "response.output_text"):
                 content = data.get("content") or ""
@@ -2450,32 +2631,481 @@ async def _read_sse_response(response: aiohttp.ClientResponse) -> tuple[str, str
 
     return "".join(content_parts), response_id, result_obj
 
-async def _log_dry_run(record: dict):
+async def _append_jsonl(path: str, record: dict):
     global DRY_RUN_LOCK
-    if not DRY_RUN_OUT:
-        return
     if DRY_RUN_LOCK is None:
         DRY_RUN_LOCK = asyncio.Lock()
     async with DRY_RUN_LOCK:
-        out_dir = os.path.dirname(DRY_RUN_OUT)
+        out_dir = os.path.dirname(path)
         if out_dir:
             os.makedirs(out_dir, exist_ok=True)
-        with open(DRY_RUN_OUT, "a", encoding="utf-8") as f:
+        with open(path, "a", encoding="utf-8") as f:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
-async def analyze_stage(session, verse_obj, stage):
+async def _log_dry_run(record: dict):
+    if not DRY_RUN_OUT:
+        return
+    await _append_jsonl(DRY_RUN_OUT, record)
+
+def _prompt_prefix(sys_msg: str, prompt_str: str) -> str:
+    """Part of a fresh request that is identical for every verse of a stage."""
+    static, _ = prompts.split_prompt(prompt_str)
+    return f"{sys_msg}\n\n{static}" if static else sys_msg
+
+def _prefix_fields(sys_msg: str, prompt_str: str, use_stateful: bool) -> dict:
+    # Stateful requests continue a conversation: no prefix of their own.
+    prefix = "" if use_stateful else _prompt_prefix(sys_msg, prompt_str)
+    return {
+        "prompt_prefix_mode": PROMPT_PREFIX_MODE,
+        "prefix_chars": len(prefix),
+        "prefix_sha1": hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12] if prefix else None
+    }
+
+async def _record_timing(stage: str, label: str, model: str, fields: dict, started: float, ttft, result: dict):
+    """Per-request latency (time to first token + total) for the end-of-run summary and --timing-out."""
+    total = time.monotonic() - started
+    per_stage = TIMING_STATS.setdefault(stage, {"ttft": [], "total": []})
+    per_stage["total"].append(total)
+    if ttft is not None:
+        per_stage["ttft"].append(float(ttft))
+    if not TIMING_OUT:
+        return
+    record = {
+        "stage": stage,
+        "verse_id": label,
+        "model": model,
+        **fields,
+        "ttft_s": round(float(ttft), 4) if ttft is not None else None,
+        "total_s": round(total, 4),
+        "server_stats": result.get("stats") if isinstance(result, dict) else None
+    }
+    await _append_jsonl(TIMING_OUT, record)
+
+def _timing_summary(stage: str) -> str | None:
+    per_stage = TIMING_STATS.get(stage)
+    if not per_stage or not per_stage["total"]:
+        return None
+
+    def pct(values, q):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    line = f"{stage} (prefix={PROMPT_PREFIX_MODE}): requests={len(per_stage['total'])}"
+    if per_stage["ttft"]:
+        line += f" ttft p50={pct(per_stage['ttft'], 0.5):.2f}s p90={pct(per_stage['ttft'], 0.9):.2f}s"
+    else:
+        line += " ttft=n/a (use --stream)"
+    line += f" | total p50={pct(per_stage['total'], 0.5):.2f}s"
+    return line
+
+def _stage_result_key(stage: str) -> str:
     # Store results in distinct keys: analysis_morphologic, analysis_syntactic, etc.
-    result_key = f"analysis_{stage}"
-    
-    # Special handling for LLM Review Modes (Save to _review)
-    if stage == "graphematic" and GRAPHEMATIC_MODE == "llm":
-        result_key = "analysis_graphematic_review"
-    elif stage == "morphologic" and MORPHOLOGIC_MODE == "llm":
-        result_key = "analysis_morphologic_review"
-    elif stage == "syntactic" and SYNTACTIC_MODE == "llm":
-        result_key = "analysis_syntactic_review"
-    elif stage == "translation" and TRANSLATION_MODE != "json":
-        result_key = "analysis_translation_draft"
+    # LLM review modes save to *_review, translation text mode to the draft.
+    return stage_registry.output_key(stage, _stage_mode(stage))
+
+def _stage_delta_keys(stage: str) -> list[str]:
+    """Top-level verse keys a stage may write (persisted as per-verse deltas)."""
+    if stage in ("pipeline", "dag"):
+        keys = []
+        for name in ACTIVE_STAGES:
+            keys += [k for k in _stage_delta_keys(name) if k not in keys]
+        return keys
+    # Review modes backfill the local result they review.
+    keys = stage_registry.written_keys(stage, _stage_mode(stage)) + ["state_ids"]
+    if FINGERPRINTS is not None:
+        keys.append("fingerprints")
+        if CHANGED_ONLY:
+            keys += list(fingerprints.REFRESH_FIELDS)
+    return keys
+
+def _response_content(result: dict) -> str:
+    """Concatenated message text of an LM Studio response (stateful or OpenAI format)."""
+    # Handle Output Structure (Stateful API might differ slightly)
+    # User snippet:
+    # { "output": [ { "type": "message", "content": "..." } ], "response_id": "..." }
+
+    content = ""
+    if "output" in result and isinstance(result["output"], list):
+        # New Stateful Format
+        for item in result["output"]:
+            if isinstance(item, dict):
+                item_type = item.get("type")
+                if item_type and item_type not in ("message", "text"):
+                    continue
+                # Prefer explicit content/text fields regardless of type
+                if "content" in item and item.get("content") is not None:
+                    content += str(item.get("content", ""))
+                elif "text" in item and item.get("text") is not None:
+                    content += str(item.get("text", ""))
+            elif isinstance(item, str):
+                content += item
+    elif "choices" in result:
+        # Standard OpenAI Format (Fallback)
+        content = result['choices'][0]['message']['content']
+    return content
+
+async def _accept_llm_result(verse_obj, stage, result_key, result, current_model, websearch_input_jobs=None) -> bool:
+    """Parses an LLM response into verse_obj[result_key]; False on parse errors (logged)."""
+    content = _response_content(result)
+    response_id = result.get("response_id")
+
+    cleaned = content.replace("```json", "").replace("```", "").strip()
+
+    try:
+        parsed_data = None
+
+        # REVIEW MODES (Text Dump)
+        # If we are in LLM mode for stages that are normally python/deterministic,
+        # we treat the LLM output as a text review/commentary.
+        is_review_mode = (
+            (stage == 'graphematic' and GRAPHEMATIC_MODE == 'llm') or
+            (stage == 'morphologic' and MORPHOLOGIC_MODE == 'llm') or
+            (stage == 'syntactic' and SYNTACTIC_MODE == 'llm') or
+            (stage == 'semantic') or # Semantic is always text essay now
+            (stage == 'translation' and TRANSLATION_MODE != 'json') or # Translation Draft
+            (stage == 'websearch')  # Websearch returns plain text
+        )
+
+        if is_review_mode:
+            parsed_data = cleaned
+
+        # STANDARD JSON MODES
+        elif stage in ['graphematic', 'morphologic', 'syntactic', 'translation', 'entities', 'websearch', 'asset_cards']:
+            if stage == 'morphologic' and MORPHOLOGIC_MODE == "text":
+                parsed_data = parse_morph_text_response(content, verse_obj.get("words", []))
+            else:
+                try:
+                    parsed_data = json.loads(cleaned)
+                except json.JSONDecodeError:
+                    # Try to extract a JSON block from the output
+                    candidate = _extract_json_block(cleaned) or _extract_json_block(content)
+                    if candidate:
+                        parsed_data = json.loads(candidate)
+                    else:
+                        # Attempt fix for common small model JSON issues
+                        fixed = fix_malformed_json(cleaned or content)
+                        parsed_data = json.loads(fixed)
+
+                # Optional: Validate specific keys if needed
+                if stage == 'graphematic':
+                    if 'graphematic_analysis' in parsed_data:
+                        parsed_data = parsed_data['graphematic_analysis']
+                    # Minimal validation
+                    if 'graphematic_string' not in parsed_data:
+                        raise ValueError("Missing 'graphematic_string'")
+
+                if stage == 'morphologic' and 'tokens' not in parsed_data:
+                    raise ValueError("Missing 'tokens' in morphologic JSON")
+                if stage == 'syntactic' and 'syntax' not in parsed_data:
+                    raise ValueError("Missing 'syntax' in syntactic JSON")
+                if stage == 'websearch':
+                    parsed_data = _normalize_websearch_output(parsed_data, websearch_input_jobs)
+
+        else:
+            # Fallback
+            parsed_data = json.loads(cleaned)
+
+        verse_obj[result_key] = parsed_data
+
+        # SAVE STATE ID
+        if response_id:
+            if "state_ids" not in verse_obj:
+                verse_obj["state_ids"] = {}
+            verse_obj["state_ids"][stage] = {
+                "id": response_id,
+                "model": current_model,
+                "at": int(time.time())
+            }
+            ts = datetime.datetime.now().strftime("%H:%M:%S")
+            print(f"[{ts}] 💾 State Saved: {stage} -> {response_id}")
+
+        await _wal_append(verse_obj, stage, result_key, parsed_data, response_id, current_model)
+
+        ts = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{ts}] ✅ {stage.upper()} {verse_obj['verse_id']} [{current_model}]")
+        return True
+
+    except Exception as e:
+        print(f"⚠️ Parse Error {stage} {verse_obj['verse_id']}: {e}")
+        # For now, we return without saving invalid data, effectively skipping
+        # But we could implement fallback logic here
+
+        _ensure_log_dir()
+        with open(ERROR_LOG_PATH, "a", encoding="utf-8") as err_log:
+            err_log.write(f"\n--- ERROR {verse_obj['verse_id']} ---\n{cleaned}\n--------------------------\n")
+            if not cleaned:
+                try:
+                    err_log.write(f"RAW_RESPONSE:\n{json.dumps(result, ensure_ascii=False)[:2000]}\n")
+                except Exception:
+                    pass
+    return False
+
+async def _replay_cached_result(label, stage, payload, use_stateful, accept) -> bool:
+    """
+    Answers a request from the LLM response cache. Stateful requests only match
+    their pinned model; fresh prompts accept a cached answer from any model.
+    """
+    models = [payload["model"]]
+    if not use_stateful:
+        models += [m for m in MODELS if m != payload["model"]]
+    keys = {llm_cache.make_key(stage, {**payload, "model": m}): m for m in models}
+    key, result = await asyncio.to_thread(llm_cache.lookup, list(keys))
+    if key is None:
+        return False
+    ts = datetime.datetime.now().strftime("%H:%M:%S")
+    print(f"[{ts}] 🗃️ CACHE {label} <- [{keys[key]}]")
+    if await accept(result, keys[key]):
+        return True
+    # Unusable answer (e.g. parse error): drop it and ask the server.
+    await asyncio.to_thread(llm_cache.discard, key)
+    return False
+
+SYS_MSG = "You are a specialized linguistic analyzer. Follow the custom format strictly."
+MORPH_POS_TAGS = ["N", "V", "ADJ", "PRON", "PREP", "ADV", "CONJ"]
+
+def _stage_max_tokens(stage: str, prompt_str: str) -> int:
+    """Output budget for one prompt: adaptive estimate, capped per stage/mode."""
+    dynamic_max_tokens = _compute_dynamic_max_tokens(prompt_str)
+
+    # Determine Token Cap based on Mode
+    is_review_mode = (
+        (stage == 'graphematic' and GRAPHEMATIC_MODE == 'llm') or
+        (stage == 'morphologic' and MORPHOLOGIC_MODE == 'llm') or
+        (stage == 'syntactic' and SYNTACTIC_MODE == 'llm')
+    )
+
+    cap_key = stage
+    if is_review_mode:
+        cap_key = "review"
+    elif stage == 'translation' and TRANSLATION_MODE != 'json':
+        cap_key = "translation_draft"
+
+    stage_cap = STAGE_MAX_OUTPUT.get(cap_key)
+
+    if stage_cap:
+        dynamic_max_tokens = min(dynamic_max_tokens, int(stage_cap))
+    return dynamic_max_tokens
+
+def _batching_active(stage: str) -> bool:
+    if BATCH_SIZE <= 1:
+        return False
+    if stage == "morphologic":
+        return MORPHOLOGIC_MODE not in ("text", "llm")
+    if stage == "syntactic":
+        return SYNTACTIC_MODE == "llm"
+    if stage == "graphematic":
+        return GRAPHEMATIC_MODE == "llm"
+    return False
+
+def _batch_item(verse_obj, stage: str):
+    """(batch item, equivalent single-verse prompt) for one verse of a batchable stage."""
+    verse_meta = _build_verse_meta(verse_obj)
+    vid = verse_obj.get("verse_id")
+    if stage == "graphematic":
+        text = verse_obj.get("text", "")
+        return {"verse_id": vid, "text": text}, prompts.build_graphematic_prompt(text, verse_meta=verse_meta)
+    if stage == "syntactic":
+        if verse_obj.get("analysis_syntactic") is None:
+            verse_obj["analysis_syntactic"] = _build_syntax_heuristic(verse_obj)
+        syn_data = verse_obj.get("analysis_syntactic") or {}
+        item = {"verse_id": vid, "syntax_data": syn_data, "verse_meta": verse_meta}
+        return item, prompts.build_syntax_review_prompt(syn_data, verse_meta=verse_meta)
+    # morphologic (json mode), same token source and compaction rules as analyze_stage
+    words = verse_obj.get("words") or []
+    if words:
+        token_source = words
+    else:
+        raw_tokens = re.split(r'[፡።\s]+', verse_obj.get("text", ""))
+        token_source = [t.strip() for t in raw_tokens if t.strip()]
+    compact = PROMPT_COMPACT_MODE == "compact"
+    reg_ctx = None
+    if not compact:
+        reg_ctx = _build_registry_context(verse_obj, compact=PROMPT_COMPACT_MODE in {"compact", "auto"})
+    prompt = prompts.build_morphology_prompt(token_source, MORPH_POS_TAGS, verse_meta=verse_meta, registry_context=reg_ctx, compact=compact)
+    if PROMPT_COMPACT_MODE == "auto" and len(str(prompt)) > PROMPT_COMPACT_THRESHOLD:
+        compact = True
+        reg_ctx = None
+        prompt = prompts.build_morphology_prompt(token_source, MORPH_POS_TAGS, verse_meta=verse_meta, registry_context=None, compact=True)
+    item = {"verse_id": vid, "tokens": token_source, "verse_meta": verse_meta, "registry_context": reg_ctx, "compact": compact}
+    return item, prompt
+
+def _build_batch_prompt(stage: str, items: list[dict]) -> str:
+    if stage == "graphematic":
+        return prompts.build_graphematic_batch_prompt(items)
+    if stage == "syntactic":
+        return prompts.build_syntax_review_batch_prompt(items)
+    compact = any(item.get("compact") for item in items)
+    return prompts.build_morphology_batch_prompt(items, MORPH_POS_TAGS, compact=compact)
+
+def _plan_batches(verses: list, stage: str) -> list[list]:
+    """
+    Groups consecutive verses into batches of up to BATCH_SIZE. A batch grows
+    while the summed per-verse output budgets (_stage_max_tokens of each
+    single-verse prompt) stay within the adaptive maximum and the batch prompt
+    plus that output still fits the assumed context window.
+    """
+    batches = []
+    current, items, out_budget = [], [], 0
+    for verse in verses:
+        item, single_prompt = _batch_item(verse, stage)
+        out = _stage_max_tokens(stage, str(single_prompt))
+        if current:
+            fits = len(current) < BATCH_SIZE
+            if fits and ADAPTIVE_NUM_PREDICT_MAX:
+                fits = out_budget + out <= ADAPTIVE_NUM_PREDICT_MAX
+            if fits and CONTEXT_WINDOW_ASSUMPTION:
+                est_input = _estimate_input_tokens(f"{SYS_MSG}\n\n{_build_batch_prompt(stage, items + [item])}")
+                fits = est_input + out_budget + out <= CONTEXT_WINDOW_ASSUMPTION - 100
+            if not fits:
+                batches.append(current)
+                current, items, out_budget = [], [], 0
+        current.append(verse)
+        items.append(item)
+        out_budget += out
+    if current:
+        batches.append(current)
+    return batches
+
+def _estimate_task_cost(verse_obj, stage: str) -> int:
+    """
+    Estimated tokens of one LLM task (0 for local / fetch stages): input tokens of
+    what the prompt carries (verse fields, input results, reviewed result) plus
+    the output budget _stage_max_tokens would grant it.
+    """
+    mode = _stage_mode(stage)
+    if stage_registry.kind(stage, mode) != "llm":
+        return 0
+    output_key = stage_registry.output_key(stage, mode)
+    fields = list(stage_registry.STAGES[stage].get("reads") or [])
+    fields += [stage_registry.STAGES[s]["key"] for s in stage_registry.inputs(stage)]
+    fields += [k for k in stage_registry.written_keys(stage, mode) if k != output_key]
+    material = {}
+    for field in fields:
+        value = verse_obj.get(field)
+        if field == "words":
+            value = [w.get("text") for w in value or [] if isinstance(w, dict)]
+        material[field] = value
+    material_str = json.dumps(material, ensure_ascii=False, default=str)
+    return _estimate_input_tokens(material_str) + _stage_max_tokens(stage, material_str)
+
+def _order_work(items: list, stages: list[str], costs: dict | None = None) -> tuple[list, dict]:
+    """
+    Applies TASK_ORDER / TASK_PRIORITY to work items (verses or batches) and
+    returns (ordered items, estimated cost per item id) for the forecast.
+    Without `costs` an item costs its pending `stages`.
+    """
+    if costs is None:
+        costs = {}
+        for item in items:
+            verses = item if isinstance(item, list) else [item]
+            costs[id(item)] = sum(_estimate_task_cost(v, s) for v in verses for s in stages if _is_stage_pending(v, s))
+    ordered = task_order.order_tasks(items, lambda it: costs[id(it)], TASK_ORDER, MODEL_ROUTER.capacity(), TASK_PRIORITY)
+    if TASK_ORDER != "file" or TASK_PRIORITY:
+        first = sum(1 for it in items if task_order.matches_priority(it[0] if isinstance(it, list) else it, TASK_PRIORITY))
+        line = f"🔀 Order: {TASK_ORDER}"
+        if TASK_PRIORITY:
+            line += f" | priority {','.join(TASK_PRIORITY)}: {first} of {len(items)} items first"
+        _log(line)
+    return ordered, costs
+
+def _cap_work(items: list, limit: int, cost) -> list:
+    """
+    --limit / dry-run cap: the first `limit` items in dispatch order (TASK_PRIORITY,
+    then TASK_ORDER), so priority chapters and cheap tasks are not cut off by file
+    order. The kept items stay in file order; _order_work orders the dispatch.
+    """
+    if not limit or len(items) <= limit:
+        return items
+    if TASK_ORDER == "file" and not TASK_PRIORITY:
+        return items[:limit]
+    chosen = task_order.order_tasks(items, cost, TASK_ORDER, MODEL_ROUTER.capacity(), TASK_PRIORITY)[:limit]
+    keep = {id(it) for it in chosen}
+    return [it for it in items if id(it) in keep]
+
+def _start_forecast(tasks: int, total_cost: float):
+    global FORECAST
+    FORECAST = None if DRY_RUN or not tasks else task_order.Forecast(tasks, total_cost, FORECAST_EVERY, log=_log)
+    return FORECAST
+
+async def analyze_batch(session, verses: list, stage: str):
+    """
+    One request for several verses; sections are split at the ###VERSE id### lines
+    and parsed per verse. Verses without a usable section fall back to analyze_stage.
+    """
+    if len(verses) == 1:
+        return await analyze_stage(session, verses[0], stage)
+    result_key = _stage_result_key(stage)
+    pairs = [_batch_item(v, stage) for v in verses]
+    items = [item for item, _ in pairs]
+    prompt_str = _build_batch_prompt(stage, items)
+    max_tokens = sum(_stage_max_tokens(stage, str(single)) for _, single in pairs)
+    if ADAPTIVE_NUM_PREDICT_MAX:
+        max_tokens = min(max_tokens, int(ADAPTIVE_NUM_PREDICT_MAX))
+    ids = [v.get("verse_id") for v in verses]
+    label = f"{ids[0]}..{ids[-1]} ({len(ids)} verses)"
+
+    if DRY_RUN:
+        dry_input = f"{SYS_MSG}\n\n{prompt_str}"
+        est_input = _estimate_input_tokens(dry_input)
+        await _log_dry_run({
+            "stage": stage,
+            "verse_id": ids[0],
+            "verse_ids": ids,
+            "batch_size": len(ids),
+            "use_stateful": False,
+            **_prefix_fields(SYS_MSG, prompt_str, False),
+            "prompt_chars": len(dry_input),
+            "prompt": dry_input,
+            "max_output_tokens": int(max_tokens),
+            "estimated_input_tokens": est_input,
+            "projected_total_tokens": int(est_input + max_tokens),
+            "context_window_assumption": CONTEXT_WINDOW_ASSUMPTION
+        })
+        return verses
+
+    by_id = {v.get("verse_id"): v for v in verses}
+    answered = set()
+
+    async def accept(result, model) -> bool:
+        sections = prompts.split_batch_response(_response_content(result), ids)
+        if not sections:
+            print(f"⚠️ Batch answer without verse sections: {label}")
+            return False
+        for vid, section in sections.items():
+            if vid in answered:
+                continue
+            # Sections carry no response_id: a batch conversation is not a per-verse chain state.
+            single = {"output": [{"type": "message", "content": section}]}
+            if await _accept_llm_result(by_id[vid], stage, result_key, single, model):
+                _stamp_fingerprint(by_id[vid], stage)
+                answered.add(vid)
+        return True
+
+    BATCH_STATS["batches"] += 1
+    BATCH_STATS["verses"] += len(verses)
+    await _send_llm_request(session, stage, label, prompt_str, SYS_MSG, max_tokens, accept)
+    BATCH_STATS["answered"] += len(answered)
+
+    missing = [v for v in verses if v.get("verse_id") not in answered]
+    if missing:
+        BATCH_STATS["fallback"] += len(missing)
+        _log(f"↩️ Batch {label}: {len(missing)} verse(s) fall back to single requests")
+        for verse in missing:
+            await analyze_stage(session, verse, stage)
+    return verses
+
+async def analyze_stage(session, verse_obj, stage):
+    """Runs one stage for one verse; a new result records its input fingerprint."""
+    result_key = _stage_result_key(stage)
+    before = verse_obj.get(result_key)
+    out = await _analyze_stage(session, verse_obj, stage)
+    after = verse_obj.get(result_key)
+    if after is not None and after is not before:
+        _stamp_fingerprint(verse_obj, stage)
+    return out
+
+async def _analyze_stage(session, verse_obj, stage):
+    result_key = _stage_result_key(stage)
 
     # Skip if already done
     if not _is_stage_pending(verse_obj, stage):
@@ -2595,7 +3225,7 @@ async def analyze_stage(session, verse_obj, stage):
                 )
 
     if DRY_RUN and prompt:
-        sys_msg = "You are a specialized linguistic analyzer. Follow the custom format strictly."
+        sys_msg = SYS_MSG
         dynamic_max_tokens = _compute_dynamic_max_tokens(str(prompt))
         use_stateful = previous_response_id is not None
         dry_input = prompt if use_stateful else f"{sys_msg}\n\n{prompt}"
@@ -2606,6 +3236,7 @@ async def analyze_stage(session, verse_obj, stage):
             "use_stateful": use_stateful,
             "previous_response_id": previous_response_id,
             "model_hint": previous_model,
+            **_prefix_fields(sys_msg, str(prompt), use_stateful),
             "prompt_chars": len(dry_input),
             "prompt": dry_input,
             "max_output_tokens": int(dynamic_max_tokens),
@@ -2621,22 +3252,16 @@ async def analyze_stage(session, verse_obj, stage):
     
     if stage == 'graphematic':
         if GRAPHEMATIC_MODE == "local":
-            verse_obj[result_key] = _build_graphematic_local_v2(text, verse_obj.get("words"))
+            verse_obj[result_key] = _build_local_result(stage, verse_obj)
             print(f"✅ {stage.upper()} {verse_obj['verse_id']} [local]")
             return verse_obj
         # LLM mode
         prompt = prompts.build_graphematic_prompt(text, verse_meta=verse_meta)
 
     elif stage == 'morphologic':
-        # Linguistic Compiler Mode: We tokenize first
-        words = verse_obj.get("words") or []
-        if words:
-            token_source = words
-        else:
-            raw_tokens = re.split(r'[፡።\s]+', text)
-            token_source = [t.strip() for t in raw_tokens if t.strip()]
+        token_source = _morph_token_source(verse_obj)
         if MORPHOLOGIC_MODE == "text":
-            verse_obj[result_key] = _build_morphologic_local(token_source)
+            verse_obj[result_key] = _build_local_result(stage, verse_obj)
             print(f"✅ {stage.upper()} {verse_obj['verse_id']} [local]")
             return verse_obj
         elif MORPHOLOGIC_MODE == "llm":
@@ -2664,7 +3289,7 @@ async def analyze_stage(session, verse_obj, stage):
         
     elif stage == 'syntactic':
         if SYNTACTIC_MODE == "heuristic":
-            verse_obj[result_key] = _build_syntax_heuristic(verse_obj)
+            verse_obj[result_key] = _build_local_result(stage, verse_obj)
             print(f"✅ {stage.upper()} {verse_obj['verse_id']} [heuristic]")
             return verse_obj
         if SYNTACTIC_MODE == "llm":
@@ -2785,7 +3410,7 @@ async def analyze_stage(session, verse_obj, stage):
              prompt = prompt_full
 
     elif stage == 'entities':
-        verse_obj[result_key] = _build_entities_local(verse_obj)
+        verse_obj[result_key] = _build_local_result(stage, verse_obj)
         return verse_obj
     elif stage == 'websearch':
         registry = _load_registry()
@@ -2843,26 +3468,8 @@ async def analyze_stage(session, verse_obj, stage):
         print(f"⚠️ Empty prompt for stage {stage}. Skipping.")
         return verse_obj
 
-    sys_msg = "You are a specialized linguistic analyzer. Follow the custom format strictly."
-    dynamic_max_tokens = _compute_dynamic_max_tokens(prompt_str)
-    
-    # Determine Token Cap based on Mode
-    is_review_mode = (
-        (stage == 'graphematic' and GRAPHEMATIC_MODE == 'llm') or
-        (stage == 'morphologic' and MORPHOLOGIC_MODE == 'llm') or
-        (stage == 'syntactic' and SYNTACTIC_MODE == 'llm')
-    )
-    
-    cap_key = stage
-    if is_review_mode:
-        cap_key = "review"
-    elif stage == 'translation' and TRANSLATION_MODE != 'json':
-        cap_key = "translation_draft"
-        
-    stage_cap = STAGE_MAX_OUTPUT.get(cap_key)
-    
-    if stage_cap:
-        dynamic_max_tokens = min(dynamic_max_tokens, int(stage_cap))
+    sys_msg = SYS_MSG
+    dynamic_max_tokens = _stage_max_tokens(stage, prompt_str)
     
     use_stateful = previous_response_id is not None
 
@@ -2875,6 +3482,7 @@ async def analyze_stage(session, verse_obj, stage):
             "use_stateful": use_stateful,
             "previous_response_id": previous_response_id,
             "model_hint": previous_model,
+            **_prefix_fields(sys_msg, prompt_str, use_stateful),
             "prompt_chars": len(dry_input),
             "prompt": dry_input,
             "max_output_tokens": int(dynamic_max_tokens),
@@ -2885,20 +3493,44 @@ async def analyze_stage(session, verse_obj, stage):
         await _log_dry_run(record)
         return verse_obj
     
+    await _send_llm_request(
+        session, stage, verse_obj['verse_id'], prompt_str, sys_msg, dynamic_max_tokens,
+        lambda result, model: _accept_llm_result(verse_obj, stage, result_key, result, model, websearch_input_jobs),
+        previous_response_id=previous_response_id, previous_model=previous_model, prompt_full=prompt_full
+    )
+    return verse_obj
+
+async def _send_llm_request(session, stage, label, prompt_str, sys_msg, dynamic_max_tokens, accept,
+                            previous_response_id=None, previous_model=None, prompt_full=None) -> bool:
+    """
+    Sends one prompt through cache, router, retry policy and circuit breakers.
+    accept(result, model) parses the answer; returns True once it succeeded.
+    """
+    use_stateful = previous_response_id is not None
+
+    cache_checked = not llm_cache.enabled()
+    class_attempts = {}
+    RETRY_POLICY.on_request()
+
     # Send to LLM
-    for attempt in range(MAX_RETRIES):
-        # Dynamic model selection: Pin to the stateful model when chaining
+    for attempt in range(RETRY_POLICY.max_attempts):
+        # Dynamic model selection: Pin to the stateful model when chaining,
+        # otherwise the router hands out the least-loaded model when a slot frees up.
+        pinned_model = None
         if use_stateful and previous_model:
-            current_model = previous_model
+            pinned_model = previous_model
         elif use_stateful and len(MODELS) == 1:
-            current_model = MODELS[0]
-        else:
-            current_model = random.choice(MODELS)
-        
-        sem = model_semaphores.get(current_model)
-        if sem is None:
-            sem = asyncio.Semaphore(MAX_CONCURRENT_PER_MODEL)
-            model_semaphores[current_model] = sem
+            pinned_model = MODELS[0]
+        if pinned_model and prompt_full and not MODEL_ROUTER.available(pinned_model) and MODEL_BREAKERS.usable(MODELS):
+            # The instance holding the chain is down: continue on a healthy one with the full prompt.
+            print(f"⚡ {pinned_model} circuit open. Sending full prompt to another model.")
+            use_stateful = False
+            previous_response_id = None
+            previous_model = None
+            pinned_model = None
+            prompt_str = str(prompt_full)
+            dynamic_max_tokens = _compute_dynamic_max_tokens(prompt_str)
+        current_model = pinned_model or MODEL_ROUTER.preferred()
         
         # Stateful API Payload Construction
         stream_enabled = STREAM_LM
@@ -2913,10 +3545,22 @@ async def analyze_stage(session, verse_obj, stage):
                 "stream": stream_enabled,
                 "max_output_tokens": int(dynamic_max_tokens)
             }
+        elif PROMPT_PREFIX_MODE == "system":
+            # New Conversation, static part as a reusable system message; only the verse data varies.
+            _, variable = prompts.split_prompt(prompt_str)
+            payload = {
+                "model": current_model,
+                "system_prompt": _prompt_prefix(sys_msg, prompt_str),
+                "input": variable,
+                "temperature": 0.2,
+                "stream": stream_enabled,
+                "max_output_tokens": int(dynamic_max_tokens)
+            }
         else:
             # New Conversation
             # The /api/v1/chat endpoint uses 'input' for the message content.
-            # Combining System Message + User Prompt into one block.
+            # Combining System Message + User Prompt into one block
+            # (static instructions first, so consecutive verses share the prefix).
             full_input = f"{sys_msg}\n\n{prompt_str}"
             
             payload = {
@@ -2952,137 +3596,64 @@ async def analyze_stage(session, verse_obj, stage):
                     "force": False
                 }
     
+        if not cache_checked:
+            cache_checked = True
+            if await _replay_cached_result(label, stage, payload, use_stateful, accept):
+                return True
+
+        # Take a slot; the payload follows the model the router actually granted.
+        current_model = await MODEL_ROUTER.acquire(pinned_model)
+        payload["model"] = current_model
+        cache_key = llm_cache.make_key(stage, payload) if llm_cache.enabled() else None
+        started = time.monotonic()
+        request_ok = False
+        overloaded = False
+        instance_failed = False
+        retry_class = None
+
         try:
             # Added timeout to automate the "eject" process for hanging requests
             timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
             
-            # Acquire semaphore for the specific model
-            async with sem:
+            try:
                 ts = datetime.datetime.now().strftime("%H:%M:%S")
-                print(f"[{ts}] 🚀 SEND {verse_obj['verse_id']} -> [{current_model}]")
+                print(f"[{ts}] 🚀 SEND {label} -> [{current_model}] ({MODEL_ROUTER.load(current_model)})")
                 async with session.post(LM_STUDIO_URL, json=payload, timeout=timeout, headers=API_HEADERS) as response:
                     if response.status == 200:
+                        request_ok = True
                         await touch_heartbeat() # ALIVE SIGNAL
+                        ttft = None
                         if stream_enabled:
-                            content, response_id, result_obj = await _read_sse_response(response)
+                            timing = {}
+                            content, response_id, result_obj = await _read_sse_response(response, timing)
                             result = result_obj or {
                                 "response_id": response_id,
                                 "output": [{"type": "message", "content": content}]
                             }
+                            if "first_token" in timing:
+                                ttft = timing["first_token"] - started
                         else:
                             result = await response.json()
-                        
-                        # Handle Output Structure (Stateful API might differ slightly)
-                        # User snippet:
-                        # { "output": [ { "type": "message", "content": "..." } ], "response_id": "..." }
-                        
-                        content = ""
-                        response_id = result.get("response_id")
-                        
-                        if "output" in result and isinstance(result["output"], list):
-                            # New Stateful Format
-                            for item in result["output"]:
-                                if isinstance(item, dict):
-                                    item_type = item.get("type")
-                                    if item_type and item_type not in ("message", "text"):
-                                        continue
-                                    # Prefer explicit content/text fields regardless of type
-                                    if "content" in item and item.get("content") is not None:
-                                        content += str(item.get("content", ""))
-                                    elif "text" in item and item.get("text") is not None:
-                                        content += str(item.get("text", ""))
-                                elif isinstance(item, str):
-                                    content += item
-                        elif "choices" in result:
-                            # Standard OpenAI Format (Fallback)
-                            content = result['choices'][0]['message']['content']
-                        
-                        cleaned = content.replace("```json", "").replace("```", "").strip()
-                        
-                        try:
-                            parsed_data = None
-                            
-                            # REVIEW MODES (Text Dump)
-                            # If we are in LLM mode for stages that are normally python/deterministic,
-                            # we treat the LLM output as a text review/commentary.
-                            is_review_mode = (
-                                (stage == 'graphematic' and GRAPHEMATIC_MODE == 'llm') or
-                                (stage == 'morphologic' and MORPHOLOGIC_MODE == 'llm') or
-                                (stage == 'syntactic' and SYNTACTIC_MODE == 'llm') or
-                                (stage == 'semantic') or # Semantic is always text essay now
-                                (stage == 'translation' and TRANSLATION_MODE != 'json') or # Translation Draft
-                                (stage == 'websearch')  # Websearch returns plain text
+                            ttft = (result.get("stats") or {}).get("time_to_first_token_seconds")
+                        await _record_timing(
+                            stage, label, current_model,
+                            _prefix_fields(sys_msg, prompt_str, use_stateful), started, ttft, result
+                        )
+                        if TOKEN_COUNTER is not None and not use_stateful:
+                            sent = "\n\n".join(p for p in (payload.get("system_prompt"), payload.get("input")) if p)
+                            TOKEN_COUNTER.observe(current_model, sent, token_counter.server_input_tokens(result))
+                        if FORECAST is not None:
+                            FORECAST.observe_tokens(
+                                (token_counter.server_input_tokens(result) or 0) + (token_counter.server_output_tokens(result) or 0)
                             )
 
-                            if is_review_mode:
-                                parsed_data = cleaned
-                            
-                            # STANDARD JSON MODES
-                            elif stage in ['graphematic', 'morphologic', 'syntactic', 'translation', 'entities', 'websearch', 'asset_cards']:
-                                if stage == 'morphologic' and MORPHOLOGIC_MODE == "text":
-                                    parsed_data = parse_morph_text_response(content, verse_obj.get("words", []))
-                                else:
-                                    try:
-                                        parsed_data = json.loads(cleaned)
-                                    except json.JSONDecodeError:
-                                        # Try to extract a JSON block from the output
-                                        candidate = _extract_json_block(cleaned) or _extract_json_block(content)
-                                        if candidate:
-                                            parsed_data = json.loads(candidate)
-                                        else:
-                                            # Attempt fix for common small model JSON issues
-                                            fixed = fix_malformed_json(cleaned or content)
-                                            parsed_data = json.loads(fixed)
-                                        
-                                    # Optional: Validate specific keys if needed
-                                    if stage == 'graphematic':
-                                        if 'graphematic_analysis' in parsed_data:
-                                            parsed_data = parsed_data['graphematic_analysis']
-                                        # Minimal validation
-                                        if 'graphematic_string' not in parsed_data:
-                                            raise ValueError("Missing 'graphematic_string'")
-
-                                    if stage == 'morphologic' and 'tokens' not in parsed_data:
-                                        raise ValueError("Missing 'tokens' in morphologic JSON")
-                                    if stage == 'syntactic' and 'syntax' not in parsed_data:
-                                        raise ValueError("Missing 'syntax' in syntactic JSON")
-                                    if stage == 'websearch':
-                                        parsed_data = _normalize_websearch_output(parsed_data, websearch_input_jobs)
-
-                            else:
-                                # Fallback
-                                parsed_data = json.loads(cleaned)
-                                
-                            verse_obj[result_key] = parsed_data
-                            
-                            # SAVE STATE ID
-                            if response_id:
-                                if "state_ids" not in verse_obj:
-                                    verse_obj["state_ids"] = {}
-                                verse_obj["state_ids"][stage] = {
-                                    "id": response_id,
-                                    "model": current_model
-                                }
-                                ts = datetime.datetime.now().strftime("%H:%M:%S")
-                                print(f"[{ts}] 💾 State Saved: {stage} -> {response_id}")
-                            
-                            ts = datetime.datetime.now().strftime("%H:%M:%S")
-                            print(f"[{ts}] ✅ {stage.upper()} {verse_obj['verse_id']} [{current_model}]")
-                            return verse_obj
-                            
-                        except Exception as e:
-                            print(f"⚠️ Parse Error {stage} {verse_obj['verse_id']}: {e}")
-                            # For now, we return without saving invalid data, effectively skipping
-                            # But we could implement fallback logic here
-                            
-                            _ensure_log_dir()
-                            with open(ERROR_LOG_PATH, "a", encoding="utf-8") as err_log:
-                                err_log.write(f"\n--- ERROR {verse_obj['verse_id']} ---\n{cleaned}\n--------------------------\n")
-                                if not cleaned:
-                                    try:
-                                        err_log.write(f"RAW_RESPONSE:\n{json.dumps(result, ensure_ascii=False)[:2000]}\n")
-                                    except Exception:
-                                        pass
+                        if cache_key:
+                            # Stored before parsing: a parser fix makes the re-run free.
+                            await asyncio.to_thread(llm_cache.put, cache_key, result, stage, current_model)
+                        
+                        if await accept(result, current_model):
+                            return True
+                        retry_class = "parse"
                     else:
                         error_text = ""
                         try:
@@ -3092,12 +3663,13 @@ async def analyze_stage(session, verse_obj, stage):
                         
                         if use_stateful and previous_response_id and response.status in [400, 404] and prompt_full:
                             print("⚠️ Stateful id rejected or stale. Falling back to full prompt.")
+                            request_ok = True  # the instance answered; only the chain is stale
                             use_stateful = False
                             previous_response_id = None
                             previous_model = None
-                            prompt = prompt_full
-                            prompt_str = str(prompt)
+                            prompt_str = str(prompt_full)
                             dynamic_max_tokens = _compute_dynamic_max_tokens(prompt_str)
+                            RETRY_POLICY.record(stage, "stale_state")
                             continue
 
                         print(f"❌ HTTP {response.status} [{current_model}]")
@@ -3107,10 +3679,9 @@ async def analyze_stage(session, verse_obj, stage):
                                 snippet = snippet[:200] + "…"
                             if snippet:
                                 print(f"⚠️ Error body: {snippet}")
-                        if response.status == 404:
-                            # Model temporarily unavailable (e.g., reload). Short retry to keep throughput.
-                            await asyncio.sleep(0.5)
-                            continue
+                        # 404: model temporarily unavailable (e.g., reload) -> short backoff.
+                        retry_class = classify_status(response.status)
+                        instance_failed = retry_class in ("not_found", "server")
                         if response.status == 400:
                             # 400 Context Window Limit? 
                             # If we hit 400 with NO truncation, it means we genuinely exceeded the hard limit of the backend.
@@ -3131,61 +3702,60 @@ async def analyze_stage(session, verse_obj, stage):
                             dynamic_max_tokens = new_max
                             print(f"📉 Reducing max_output_tokens to {dynamic_max_tokens} for retry...")
 
-                        # If 400 or 500, model might be unloaded/broken
-                        if response.status in [400, 500]:
-                            await asyncio.sleep(5)  # Wait for external manager
+                        # If 400 or 5xx, model might be unloaded/broken (backoff gives the external manager time)
+                        if response.status == 400 or response.status >= 500:
+                            overloaded = True
+            except asyncio.TimeoutError:
+                overloaded = True
+                instance_failed = True
+                raise
+            except Exception:
+                instance_failed = True
+                raise
+            finally:
+                await MODEL_ROUTER.release(current_model, started, request_ok, overloaded, instance_failed)
                             
         except asyncio.TimeoutError:
-             print(f"⌛ Timeout {verse_obj['verse_id']} [{current_model}]")
+             print(f"⌛ Timeout {label} [{current_model}]")
+             retry_class = "timeout"
         except Exception as e:
             print(f"❌ Ex: {e} [{current_model}]")
-            await asyncio.sleep(1) # Brief pause
-            
-        # Minimal sleep for aggressive retry
-        await asyncio.sleep(0.1)
+            retry_class = "network"
 
-    return verse_obj
+        # Backoff outside the model slot: jittered, per error class, paid from the shared retry budget.
+        retry_class = retry_class or "network"
+        class_attempts[retry_class] = class_attempts.get(retry_class, 0) + 1
+        if attempt + 1 >= RETRY_POLICY.max_attempts or not RETRY_POLICY.allowed(retry_class, class_attempts[retry_class]):
+            break
+        await RETRY_POLICY.backoff(stage, retry_class, class_attempts[retry_class] - 1)
 
-async def save_progress(data, filepath):
-    temp = filepath + ".tmp"
+    RETRY_POLICY.give_up(stage)
+    _log(f"⛔ Giving up on {label} after {attempt + 1} attempts (last error: {retry_class})")
+    return False
 
-    # 1. Standard Serialize with Indentation
-    json_str = json.dumps(data, ensure_ascii=False, indent=2)
-    
-    # 2. Compactify "base_chars": [ { "id": 1, "char": "X" }, ... ]
-    # Collapse objects: { \n "id": 1, \n "char": "X" \n } -> { "id": 1, "char": "X" }
-    json_str = re.sub(
-        r'\{\s*"id":\s*(\d+),\s*"char":\s*"([^"]+)"\s*\}',
-        r'{ "id": \1, "char": "\2" }',
-        json_str,
-        flags=re.DOTALL
-    )
 
-    # 3. Compactify "words": [ { "word_id": 1, "text": "...", "char_ids": [ ... ] }, ... ]
-    # A. Flatten simple integer lists (char_ids): [ \n 1, \n 2 \n ] -> [ 1, 2 ]
-    json_str = re.sub(
-        r'\[\s*((?:\d+(?:,\s*)?)+)\s*\]',
-        lambda m: "[" + re.sub(r'\s+', ' ', m.group(1)).strip() + "]",
-        json_str,
-        flags=re.DOTALL
-    )
-    
-    # B. Flatten the word objects
-    # Matches: { \n "word_id": 1, \n "text": "...", \n "char_ids": [ ... ] \n }
-    json_str = re.sub(
-        r'\{\s*"word_id":\s*(\d+),\s*"text":\s*"([^"]*)",\s*"char_ids":\s*(\[[^\]]*\])\s*\}',
-        r'{ "word_id": \1, "text": "\2", "char_ids": \3 }',
-        json_str,
-        flags=re.DOTALL
-    )
+async def save_progress(data, filepath, changed: list | None = None):
+    if STORAGE_MODE == "delta":
+        if changed is not None:
+            keys = _stage_delta_keys(CURRENT_STAGE)
+            deltas = [story_store.verse_delta(v, keys) for v in changed]
+            # Snapshot taken on the loop; encoding + file I/O run off-loop.
+            written = await asyncio.to_thread(story_store.append_deltas, filepath, deltas)
+            print(f"💾 Saved {written} verse deltas.")
+            return
+        # `data` may be a projection without base_chars: stream file + delta log instead.
+        await asyncio.to_thread(story_store.compact_story, filepath)
+        print("💾 Saved (Compact Format).")
+        return
 
-    with open(temp, 'w', encoding='utf-8') as f:
-        f.write(json_str)
+    temp = filepath + ".tmp"
+    story_store.write_story_file(data, temp)
 
     # Retry loop for Windows file locking issues
     for attempt in range(5):
         try:
             os.replace(temp, filepath)
+            story_store.clear_deltas(filepath)
             print("💾 Saved (Compact Format).")
             return
         except PermissionError:
@@ -3197,27 +3767,186 @@ async def save_progress(data, filepath):
             
     print("❌ Critical: Could not save file after 5 attempts.")
 
-async def main():
-    global DRY_RUN_OUT, DRY_RUN_LIMIT, REGISTRY_CACHE
-    if not os.path.exists(DATA_FILE):
+async def _wal_append(verse_obj, stage, result_key, payload, state_id, model):
+    if not STORAGE_WAL or DRY_RUN:
         return
-    
-    # NEW STARTUP SEQUENCE
-    await ensure_startup_state()
-
-    # CHECKPOINTING / BACKUP
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"{DATA_FILE}.{timestamp}.bak"
+    record = story_store.wal_record(verse_obj.get("verse_id"), stage, result_key, payload, state_id, model)
     try:
-        shutil.copy(DATA_FILE, backup_file)
-        _log(f"📦 Created Checkpoint: {backup_file}")
+        await asyncio.to_thread(story_store.append_wal, DATA_FILE, record)
     except Exception as e:
-        print(f"⚠️ Backup failed: {e}")
-
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    if CURRENT_STAGE == "entities":
+        print(f"⚠️ WAL write failed for {verse_obj.get('verse_id')}: {e}")
+
+async def persist_worker(queue: asyncio.Queue, data, filepath):
+    """
+    Writer task for the LLM scheduler: collects finished verses from `queue`
+    and saves them every STORAGE_FLUSH_EVERY verses or STORAGE_FLUSH_INTERVAL
+    seconds, so analysis workers never wait for a save. None stops the task.
+    """
+    pending = []
+    last_flush = time.monotonic()
+    stop = False
+    while not stop:
+        timeout = max(0.1, STORAGE_FLUSH_INTERVAL - (time.monotonic() - last_flush))
+        try:
+            verse = await asyncio.wait_for(queue.get(), timeout=timeout)
+            if verse is None:
+                stop = True
+            else:
+                pending.append(verse)
+        except asyncio.TimeoutError:
+            pass
+        due = time.monotonic() - last_flush >= STORAGE_FLUSH_INTERVAL
+        if pending and (stop or due or len(pending) >= STORAGE_FLUSH_EVERY):
+            # A verse finishing several stages (pipeline / dag) is saved once per flush.
+            batch, pending = list({id(v): v for v in pending}.values()), []
+            try:
+                await save_progress(data, filepath, changed=batch)
+            except Exception as e:
+                print(f"❌ Save failed: {e}")
+                pending = batch + pending
+            last_flush = time.monotonic()
+        elif due:
+            last_flush = time.monotonic()
+
+async def finish_storage(data, filepath):
+    """Exports pending deltas into the legacy story_data.json at the end of a stage."""
+    if STORAGE_MODE != "delta":
+        return
+    pending = story_store.pending_deltas(filepath)
+    if not pending:
+        return
+    if not STORAGE_COMPACT_ON_FINISH:
+        _log(f"🧾 {pending} verse deltas/WAL records pending for {filepath} (run story_store.py compact)")
+        return
+    _log(f"🗜️ Compacting {pending} verse deltas into {filepath}...")
+    await save_progress(data, filepath)
+
+async def run_local_pool(data, stage: str, verses: list, workers: int):
+    """
+    Local stage on `workers` processes: verses are sharded into chunks (only the
+    builder's fields are pickled), results are merged back into the verse objects
+    and handed to the writer task as chunks complete.
+    """
+    result_key = _stage_result_key(stage)
+    size = max(1, min(LOCAL_POOL_CHUNK, -(-len(verses) // (workers * 4))))
+    chunks = [verses[i:i + size] for i in range(0, len(verses), size)]
+    registry = _load_registry() if stage == "entities" else None
+    _log(f"⚙️ {stage}: {len(verses)} verses on {workers} processes ({len(chunks)} chunks of <= {size})")
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    done = 0
+    done_queue = asyncio.Queue()
+    writer = asyncio.create_task(persist_worker(done_queue, data, DATA_FILE))
+    try:
+        with _local_pool(workers, registry) as pool:
+            pending = {
+                loop.run_in_executor(pool, _local_build_chunk, stage, _local_rows(stage, chunk)): chunk
+                for chunk in chunks
+            }
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in finished:
+                    chunk = pending.pop(fut)
+                    for verse, result in zip(chunk, fut.result()):
+                        verse[result_key] = result
+                        _stamp_fingerprint(verse, stage)
+                        await done_queue.put(verse)
+                    done += len(chunk)
+                print(f"⚙️ {stage.upper()} {done}/{len(verses)} [local x{workers}]")
+    finally:
+        await done_queue.put(None)
+        await writer
+    elapsed = time.monotonic() - started
+    _log(f"⚙️ {stage}: {done} verses in {elapsed:.1f}s ({done / max(elapsed, 1e-6):.0f} verses/s, {workers} processes)")
+
+async def _run_verse_pipeline(session, verse_obj, stages: list[str]) -> list[str]:
+    """
+    Runs one verse through `stages` in order, right after each other, so chained
+    stages continue the fresh response id of the previous stage. Stops at the
+    first stage that produced no result (later stages would lack their input).
+    """
+    vid = verse_obj.get("verse_id")
+    completed = []
+    for stage in stages:
+        if not _is_stage_pending(verse_obj, stage):
+            continue
+        if not _has_prerequisite(verse_obj, stage):
+            if not DRY_RUN:
+                print(f"⏸️ {vid}: {stage} needs {', '.join(stage_registry.missing_inputs(verse_obj, stage))}")
+            break
+        result_key = _stage_result_key(stage)
+        before = verse_obj.get(result_key)
+        await analyze_stage(session, verse_obj, stage)
+        after = verse_obj.get(result_key)
+        if after is None or after is before:
+            if DRY_RUN:
+                continue
+            break
+        completed.append(stage)
+    return completed
+
+async def run_pipeline(data, to_process: list):
+    """
+    Pipeline mode: one worker per model slot takes the next verse and streams it
+    through all PIPELINE_STAGES; finished verses are persisted by the writer task.
+    """
+    stages = [s for s in PIPELINE_ORDER if s in PIPELINE_STAGES]
+    _log(f"🧬 Pipeline: {' -> '.join(stages)}")
+    to_process, costs = _order_work(to_process, stages)
+    forecast = _start_forecast(len(to_process), sum(costs.values()))
+    async with aiohttp.ClientSession() as session:
+        work_queue = asyncio.Queue()
+        for v in to_process:
+            work_queue.put_nowait(v)
+        done_queue = asyncio.Queue()
+        worker_count = max(1, min(len(to_process), MODEL_ROUTER.capacity()))
+
+        async def pipeline_worker():
+            while True:
+                try:
+                    verse = work_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.monotonic()
+                completed = []
+                try:
+                    completed = await _run_verse_pipeline(session, verse, stages)
+                except Exception as e:
+                    _log(f"⚠️ pipeline failed for {verse.get('verse_id', 'unknown')}: {e}")
+                elapsed = time.monotonic() - started
+                PIPELINE_STATS["verses"] += 1
+                PIPELINE_STATS["results"] += len(completed)
+                if completed:
+                    PIPELINE_STATS["latencies"].append(elapsed)
+                    _log(f"🧬 {verse.get('verse_id')}: {' -> '.join(completed)} in {elapsed:.1f}s")
+                if forecast is not None:
+                    forecast.done(costs[id(verse)])
+                await done_queue.put(verse)
+
+        writer = asyncio.create_task(persist_worker(done_queue, data, DATA_FILE))
+        _log(f"🧵 Workers: {worker_count} | flush every {STORAGE_FLUSH_EVERY} verses / {STORAGE_FLUSH_INTERVAL:g}s")
+        try:
+            await asyncio.gather(*(pipeline_worker() for _ in range(worker_count)))
+        finally:
+            await done_queue.put(None)
+            await writer
+
+    latencies = sorted(PIPELINE_STATS["latencies"])
+    line = f"🧬 Pipeline: {PIPELINE_STATS['verses']} verses | stage results={PIPELINE_STATS['results']}"
+    if latencies:
+        line += (
+            f" | verse latency p50={latencies[len(latencies) // 2]:.1f}s "
+            f"max={latencies[-1]:.1f}s"
+        )
+    _log(line)
+    _log_run_summary(stages)
+    await finish_storage(data, DATA_FILE)
+    print("🏁 Pipeline Complete!")
+
+def _prepare_stage(data, stage: str):
+    """Whole-story setup before a story-scope stage runs (registry, websearch context)."""
+    global REGISTRY_CACHE, VERSE_CONTEXT_MAP, PARALLEL_LINKS_MAP
+    if stage == "entities":
         subjects_dir = _subjects_dir()
         if not os.path.isdir(subjects_dir):
             os.makedirs(subjects_dir, exist_ok=True)
@@ -3243,63 +3972,222 @@ async def main():
                 _save_public_registry(public_registry)
                 if REGISTRY_PUBLIC_FILE:
                     print(f"📘 Registry written (public): {REGISTRY_PUBLIC_FILE} | subjects={len(public_registry)}")
-    elif CURRENT_STAGE == "websearch":
+    elif stage == "websearch":
         registry = _load_registry()
         if not registry:
             registry = _build_registry_from_data(data)
-        global VERSE_CONTEXT_MAP
         VERSE_CONTEXT_MAP = _build_websearch_context_map(data, registry, max(0, WEBSEARCH_CONTEXT_WINDOW))
-        global PARALLEL_LINKS_MAP
         links_path = WEBSEARCH_PARALLEL_LINKS_FILE
         if links_path and not os.path.isabs(links_path):
             links_path = os.path.join(os.path.dirname(__file__), "..", "..", links_path)
         PARALLEL_LINKS_MAP = _load_parallel_links(links_path)
 
+def _finalize_stage(data, stage: str):
+    """Whole-story outputs after all verses of a story-scope stage are done."""
+    if stage != "entities":
+        return
+    subjects_dir = _subjects_dir()
+    registry = _load_registry()
+    if BUILD_OCCURRENCES:
+        occ_path = os.path.join(subjects_dir, "occurrences.jsonl")
+        rows = _build_occurrences_from_data(data, registry)
+        _write_jsonl(occ_path, rows)
+        print(f"🧾 Wrote occurrences: {occ_path} | rows={len(rows)}")
+    if BUILD_ASSET_BIBLE:
+        bible_path = os.path.join(subjects_dir, "asset_bible.json")
+        bible = _build_asset_bible(data, registry)
+        with open(bible_path, "w", encoding="utf-8") as f:
+            json.dump(bible, f, ensure_ascii=False, indent=2)
+        print(f"📘 Wrote asset_bible: {bible_path} | subjects={len(bible.get('subjects', []))}")
+
+async def run_dag(data, plan):
+    """
+    DAG mode: runs the planned verse x stage tasks with DagScheduler. Independent
+    branches run at the same time (LLM tasks on the model slots, local and fetch
+    tasks on their own worker pools); finished verses go to the writer task.
+    """
+    stages = plan.active_stages()
+    if not stages:
+        print("🏁 DAG Complete! (nothing to do)")
+        return
+    # Local builders go to a process pool when the plan has enough local tasks; the
+    # pool processes load the registry from disk once the entities gate wrote it.
+    local_tasks = sum(len(plan.tasks[s]) for s in stages if s in _LOCAL_FIELDS)
+    local_workers = max((_local_pool_size(s, local_tasks) for s in stages), default=0)
+    pool = _local_pool(local_workers) if local_workers else None
+    # The scheduler takes equal-level tasks in plan.verses order.
+    task_costs = {(id(v), s): _estimate_task_cost(v, s) for s in stages for v in plan.tasks[s]}
+    verse_costs = {}
+    for (vid, _), cost in task_costs.items():
+        verse_costs[vid] = verse_costs.get(vid, 0) + cost
+    plan.verses, _ = _order_work(plan.verses, stages, verse_costs)
+    llm_tasks = sum(len(plan.tasks[s]) for s in stages if stage_registry.kind(s, _stage_mode(s)) == "llm")
+    forecast = _start_forecast(llm_tasks, sum(task_costs.values()))
+    loop = asyncio.get_running_loop()
+    async with aiohttp.ClientSession() as session:
+        done_queue = asyncio.Queue()
+
+        async def run_task(verse, stage):
+            try:
+                return await _run_task(verse, stage)
+            finally:
+                if forecast is not None and task_costs.get((id(verse), stage)):
+                    forecast.done(task_costs[(id(verse), stage)])
+
+        async def _run_task(verse, stage):
+            if not DRY_RUN and not _has_prerequisite(verse, stage):
+                print(f"⏸️ {verse.get('verse_id')}: {stage} needs {', '.join(stage_registry.missing_inputs(verse, stage))}")
+                return False
+            result_key = _stage_result_key(stage)
+            before = verse.get(result_key)
+            if pool is not None and _local_pool_size(stage, local_tasks) and _is_stage_pending(verse, stage):
+                results = await loop.run_in_executor(pool, _local_build_chunk, stage, _local_rows(stage, [verse]))
+                verse[result_key] = results[0]
+                _stamp_fingerprint(verse, stage)
+                return True
+            await analyze_stage(session, verse, stage)
+            after = verse.get(result_key)
+            return after is not None and after is not before
+
+        async def prepare(stage):
+            _log(f"🚪 {stage}: inputs finished, preparing whole-story context")
+            _prepare_stage(data, stage)
+
+        async def finalize(stage):
+            _finalize_stage(data, stage)
+
+        kinds = {stage_registry.kind(s, _stage_mode(s)) for s in stages}
+        workers = {k: v for k, v in DAG_WORKERS.items() if k in kinds}
+        if "llm" in kinds:
+            workers["llm"] = MODEL_ROUTER.capacity()
+        if pool is not None:
+            workers["local"] = local_workers
+        scheduler = DagScheduler(plan, run_task, workers=workers, prepare=prepare, finalize=finalize,
+                                 on_done=done_queue.put, log=_log)
+        writer = asyncio.create_task(persist_worker(done_queue, data, DATA_FILE))
+        _log(f"🧵 Workers: {', '.join(f'{k}={v}' for k, v in sorted(workers.items()))} | flush every {STORAGE_FLUSH_EVERY} verses / {STORAGE_FLUSH_INTERVAL:g}s")
+        try:
+            await scheduler.run()
+        finally:
+            await done_queue.put(None)
+            await writer
+            if pool is not None:
+                pool.shutdown()
+
+    _log(f"🗺️ DAG: {scheduler.summary()}")
+    _log_run_summary([s for s in stages if stage_registry.kind(s, _stage_mode(s)) == "llm"])
+    await finish_storage(data, DATA_FILE)
+    print("🏁 DAG Complete!")
+
+async def main():
+    global DRY_RUN_OUT, DRY_RUN_LIMIT, ACTIVE_STAGES, FINGERPRINTS
+    if not os.path.exists(DATA_FILE):
+        return
+    
+    # NEW STARTUP SEQUENCE
+    await ensure_startup_state()
+
+    # CHECKPOINTING / BACKUP
+    # Deduplicated snapshot: only verses changed since the last checkpoint are written.
+    if not SHOW_PLAN:
+        try:
+            manifest = checkpoints.create_checkpoint(DATA_FILE, label=f"run_stage:{CURRENT_STAGE}")
+            if manifest:
+                _log(f"📦 Created Checkpoint: {checkpoints.describe(manifest)}")
+        except Exception as e:
+            print(f"⚠️ Backup failed: {e}")
+
+    # Delta mode never re-serializes the list held in memory, so per-char
+    # arrays that no stage reads (base_chars) stay on disk. Whatever is loaded
+    # keeps base_chars/char_ids in the columnar form (char_columns).
+    exclude = ["base_chars"] if STORAGE_MODE == "delta" else None
+    data = story_store.load_story(DATA_FILE, replay=False, exclude=exclude, columnar=True)
+    # Recover results persisted as deltas by earlier (possibly interrupted) runs
+    # WAL records hold results that finished after the last flush (e.g. before a
+    # crash); both logs are replayed together in write order, newest write wins.
+    delta_rows = story_store.read_deltas(DATA_FILE, include_wal=False)
+    wal_rows = story_store.read_wal(DATA_FILE)
+    replayed = story_store.replay_deltas(data, story_store.merge_logs(delta_rows, wal_rows))
+    if replayed:
+        _log(
+            f"♻️ Replayed {replayed} records in write order: {len(delta_rows)} verse deltas "
+            f"({story_store.delta_path(DATA_FILE)}), {len(wal_rows)} stage results ({story_store.wal_path(DATA_FILE)})"
+        )
+
+    if FINGERPRINTS_ENABLED or CHANGED_ONLY:
+        aliases = fingerprints.load_alias_table("de" if _is_de_context() else None)
+        FINGERPRINTS = fingerprints.Fingerprinter(config, aliases, _stage_modes())
+    if CHANGED_ONLY:
+        # Lexicon / alias edits reach the stages through these fields: bring them
+        # up to date first, so the fingerprints below compare against current tables.
+        refreshed = [v for v in data if FINGERPRINTS.refresh_inputs(v)]
+        _log(f"🧬 Changed-only: lexicon/alias inputs refreshed in {len(refreshed)} verses")
+        if refreshed and not DRY_RUN and not SHOW_PLAN:
+            await save_progress(data, DATA_FILE, changed=refreshed)
+
+    if SHOW_PLAN or CURRENT_STAGE == "dag":
+        if DRY_RUN and DRY_RUN_LIMIT is None and (not MAX_ITEMS or MAX_ITEMS <= 0):
+            DRY_RUN_LIMIT = 3
+        limit = MAX_ITEMS if MAX_ITEMS and MAX_ITEMS > 0 else 0
+        if DRY_RUN and DRY_RUN_LIMIT:
+            limit = min(limit or DRY_RUN_LIMIT, DRY_RUN_LIMIT)
+        if CURRENT_STAGE == "dag":
+            targets = DAG_STAGES
+        elif CURRENT_STAGE == "pipeline":
+            targets = PIPELINE_STAGES
+        else:
+            targets = [CURRENT_STAGE]
+        # With a work order the cap applies after ordering: plan everything first.
+        ordered_cap = bool(limit) and (TASK_ORDER != "file" or bool(TASK_PRIORITY))
+        plan = stage_registry.build_plan(
+            data, targets, _stage_modes(), force=FORCE_STAGE,
+            upstream=CURRENT_STAGE == "dag", lenient=DRY_RUN, limit=0 if ordered_cap else limit,
+            pending=_is_stage_pending, cascade=CHANGED_ONLY
+        )
+        if ordered_cap:
+            verse_costs = {}
+            for stage in plan.active_stages():
+                for v in plan.tasks[stage]:
+                    verse_costs[id(v)] = verse_costs.get(id(v), 0) + _estimate_task_cost(v, stage)
+            plan.restrict(_cap_work(plan.verses, limit, lambda v: verse_costs.get(id(v), 0)))
+        for line in plan.describe():
+            _log(line)
+        if SHOW_PLAN:
+            return
+        ACTIVE_STAGES = plan.active_stages()
+        if DRY_RUN and not DRY_RUN_OUT:
+            _ensure_log_dir()
+            DRY_RUN_OUT = os.path.join(LOG_DIR, "dryrun_dag.jsonl")
+        await run_dag(data, plan)
+        return
+
+    _prepare_stage(data, CURRENT_STAGE)
+
     # Filter: Process only items that HAVE the previous stage but MISSING the current stage
     # (Chain dependency check)
     to_process = []
-    
-    # Dependency Logic
-    required_prev = {
-        'graphematic': None,
-        'morphologic': None,
-        'translation': 'analysis_syntactic',
-        'syntactic': 'analysis_morphologic',
-        'semantic': 'analysis_syntactic',
-        'entities': 'analysis_semantic',
-        'websearch': 'analysis_entities',
-        'asset_cards': 'analysis_entities'
-    }
-    
-    prev_key = required_prev.get(CURRENT_STAGE)
-    target_key = f"analysis_{CURRENT_STAGE}"
-
     for v in data:
-        # Check if previous stage exists (if there is a dependency)
-        has_prev = True
-        if prev_key and not v.get(prev_key):
-             # For morphologic, we proceed even if graphematic had errors, 
-             # as long as we have text. But strictly, we should have it.
-             # Let's be lenient for this test:
-             if 'error' in str(v.get(prev_key, "")):
-                 has_prev = False 
-             elif v.get(prev_key) is None:
-                 has_prev = False
-
-        if has_prev and _is_stage_pending(v, CURRENT_STAGE):
-            to_process.append(v)
-        elif DRY_RUN and _is_stage_pending(v, CURRENT_STAGE):
+        if CURRENT_STAGE == "pipeline":
+            pending = [s for s in PIPELINE_STAGES if _is_stage_pending(v, s)]
+            if pending and (DRY_RUN or _has_prerequisite(v, pending[0])):
+                to_process.append(v)
+        elif _is_stage_pending(v, CURRENT_STAGE) and (DRY_RUN or _has_prerequisite(v, CURRENT_STAGE)):
             to_process.append(v)
 
-    # Optional cap for fast debug runs
+    # Optional cap for fast debug runs (taken in dispatch order, see _cap_work)
+    cap_stages = PIPELINE_STAGES if CURRENT_STAGE == "pipeline" else [CURRENT_STAGE]
+
+    def cap_cost(v):
+        return sum(_estimate_task_cost(v, s) for s in cap_stages if _is_stage_pending(v, s))
+
     if MAX_ITEMS and MAX_ITEMS > 0:
-        to_process = to_process[:MAX_ITEMS]
+        to_process = _cap_work(to_process, MAX_ITEMS, cap_cost)
 
     if DRY_RUN:
         if DRY_RUN_LIMIT is None and (not MAX_ITEMS or MAX_ITEMS <= 0):
             DRY_RUN_LIMIT = 3
         if DRY_RUN_LIMIT:
-            to_process = to_process[:DRY_RUN_LIMIT]
+            to_process = _cap_work(to_process, DRY_RUN_LIMIT, cap_cost)
         if not DRY_RUN_OUT:
             _ensure_log_dir()
             DRY_RUN_OUT = os.path.join(LOG_DIR, f"dryrun_{CURRENT_STAGE}.jsonl")
@@ -3307,6 +4195,30 @@ async def main():
     
     _log(f"🚀 Starting STAGE: {CURRENT_STAGE}")
     _log(f"🎯 Targets: {len(to_process)} verses")
+
+    if CURRENT_STAGE == "pipeline":
+        await run_pipeline(data, to_process)
+        return
+
+    # Local builders on a process pool (graphematic local, morphologic text, syntactic heuristic, entities)
+    local_workers = _local_pool_size(CURRENT_STAGE, len(to_process))
+    if local_workers:
+        await run_local_pool(data, CURRENT_STAGE, to_process, local_workers)
+        if CURRENT_STAGE == "entities":
+            totals = {"entities": 0, "alias_hits": 0, "state_triggers": 0, "state_updates": 0}
+            for v in to_process:
+                stats = _entities_stats(v)
+                for k in totals:
+                    totals[k] += stats.get(k, 0)
+            print(
+                f"📊 Entities Progress: {len(to_process)}/{len(to_process)} | "
+                f"entities={totals['entities']} alias_hits={totals['alias_hits']} "
+                f"state_triggers={totals['state_triggers']} state_updates={totals['state_updates']}"
+            )
+            _finalize_stage(data, CURRENT_STAGE)
+        await finish_storage(data, DATA_FILE)
+        print("🏁 Stage Complete!")
+        return
     
     # Local-only graphematic: skip LM Studio entirely
     if CURRENT_STAGE == "graphematic" and GRAPHEMATIC_MODE == "local":
@@ -3318,7 +4230,8 @@ async def main():
         for i in range(0, len(tasks), chunk_size):
             chunk = tasks[i:i + chunk_size]
             await asyncio.gather(*chunk)
-            await save_progress(data, DATA_FILE)
+            await save_progress(data, DATA_FILE, changed=to_process[i:i + chunk_size])
+        await finish_storage(data, DATA_FILE)
         print("🏁 Stage Complete!")
         return
 
@@ -3339,72 +4252,117 @@ async def main():
                 stats = _entities_stats(r)
                 for k in totals:
                     totals[k] += stats.get(k, 0)
-            await save_progress(data, DATA_FILE)
+            await save_progress(data, DATA_FILE, changed=to_process[i:i + chunk_size])
             print(
                 f"📊 Entities Progress: {processed}/{len(to_process)} | "
                 f"entities={totals['entities']} alias_hits={totals['alias_hits']} "
                 f"state_triggers={totals['state_triggers']} state_updates={totals['state_updates']}"
             )
 
-        subjects_dir = _subjects_dir()
-        registry = _load_registry()
-        if BUILD_OCCURRENCES:
-            occ_path = os.path.join(subjects_dir, "occurrences.jsonl")
-            rows = _build_occurrences_from_data(data, registry)
-            _write_jsonl(occ_path, rows)
-            print(f"🧾 Wrote occurrences: {occ_path} | rows={len(rows)}")
-        if BUILD_ASSET_BIBLE:
-            bible_path = os.path.join(subjects_dir, "asset_bible.json")
-            bible = _build_asset_bible(data, registry)
-            with open(bible_path, "w", encoding="utf-8") as f:
-                json.dump(bible, f, ensure_ascii=False, indent=2)
-            print(f"📘 Wrote asset_bible: {bible_path} | subjects={len(bible.get('subjects', []))}")
+        _finalize_stage(data, CURRENT_STAGE)
+        await finish_storage(data, DATA_FILE)
         print("🏁 Stage Complete!")
         return
 
-    # Initialize per-model semaphores
-    global model_semaphores
-    model_semaphores = {m: asyncio.Semaphore(MAX_CONCURRENT_PER_MODEL) for m in MODELS}
-
     async with aiohttp.ClientSession() as session:
-        # Increase the global semaphore significantly because we now throttle per-model.
-        # If we have 2 models * 6 concurrent = 12 total capacity.
-        # Let's set global sem to 20 to be safe and let the model_semaphores handle the real limits.
-        sem = asyncio.Semaphore(20) 
-        
-        async def bound_analyze(verse):
-            async with sem:
+        # Continuous scheduler: one worker per model slot pulls the next verse as
+        # soon as it is free (no chunk barrier); finished verses go to the writer task.
+        work_queue = asyncio.Queue()
+        work_items = to_process
+        if _batching_active(CURRENT_STAGE):
+            # Queue items become lists of consecutive verses (one request each).
+            work_items = _plan_batches(to_process, CURRENT_STAGE)
+            _log(f"📦 Batching: {len(to_process)} verses -> {len(work_items)} requests (max {BATCH_SIZE} per request)")
+        work_items, costs = _order_work(work_items, [CURRENT_STAGE])
+        forecast = _start_forecast(len(to_process), sum(costs.values()))
+        for item in work_items:
+            work_queue.put_nowait(item)
+        done_queue = asyncio.Queue()
+        worker_count = max(1, min(len(work_items), MODEL_ROUTER.capacity()))
+
+        async def analysis_worker():
+            while True:
                 try:
-                    return await analyze_stage(session, verse, CURRENT_STAGE)
+                    item = work_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                verses = item if isinstance(item, list) else [item]
+                try:
+                    if isinstance(item, list):
+                        await analyze_batch(session, item, CURRENT_STAGE)
+                    else:
+                        await analyze_stage(session, item, CURRENT_STAGE)
                 except Exception as e:
-                    vid = verse.get("verse_id") if isinstance(verse, dict) else None
+                    vid = verses[0].get("verse_id") if verses and isinstance(verses[0], dict) else None
                     _log(f"⚠️ {CURRENT_STAGE} failed for {vid or 'unknown'}: {e}")
-                    return verse
-
-        tasks = [bound_analyze(v) for v in to_process]
-        
-        chunk_size = 50
-        for i in range(0, len(tasks), chunk_size):
-            chunk = tasks[i:i + chunk_size]
-            await asyncio.gather(*chunk)
-            await save_progress(data, DATA_FILE)
+                if forecast is not None:
+                    forecast.done(costs[id(item)], len(verses))
+                for verse in verses:
+                    await done_queue.put(verse)
+
+        writer = asyncio.create_task(persist_worker(done_queue, data, DATA_FILE))
+        _log(f"🧵 Workers: {worker_count} | flush every {STORAGE_FLUSH_EVERY} verses / {STORAGE_FLUSH_INTERVAL:g}s")
+        if CONCURRENCY["adaptive"]:
+            _log(
+                f"🎚️ Adaptive concurrency: {CONCURRENCY['min']}-{CONCURRENCY['max']} per model | "
+                f"start {MODEL_ROUTER.limits_line()}"
+            )
+        try:
+            await asyncio.gather(*(analysis_worker() for _ in range(worker_count)))
+        finally:
+            await done_queue.put(None)
+            await writer
 
+    _log_run_summary([CURRENT_STAGE])
+    await finish_storage(data, DATA_FILE)
     print("🏁 Stage Complete!")
 
+def _log_run_summary(stages: list[str]):
+    if not DRY_RUN:
+        _log(f"🧭 Routing ({MODEL_ROUTING}): {MODEL_ROUTER.summary()}")
+        for stage in stages:
+            _log(f"🔁 Retries {RETRY_POLICY.summary(stage)}")
+        if MODEL_BREAKERS.settings["enabled"]:
+            _log(f"⚡ Circuits: {MODEL_BREAKERS.summary()}")
+        if BATCH_STATS["batches"]:
+            _log(
+                f"📦 Batches: {BATCH_STATS['batches']} requests for {BATCH_STATS['verses']} verses | "
+                f"answered in batch={BATCH_STATS['answered']} single-verse fallback={BATCH_STATS['fallback']}"
+            )
+    if llm_cache.enabled() and not DRY_RUN:
+        _log(f"🗃️ LLM cache: {llm_cache.summary()}")
+    if TOKEN_COUNTER is not None and not DRY_RUN:
+        TOKEN_COUNTER.save()
+        _log(f"🔢 Tokens: {TOKEN_COUNTER.summary()}")
+    for stage in stages:
+        timing_line = _timing_summary(stage)
+        if timing_line:
+            _log(f"⏱️ Latency {timing_line}")
+
 if __name__ == "__main__":
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     
     import argparse
     parser = argparse.ArgumentParser(description="Run linguistic analysis stages.")
-    parser.add_argument("stage", nargs="?", default=None, help="The stage to run (graphematic, morphologic, syntactic, semantic, translation, entities, websearch, asset_cards)")
+    parser.add_argument("stage", nargs="?", default=None, help="The stage to run (graphematic, morphologic, syntactic, semantic, translation, entities, websearch, pipeline, dag)")
+    parser.add_argument("--stages", help="pipeline/dag: comma-separated stages, optionally stage=mode (e.g. morphologic=json,syntactic,semantic,translation)")
+    parser.add_argument("--plan", action="store_true", help="Print the verse x stage task plan and exit without running anything")
     parser.add_argument("--mode", choices=["local", "llm", "heuristic", "json", "text", "fetch"], help="Override processing mode for the current stage")
     parser.add_argument("--dry-run", action="store_true", help="Simulate prompt generation without calling LLM")
     parser.add_argument("--dry-run-limit", type=int, default=3, help="Number of items for dry run")
     parser.add_argument("--dry-run-out", help="Output file for dry run logs")
     parser.add_argument("--stream", action="store_true", help="Enable streaming for LLM requests (stateful /api/v1/chat)")
+    parser.add_argument("--prompt-prefix", choices=["inline", "system"], help="Send the static prompt prefix inline or as system_prompt (overrides processing.prompt_prefix)")
+    parser.add_argument("--timing-out", help="Append per-request latency records (TTFT, total, prefix hash) to this JSONL file")
     parser.add_argument("--force", action="store_true", help="Force re-run even if stage is already complete")
+    parser.add_argument("--changed", action="store_true", help="Also re-run verses whose input fingerprint changed (lexicon, aliases, upstream results, config, prompt version)")
+    parser.add_argument("--batch", type=int, help="Verses per LLM request for morphologic json / graphematic+syntactic review (1 disables; overrides processing.batching)")
+    parser.add_argument("--order", choices=list(task_order.ORDERS), help="Dispatch order of LLM work: file, sjf (cheapest estimated tokens first) or interleave (overrides processing.scheduling.order)")
+    parser.add_argument("--priority", help="Chapters / ranges / verse ids that go first, e.g. 1-5,12,46:1 (overrides processing.scheduling.priority)")
+    parser.add_argument("--local-workers", type=int, help="Processes for local builders (0 = all cores, 1 = in-process; overrides processing.local_pool.workers)")
     parser.add_argument("--limit", type=int, default=0, help="Limit number of items to process")
+    parser.add_argument("--no-compact", action="store_true", help="Keep per-verse deltas pending instead of exporting story_data.json at the end")
     parser.add_argument("--data-file", help="Override story_data.json path for this run")
     parser.add_argument("--registry-file", help="Override registry.json path for this run")
     parser.add_argument("--subjects-dir", help="Output directory for registry/occurrences/asset_bible (entities stage)")
@@ -3463,23 +4421,31 @@ if __name__ == "__main__":
         CURRENT_STAGE = args.stage
     
     # 2. Mode Override
-    if args.mode:
-        if CURRENT_STAGE == 'graphematic':
-            GRAPHEMATIC_MODE = args.mode
-        elif CURRENT_STAGE == 'morphologic':
-            MORPHOLOGIC_MODE = args.mode
-        elif CURRENT_STAGE == 'syntactic':
-            SYNTACTIC_MODE = args.mode # e.g. 'heuristic' vs 'llm'
-        elif CURRENT_STAGE == 'translation':
-            TRANSLATION_MODE = args.mode # 'text' (draft) or 'json' (final)
-        elif CURRENT_STAGE == 'websearch':
-            if args.mode in ("local", "fetch"):
-                WEBSEARCH_MODE = args.mode
-            elif args.mode == "llm":
-                WEBSEARCH_MODE = "fetch"
-                print("ℹ️ Websearch internal LLM summary is removed. Using fetch mode.")
-            else:
-                print("⚠️ Websearch mode supports only local|fetch. Using config default.")
+    if args.mode and CURRENT_STAGE not in ("pipeline", "dag"):
+        _set_stage_mode(CURRENT_STAGE, args.mode)
+    if CURRENT_STAGE in ("pipeline", "dag"):
+        selected = PIPELINE_STAGES if CURRENT_STAGE == "pipeline" else DAG_STAGES
+        if args.stages:
+            selected = []
+            for item in args.stages.split(","):
+                name, _, mode = item.strip().partition("=")
+                if name:
+                    selected.append(name)
+                if name and mode:
+                    _set_stage_mode(name, mode)
+        allowed = PIPELINE_ORDER if CURRENT_STAGE == "pipeline" else RUNNABLE_STAGES
+        unknown = [s for s in selected if s not in allowed]
+        if unknown:
+            parser.error(f"{CURRENT_STAGE} supports {', '.join(allowed)}; got {', '.join(unknown)}")
+        if CURRENT_STAGE == "pipeline":
+            PIPELINE_STAGES = selected
+            ACTIVE_STAGES = selected
+        else:
+            DAG_STAGES = selected
+    elif CURRENT_STAGE not in RUNNABLE_STAGES:
+        parser.error(f"unknown stage {CURRENT_STAGE}; expected one of {', '.join(RUNNABLE_STAGES + ['pipeline', 'dag'])}")
+    if args.plan:
+        SHOW_PLAN = True
     
     # 3. Dry Run / Limits
     if args.dry_run:
@@ -3490,10 +4456,26 @@ if __name__ == "__main__":
         DRY_RUN_OUT = args.dry_run_out
     if args.stream:
         STREAM_LM = True
+    if args.prompt_prefix:
+        PROMPT_PREFIX_MODE = args.prompt_prefix
+    if args.timing_out:
+        TIMING_OUT = args.timing_out
     if args.limit:
         MAX_ITEMS = args.limit
     if args.force:
         FORCE_STAGE = True
+    if args.changed:
+        CHANGED_ONLY = True
+    if args.batch is not None:
+        BATCH_SIZE = max(1, args.batch)
+    if args.order:
+        TASK_ORDER = args.order
+    if args.priority is not None:
+        TASK_PRIORITY = task_order.parse_priority(args.priority)
+    if args.no_compact:
+        STORAGE_COMPACT_ON_FINISH = False
+    if args.local_workers is not None:
+        LOCAL_POOL_WORKERS = max(0, args.local_workers)
 
     _log(f"🔧 CONFIG: Stage={CURRENT_STAGE}, Mode={args.mode if args.mode else 'Config Default'}")
     try:
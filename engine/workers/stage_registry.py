@@ -0,0 +1,390 @@
+import argparse
+
+# Declarative stage table: the single source for stage dependencies, result keys
+# and pending rules (run_stage.py, reset_stage.py and the DAG scheduler read it).
+#   key        base result field; `requires` of later stages check this field
+#   requires   stages whose result must exist before the stage can run
+#   uses       stages read when present (ordered before the stage in a plan, reset
+#              together with it, but not required)
+#   scope      "verse": each verse runs on its own
+#              "story": the stage reads the whole story (registry, context map), so
+#              it starts only after all planned tasks of its inputs are finished
+#   kind       "llm" (model slots), "local" (CPU in-process) or "io" (network fetch)
+#   runner     script that executes the stage
+#   modes      per --mode variant: kind, output (result field, default `key`),
+#              writes (extra fields), alias (name of the variant in reset_stage.py);
+#              an unknown mode behaves like `fallback_mode` (default: default_mode)
+#   done_status    a dict result is complete only with one of these statuses
+#   done_requires_dict  a non-dict result counts as pending
+#   reads      verse fields the stage reads besides its input results (fingerprints)
+#   config     dotted config.json paths that change the result (fingerprints)
+#   prompt_version  prompts.py constant of the stage prompt (LLM modes, fingerprints)
+STAGES = {
+    "graphematic": {
+        "key": "analysis_graphematic",
+        "requires": [],
+        "scope": "verse",
+        "kind": "local",
+        "runner": "run_stage",
+        "reads": ["text", "words"],
+        "config": ["processing.graphematic_punctuations"],
+        "config_mode": "graphematic_mode",
+        "default_mode": "local",
+        "modes": {
+            "local": {"kind": "local"},
+            "llm": {"kind": "llm", "output": "analysis_graphematic_review"},
+        },
+        "done_status": ["complete"],
+    },
+    "morphologic": {
+        "key": "analysis_morphologic",
+        "requires": [],
+        "scope": "verse",
+        "kind": "llm",
+        "runner": "run_stage",
+        "reads": ["text", "words"],
+        "prompt_version": "MORPHOLOGY_PROMPT_VERSION",
+        "config_mode": "morphologic_mode",
+        "default_mode": "json",
+        "modes": {
+            "text": {"kind": "local"},
+            "json": {"kind": "llm"},
+            "llm": {"kind": "llm", "output": "analysis_morphologic_review", "writes": ["analysis_morphologic"]},
+        },
+    },
+    "syntactic": {
+        "key": "analysis_syntactic",
+        "requires": ["morphologic"],
+        "scope": "verse",
+        "kind": "llm",
+        "runner": "run_stage",
+        "reads": ["words"],
+        "prompt_version": "SYNTAX_PROMPT_VERSION",
+        "config_mode": "syntactic_mode",
+        "default_mode": "llm",
+        "fallback_mode": "json",
+        "modes": {
+            "heuristic": {"kind": "local"},
+            "json": {"kind": "llm"},
+            "llm": {"kind": "llm", "output": "analysis_syntactic_review", "writes": ["analysis_syntactic"]},
+        },
+    },
+    "semantic": {
+        "key": "analysis_semantic",
+        "requires": ["syntactic"],
+        "scope": "verse",
+        "kind": "llm",
+        "runner": "run_stage",
+        "reads": ["text", "words"],
+        "prompt_version": "SEMANTIC_PROMPT_VERSION",
+    },
+    "translation": {
+        "key": "analysis_translation",
+        "requires": ["syntactic"],
+        "uses": ["semantic"],
+        "scope": "verse",
+        "kind": "llm",
+        "runner": "run_stage",
+        "reads": ["text"],
+        "prompt_version": "TRANSLATION_PROMPT_VERSION",
+        "default_mode": "text",
+        "modes": {
+            "text": {"kind": "llm", "output": "analysis_translation_draft", "alias": "translation_draft"},
+            "json": {"kind": "llm"},
+        },
+    },
+    "entities": {
+        "key": "analysis_entities",
+        "requires": ["semantic"],
+        "scope": "story",
+        "kind": "local",
+        "runner": "run_stage",
+        "reads": ["words", "alias_hits", "state_triggers", "state_updates"],
+    },
+    "websearch": {
+        "key": "analysis_websearch",
+        "requires": ["entities"],
+        "scope": "story",
+        "kind": "io",
+        "runner": "run_stage",
+        "reads": ["text", "words"],
+        "config": [
+            "websearch.sources", "websearch.entity_query_templates", "websearch.entity_query_templates_by_type",
+            "websearch.scene_query_templates", "websearch.verse_query_templates",
+        ],
+        "default_mode": "fetch",
+        "modes": {
+            "local": {"kind": "local"},
+            "fetch": {"kind": "io"},
+        },
+        "done_status": ["complete", "done"],
+        "done_requires_dict": True,
+    },
+    "asset_cards": {
+        "key": "analysis_asset_cards",
+        "requires": ["entities"],
+        "scope": "verse",
+        "kind": "llm",
+        "runner": "run_stage",
+        "reads": ["text"],
+    },
+}
+
+
+def mode_spec(stage: str, mode: str | None = None) -> dict:
+    spec = STAGES[stage]
+    modes = spec.get("modes") or {}
+    if not mode:
+        return modes.get(spec.get("default_mode")) or {}
+    if mode not in modes:
+        mode = spec.get("fallback_mode") or spec.get("default_mode")
+    return modes.get(mode) or {}
+
+
+def config_modes(processing: dict | None) -> dict:
+    """Configured mode per stage (processing.<stage>_mode, else the table default)."""
+    processing = processing or {}
+    modes = {}
+    for name, spec in STAGES.items():
+        mode = spec.get("default_mode")
+        if spec.get("config_mode"):
+            mode = processing.get(spec["config_mode"], mode)
+        modes[name] = mode
+    return modes
+
+
+def kind(stage: str, mode: str | None = None) -> str:
+    return mode_spec(stage, mode).get("kind") or STAGES[stage]["kind"]
+
+
+def output_key(stage: str, mode: str | None = None) -> str:
+    """Field the stage writes its result to in `mode`."""
+    return mode_spec(stage, mode).get("output") or STAGES[stage]["key"]
+
+
+def written_keys(stage: str, mode: str | None = None) -> list[str]:
+    keys = [output_key(stage, mode)]
+    for key in mode_spec(stage, mode).get("writes") or []:
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def inputs(stage: str) -> list[str]:
+    spec = STAGES[stage]
+    return list(spec.get("requires") or []) + [s for s in spec.get("uses") or [] if s not in spec.get("requires", [])]
+
+
+def missing_inputs(verse: dict, stage: str) -> list[str]:
+    """Required stages whose result field is absent (an empty result still counts)."""
+    return [s for s in STAGES[stage].get("requires") or [] if verse.get(STAGES[s]["key"]) is None]
+
+
+def is_pending(verse: dict, stage: str, mode: str | None = None) -> bool:
+    spec = STAGES[stage]
+    key = output_key(stage, mode)
+    val = verse.get(key)
+    if val is None:
+        return True
+    # Status rules describe the base result, not review variants.
+    if key != spec["key"]:
+        return False
+    if not isinstance(val, dict):
+        return bool(spec.get("done_requires_dict"))
+    done = spec.get("done_status")
+    return bool(done) and val.get("status") not in done
+
+
+def order(stages=None) -> list[str]:
+    """Stages in dependency order (table order breaks ties)."""
+    names = list(STAGES) if stages is None else [s for s in STAGES if s in set(stages)]
+    placed = []
+    remaining = list(names)
+    while remaining:
+        for name in remaining:
+            if all(dep in placed or dep not in names for dep in inputs(name)):
+                placed.append(name)
+                remaining.remove(name)
+                break
+        else:
+            raise ValueError(f"stage dependency cycle among {', '.join(remaining)}")
+    return placed
+
+
+def levels(stages) -> dict:
+    """Longest-path depth of each stage among `stages` (same level = independent)."""
+    depth = {}
+    for name in order(stages):
+        depth[name] = max((depth[d] + 1 for d in inputs(name) if d in depth), default=0)
+    return depth
+
+
+def downstream(stage: str) -> list[str]:
+    """`stage` and every stage that requires or uses it, transitively, in dependency order."""
+    found = {stage}
+    for name in order():
+        if any(dep in found for dep in inputs(name)):
+            found.add(name)
+    return order(found)
+
+
+def aliases(stage: str) -> list[str]:
+    return [m["alias"] for m in (STAGES[stage].get("modes") or {}).values() if m.get("alias")]
+
+
+def alias_target(name: str) -> tuple[str, str | None]:
+    """(stage, mode) for a stage name or a mode alias such as translation_draft."""
+    if name in STAGES:
+        return name, None
+    for stage, spec in STAGES.items():
+        for mode, mspec in (spec.get("modes") or {}).items():
+            if mspec.get("alias") == name:
+                return stage, mode
+    raise KeyError(name)
+
+
+def stage_names(include_aliases: bool = False) -> list[str]:
+    names = []
+    for stage in order():
+        if include_aliases:
+            names += aliases(stage)
+        names.append(stage)
+    return names
+
+
+def result_key(name: str) -> str:
+    """Result field of a stage name or mode alias (reset_stage.py)."""
+    stage, mode = alias_target(name)
+    return output_key(stage, mode) if mode else STAGES[stage]["key"]
+
+
+def ancestors(stage: str) -> set:
+    """Every stage `stage` requires, transitively."""
+    found = set()
+    todo = list(STAGES[stage].get("requires") or [])
+    while todo:
+        name = todo.pop()
+        if name not in found:
+            found.add(name)
+            todo += STAGES[name].get("requires") or []
+    return found
+
+
+class Plan:
+    """Verse x stage tasks for one run (see build_plan)."""
+
+    def __init__(self, stages: list[str], modes: dict):
+        self.stages = stages
+        self.modes = modes
+        self.tasks = {s: [] for s in stages}
+        self.verses = []
+        self.blocked = {s: 0 for s in stages}
+
+    def count(self) -> int:
+        return sum(len(v) for v in self.tasks.values())
+
+    def active_stages(self) -> list[str]:
+        return [s for s in self.stages if self.tasks[s]]
+
+    def restrict(self, verses: list) -> None:
+        """Keeps only the tasks of `verses` (a subset of self.verses)."""
+        keep = {id(v) for v in verses}
+        self.verses = [v for v in self.verses if id(v) in keep]
+        for stage in self.stages:
+            self.tasks[stage] = [v for v in self.tasks[stage] if id(v) in keep]
+
+    def describe(self) -> list[str]:
+        active = self.active_stages()
+        depth = levels(active)
+        lines = [f"🗺️ Plan: {self.count()} tasks over {len(self.verses)} verses"]
+        for level in sorted(set(depth.values())):
+            parts = []
+            for stage in [s for s in active if depth[s] == level]:
+                mode = self.modes.get(stage)
+                label = f"{stage}[{mode + '/' if mode and mode != kind(stage, mode) else ''}{kind(stage, mode)}"
+                label += ", story]" if STAGES[stage]["scope"] == "story" else "]"
+                parts.append(f"{label} {len(self.tasks[stage])}")
+            lines.append(f"  level {level}: " + " || ".join(parts))
+        blocked = {s: n for s, n in self.blocked.items() if n}
+        if blocked:
+            lines.append("  blocked (missing input outside the plan): " + ", ".join(f"{s}={n}" for s, n in blocked.items()))
+        return lines
+
+
+def build_plan(verses: list, targets: list[str], modes: dict | None = None, force: bool = False,
+               upstream: bool = True, lenient: bool = False, limit: int = 0, pending=None,
+               cascade: bool = False) -> Plan:
+    """
+    Minimal task set for `targets`: a target runs where it is pending (always with
+    force); with upstream=True a pending required stage is added for a verse only
+    when one of its planned tasks needs that result. Tasks whose required input is
+    neither present nor planned are counted as blocked (lenient keeps them).
+    `limit` caps the number of verses with tasks. `pending(verse, stage)` replaces
+    is_pending; with cascade=True a target is also planned after a planned input
+    (fingerprints: whether it changed is only known once that input ran).
+    """
+    modes = modes or {}
+    if pending is None:
+        pending = lambda verse, stage: is_pending(verse, stage, modes.get(stage))
+    wanted = set(targets)
+    if upstream:
+        for stage in list(wanted):
+            wanted.update(ancestors(stage))
+    stages = order(wanted)
+    plan = Plan(stages, modes)
+    for verse in verses:
+        planned = set()
+        # Walk targets downstream-first so required inputs are added on demand.
+        for stage in reversed(stages):
+            if stage in targets:
+                if not (force or pending(verse, stage)):
+                    continue
+            elif stage not in planned:
+                continue
+            planned.add(stage)
+            if upstream:
+                for dep in STAGES[stage].get("requires") or []:
+                    if verse.get(STAGES[dep]["key"]) is None:
+                        planned.add(dep)
+        if cascade:
+            for stage in stages:
+                if stage in targets and any(dep in planned for dep in inputs(stage)):
+                    planned.add(stage)
+        runnable = []
+        for stage in stages:
+            if stage not in planned:
+                continue
+            missing = [d for d in missing_inputs(verse, stage) if d not in runnable]
+            if missing and not lenient:
+                plan.blocked[stage] += 1
+                continue
+            runnable.append(stage)
+        if not runnable:
+            continue
+        plan.verses.append(verse)
+        for stage in runnable:
+            plan.tasks[stage].append(verse)
+        if limit and len(plan.verses) >= limit:
+            break
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the stage dependency table")
+    parser.add_argument("--downstream", help="List the stages that depend on this stage")
+    args = parser.parse_args()
+    if args.downstream:
+        print(" -> ".join(downstream(args.downstream)))
+        return
+    depth = levels(list(STAGES))
+    for stage in order():
+        spec = STAGES[stage]
+        modes = ", ".join(f"{m}={kind(stage, m)}" for m in spec.get("modes") or {}) or spec["kind"]
+        line = f"{depth[stage]}  {stage:<12} {spec['key']:<24} requires={','.join(spec.get('requires') or []) or '-'}"
+        if spec.get("uses"):
+            line += f" uses={','.join(spec['uses'])}"
+        print(f"{line} scope={spec['scope']} runner={spec['runner']} modes: {modes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import json
+import mmap
+import os
+import re
+
+# Byte-offset index over story_data.json.
+# Every writer in the pipeline emits the indent=2 layout, so a verse starts at a
+# line "  {" and ends at "  }", and its top-level keys are the lines that start
+# with exactly four spaces and a quote. Scanning for those markers (no JSON
+# parsing) gives per-verse and per-field spans; single fields can then be
+# decoded from the memory-mapped file without touching the rest of the verse.
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 1
+
+_MARK_RE = re.compile(rb'\n  (?:([{}]),?\r?(?=\n)|  "((?:[^"\\\r\n]|\\.)*)": )')
+_TRAILING = b" \t\r\n,"
+
+
+def index_path(data_file: str) -> str:
+    return f"{data_file}{INDEX_SUFFIX}"
+
+
+def _file_sig(data_file: str) -> list[int]:
+    st = os.stat(data_file)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _trim_end(mm, end: int) -> int:
+    while end > 0 and mm[end - 1] in _TRAILING:
+        end -= 1
+    return end
+
+
+def _scan(mm) -> list[dict] | None:
+    verses = []
+    current = None
+    last_key = None
+    for m in _MARK_RE.finditer(mm):
+        brace = m.group(1)
+        if brace == b"{":
+            if current is not None:
+                return None
+            current = {"start": m.start() + 3, "fields": {}}
+            last_key = None
+        elif brace == b"}":
+            if current is None:
+                return None
+            if last_key is not None:
+                current["fields"][last_key][1] = _trim_end(mm, m.start())
+            current["end"] = m.start() + 4
+            verses.append(current)
+            current = None
+        else:
+            if current is None:
+                return None
+            raw = m.group(2)
+            key = json.loads(b'"' + raw + b'"') if b"\\" in raw else raw.decode("utf-8")
+            if last_key is not None:
+                current["fields"][last_key][1] = _trim_end(mm, m.start())
+            current["fields"][key] = [m.end(), None]
+            last_key = key
+    if current is not None or not verses:
+        return None
+
+    for entry in verses:
+        span = entry["fields"].get("verse_id")
+        entry["verse_id"] = json.loads(mm[span[0]:span[1]]) if span else None
+
+    # Cheap sanity check: the outer ends must parse as complete verse objects.
+    try:
+        for entry in (verses[0], verses[-1]):
+            if not isinstance(json.loads(mm[entry["start"]:entry["end"]]), dict):
+                return None
+    except ValueError:
+        return None
+    return verses
+
+
+def build_index(data_file: str) -> list[dict] | None:
+    """Scans data_file; returns None when the file does not use the indent=2 layout."""
+    with open(data_file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            head = mm[:64].lstrip()
+            if not head.startswith(b"["):
+                return None
+            return _scan(mm)
+
+
+def load_index(data_file: str, use_cache: bool = True) -> list[dict] | None:
+    """
+    Returns the verse index of data_file, reusing the <file>.idx.json sidecar
+    while size and mtime still match.
+    """
+    sig = _file_sig(data_file)
+    path = index_path(data_file)
+    if use_cache and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == INDEX_VERSION and cached.get("sig") == sig:
+                return cached.get("verses")
+        except (OSError, ValueError):
+            pass
+
+    verses = build_index(data_file)
+    if verses is not None and use_cache:
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "sig": sig, "verses": verses}, f, ensure_ascii=False)
+        except OSError:
+            pass
+    return verses
+
+
+def _wanted(key: str, fields, exclude) -> bool:
+    if key == "verse_id":
+        return True
+    if fields is not None and key not in fields:
+        return False
+    return not (exclude and key in exclude)
+
+
+def project_verse(verse: dict, fields=None, exclude=None) -> dict:
+    if fields is None and not exclude:
+        return verse
+    return {k: v for k, v in verse.items() if _wanted(k, fields, exclude)}
+
+
+def read_verse(mm, entry: dict, fields=None, exclude=None) -> dict:
+    if fields is None and not exclude:
+        return json.loads(mm[entry["start"]:entry["end"]])
+    verse = {}
+    for key, (start, end) in entry["fields"].items():
+        if _wanted(key, fields, exclude):
+            verse[key] = json.loads(mm[start:end])
+    return verse
+
+
+def iter_verses(data_file: str, fields=None, exclude=None):
+    """
+    Yields verses of data_file, decoding only the requested top-level fields
+    ("verse_id" is always included). Falls back to a full json.load when the
+    file cannot be indexed.
+    """
+    verses = load_index(data_file)
+    if verses is None:
+        with open(data_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for verse in data:
+            yield project_verse(verse, fields, exclude)
+        return
+
+    with open(data_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for entry in verses:
+                yield read_verse(mm, entry, fields, exclude)
+
+
+def read_field(data_file: str, verse_id: str, key: str, default=None):
+    """Materializes a single field of one verse (e.g. base_chars) on demand."""
+    verses = load_index(data_file)
+    if verses is None:
+        for verse in iter_verses(data_file):
+            if verse.get("verse_id") == verse_id:
+                return verse.get(key, default)
+        return default
+    for entry in verses:
+        if entry.get("verse_id") != verse_id:
+            continue
+        span = entry["fields"].get(key)
+        if not span:
+            return default
+        with open(data_file, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return json.loads(mm[span[0]:span[1]])
+    return default
@@ -0,0 +1,274 @@
+import json
+import os
+import time
+import argparse
+
+try:
+    from .json_stream import write_compact, write_compact_items
+    from .story_index import iter_verses
+    from .char_columns import pack_verse, to_json
+except ImportError:
+    from json_stream import write_compact, write_compact_items
+    from story_index import iter_verses
+    from char_columns import pack_verse, to_json
+
+# Per-verse delta log that lives next to story_data.json.
+# Stages append small {verse_id, fields} records instead of rewriting the
+# whole corpus; `compact` folds the log back into the legacy JSON file.
+DELTA_SUFFIX = ".delta.jsonl"
+# Write-ahead log: one fsync'd record per successful LLM stage result.
+WAL_SUFFIX = ".wal.jsonl"
+# Delta rows and WAL records carry "seq" (time.time_ns() when appended); replay
+# merges both logs in write order, so the newest write of a field wins. The WAL
+# is only cleared at compaction, so an old WAL record can predate later deltas.
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
+
+
+def load_config():
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def delta_path(data_file: str) -> str:
+    return f"{data_file}{DELTA_SUFFIX}"
+
+
+def wal_path(data_file: str) -> str:
+    return f"{data_file}{WAL_SUFFIX}"
+
+
+def verse_delta(verse: dict, keys: list[str]) -> dict:
+    fields = {}
+    for key in keys:
+        if key in verse:
+            fields[key] = verse.get(key)
+    return {"verse_id": verse.get("verse_id"), "fields": fields}
+
+
+def append_deltas(data_file: str, deltas: list[dict]) -> int:
+    rows = [d for d in deltas or [] if d.get("verse_id") and d.get("fields")]
+    if not rows:
+        return 0
+    seq = time.time_ns()
+    with open(delta_path(data_file), "a", encoding="utf-8") as f:
+        for row in rows:
+            row = {**row, "seq": seq}
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=to_json) + "\n")
+    return len(rows)
+
+
+def wal_record(verse_id: str, stage: str, result_key: str, payload, state_id=None, model=None) -> dict:
+    return {
+        "verse_id": verse_id,
+        "stage": stage,
+        "result_key": result_key,
+        "payload": payload,
+        "state_id": state_id,
+        "model": model,
+        "at": int(time.time()),
+        "seq": time.time_ns(),
+    }
+
+
+def append_wal(data_file: str, record: dict) -> None:
+    """Appends one stage result and fsyncs before returning (crash-safe)."""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=to_json) + "\n"
+    with open(wal_path(data_file), "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_jsonl(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line after a crash; everything before it is intact.
+                continue
+            if isinstance(row, dict) and row.get("verse_id"):
+                rows.append(row)
+    return rows
+
+
+def read_wal(data_file: str) -> list[dict]:
+    """WAL records as delta rows: result field plus the stage's state id."""
+    rows = []
+    for rec in _read_jsonl(wal_path(data_file)):
+        key = rec.get("result_key")
+        if not key:
+            continue
+        row = {"verse_id": rec["verse_id"], "fields": {key: rec.get("payload")}}
+        # Records written before "seq" existed order by their timestamp.
+        row["seq"] = rec.get("seq") or int(rec.get("at") or 0) * 1_000_000_000
+        if rec.get("state_id") and rec.get("stage"):
+            state = {"id": rec["state_id"], "model": rec.get("model")}
+            if rec.get("at"):
+                state["at"] = rec["at"]
+            row["state"] = {rec["stage"]: state}
+        rows.append(row)
+    return rows
+
+
+def merge_logs(delta_rows: list[dict], wal_rows: list[dict]) -> list[dict]:
+    """Delta rows and WAL rows in write order (stable: rows without seq keep deltas-then-WAL order)."""
+    return sorted(delta_rows + wal_rows, key=lambda row: row.get("seq") or 0)
+
+
+def read_deltas(data_file: str, include_wal: bool = True) -> list[dict]:
+    rows = _read_jsonl(delta_path(data_file))
+    if include_wal:
+        rows = merge_logs(rows, read_wal(data_file))
+    return rows
+
+
+def _count_lines(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def pending_deltas(data_file: str) -> int:
+    return _count_lines(delta_path(data_file)) + _count_lines(wal_path(data_file))
+
+
+def clear_deltas(data_file: str) -> None:
+    """Drops delta log and WAL once their content is part of data_file."""
+    for path in (delta_path(data_file), wal_path(data_file)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def apply_delta(verse: dict, row: dict, fields=None, exclude=None) -> None:
+    for key, value in (row.get("fields") or {}).items():
+        if (fields is None or key in fields) and not (exclude and key in exclude):
+            verse[key] = value
+    state = row.get("state")
+    if state and (fields is None or "state_ids" in fields) and not (exclude and "state_ids" in exclude):
+        if not isinstance(verse.get("state_ids"), dict):
+            verse["state_ids"] = {}
+        verse["state_ids"].update(state)
+
+
+def replay_deltas(data: list, deltas: list[dict]) -> int:
+    if not deltas:
+        return 0
+    by_id: dict[str, list[dict]] = {}
+    for verse in data or []:
+        vid = verse.get("verse_id")
+        if vid:
+            by_id.setdefault(vid, []).append(verse)
+    applied = 0
+    for row in deltas:
+        targets = by_id.get(row.get("verse_id"))
+        if not targets:
+            continue
+        for verse in targets:
+            apply_delta(verse, row)
+        applied += 1
+    return applied
+
+
+def deltas_by_verse(data_file: str) -> dict[str, list[dict]]:
+    """Pending delta/WAL rows grouped by verse_id, in replay order."""
+    grouped: dict[str, list[dict]] = {}
+    for row in read_deltas(data_file):
+        grouped.setdefault(row["verse_id"], []).append(row)
+    return grouped
+
+
+def iter_story(data_file: str, fields=None, exclude=None, replay: bool = True, columnar: bool = False):
+    """
+    Streams verses from data_file with pending deltas applied.
+    fields/exclude project top-level keys ("verse_id" is always kept), so heavy
+    arrays like base_chars are never decoded unless asked for.
+    columnar=True packs base_chars/char_ids into char_columns views.
+    """
+    pending = deltas_by_verse(data_file) if replay else {}
+    for verse in iter_verses(data_file, fields=fields, exclude=exclude):
+        for row in pending.get(verse.get("verse_id"), ()):
+            apply_delta(verse, row, fields, exclude)
+        yield pack_verse(verse) if columnar else verse
+
+
+def load_story(data_file: str, replay: bool = True, fields=None, exclude=None, columnar: bool = False) -> list:
+    if fields is None and not exclude and not columnar:
+        with open(data_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if replay:
+            replay_deltas(data, read_deltas(data_file))
+        return data
+    return list(iter_story(data_file, fields=fields, exclude=exclude, replay=replay, columnar=columnar))
+
+
+def write_story_file(data: list, filepath: str) -> None:
+    # Streams the compact layout (one-line chars/words, inline int lists).
+    with open(filepath, "w", encoding="utf-8") as f:
+        write_compact(data, f, inline_int_lists=True, default=to_json)
+
+
+def rewrite_story(data_file: str, transform=None) -> int:
+    """
+    Streams data_file (deltas applied) verse by verse through transform and
+    writes the compact layout back, without holding the whole list in memory.
+    Returns the verse count.
+    """
+    temp = data_file + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        verses = iter_story(data_file)
+        if transform is not None:
+            verses = (transform(v) or v for v in verses)
+        count = write_compact_items(verses, f, inline_int_lists=True, default=to_json)
+    os.replace(temp, data_file)
+    clear_deltas(data_file)
+    return count
+
+
+def compact_story(data_file: str, data: list | None = None) -> int:
+    """
+    Folds pending deltas into data_file (legacy story_data.json layout).
+    Without data the file is rewritten as a stream.
+    Returns the number of delta records that were merged.
+    """
+    merged = pending_deltas(data_file)
+    if data is None:
+        rewrite_story(data_file)
+        return merged
+    temp = data_file + ".tmp"
+    write_story_file(data, temp)
+    os.replace(temp, data_file)
+    clear_deltas(data_file)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact the per-verse delta log of story_data.json")
+    parser.add_argument("command", choices=["status", "compact"], help="status: show pending deltas | compact: export to story_data.json")
+    parser.add_argument("--data-file", action="append", dest="data_files", help="Override story_data.json path (repeatable)")
+    args = parser.parse_args()
+
+    config = load_config()
+    default_data = os.path.join(os.path.dirname(__file__), config["files"]["data_file"])
+    data_files = args.data_files if args.data_files else [default_data]
+
+    for data_file in data_files:
+        if not os.path.exists(data_file):
+            print(f"Data file not found: {data_file}")
+            continue
+        if args.command == "status":
+            print(f"{data_file}: {pending_deltas(data_file)} pending records ({delta_path(data_file)}, {wal_path(data_file)})")
+            continue
+        merged = compact_story(data_file)
+        print(f"💾 Compacted {data_file} | deltas merged={merged}")
+
+
+if __name__ == "__main__":
+    main()
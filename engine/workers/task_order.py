@@ -0,0 +1,146 @@
+import time
+
+# Dispatch order for LLM work and a completion forecast.
+#   file        story order (default)
+#   sjf         shortest job first: cheapest estimated cost (prompt tokens +
+#               max_output_tokens) first, so hundreds of short verses are not
+#               stuck behind a few long ones
+#   interleave  cheapest first, but every `slots`-th dispatch takes the most
+#               expensive remaining task: long tasks start early without
+#               occupying every slot at the same time
+# Priority entries (chapters "5", ranges "1-5", verse ids "46:1") go first;
+# the order applies within the priority and the remaining tasks separately.
+ORDERS = ("file", "sjf", "interleave")
+
+
+def parse_priority(spec) -> list[str]:
+    """Comma-separated string or list -> list of entries ("1-5", "12", "46:1")."""
+    if not spec:
+        return []
+    if isinstance(spec, str):
+        spec = spec.split(",")
+    return [str(p).strip() for p in spec if str(p).strip()]
+
+
+def _chapter_of(verse: dict):
+    chapter = verse.get("chapter")
+    if chapter is None:
+        vid = str(verse.get("verse_id") or "")
+        chapter = vid.split(":", 1)[0] if ":" in vid else None
+    try:
+        return int(chapter)
+    except (TypeError, ValueError):
+        return None
+
+
+def matches_priority(verse: dict, entries: list[str]) -> bool:
+    if not entries:
+        return False
+    chapter = _chapter_of(verse)
+    vid = str(verse.get("verse_id") or "")
+    for entry in entries:
+        if ":" in entry:
+            if entry == vid:
+                return True
+            continue
+        low, _, high = entry.partition("-")
+        try:
+            low = int(low)
+            high = int(high) if high else low
+        except ValueError:
+            continue
+        if chapter is not None and low <= chapter <= high:
+            return True
+    return False
+
+
+def _ordered(items: list, costs: list[float], order: str, slots: int) -> list:
+    if order == "file" or len(items) < 2:
+        return list(items)
+    ranked = sorted(range(len(items)), key=lambda i: (costs[i], i))
+    if order == "sjf":
+        return [items[i] for i in ranked]
+    slots = max(2, int(slots or 2))
+    out = []
+    low, high = 0, len(ranked) - 1
+    while low <= high:
+        if len(out) % slots == 0:
+            out.append(items[ranked[high]])
+            high -= 1
+        else:
+            out.append(items[ranked[low]])
+            low += 1
+    return out
+
+
+def order_tasks(items: list, cost, order: str = "file", slots: int = 1, priority=None, verse_of=None) -> list:
+    """
+    Reorders work items. cost(item) -> estimated tokens; verse_of(item) -> the
+    verse used for priority matching (default: the item itself; a batch uses
+    its first verse).
+    """
+    entries = parse_priority(priority)
+    if order == "file" and not entries:
+        return list(items)
+    verse_of = verse_of or (lambda item: item[0] if isinstance(item, list) else item)
+    first = [it for it in items if matches_priority(verse_of(it), entries)]
+    marked = {id(it) for it in first}
+    rest = [it for it in items if id(it) not in marked]
+    out = []
+    for group in (first, rest):
+        out += _ordered(group, [cost(it) for it in group], order, slots)
+    return out
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class Forecast:
+    """
+    Projected completion from observed throughput: finished estimated cost per
+    wall-clock second gives the ETA of the remaining estimate; the tokens the
+    server reports (input + output) give the real tokens/sec.
+    """
+
+    def __init__(self, total_tasks: int, total_cost: float, every: int = 25, log=None):
+        self.total_tasks = total_tasks
+        self.total_cost = float(total_cost)
+        self.every = max(1, int(every or 25))
+        self.log = log or print
+        self.started = time.monotonic()
+        self.done_tasks = 0
+        self.done_cost = 0.0
+        self.server_tokens = 0
+
+    def observe_tokens(self, tokens: int) -> None:
+        self.server_tokens += int(tokens or 0)
+
+    def done(self, cost: float, tasks: int = 1) -> None:
+        self.done_tasks += tasks
+        self.done_cost += float(cost)
+        if self.done_tasks % self.every < tasks or self.done_tasks >= self.total_tasks:
+            self.log(self.line())
+
+    def eta(self) -> float | None:
+        elapsed = time.monotonic() - self.started
+        if self.done_cost <= 0 or elapsed <= 0:
+            return None
+        return max(0.0, self.total_cost - self.done_cost) / (self.done_cost / elapsed)
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        line = f"⏳ {self.done_tasks}/{self.total_tasks} tasks"
+        if self.total_cost:
+            line += f" ({self.done_cost / self.total_cost * 100:.0f}% of est. {int(self.total_cost)} tokens)"
+        if self.server_tokens and elapsed > 0:
+            line += f" | {self.server_tokens / elapsed:.0f} tok/s"
+        eta = self.eta()
+        if eta is not None and self.done_tasks < self.total_tasks:
+            line += f" | ETA {_duration(eta)} (~{time.strftime('%H:%M', time.localtime(time.time() + eta))})"
+        return line + f" | elapsed {_duration(elapsed)}"
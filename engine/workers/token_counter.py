@@ -0,0 +1,325 @@
+import json
+import os
+import re
+import time
+import argparse
+
+try:
+    from tokenizers import Tokenizer  # optional: exact counts from a local tokenizer.json
+except ImportError:
+    Tokenizer = None
+
+# Token counting for output budgets and context checks.
+#   tokenizer   a local tokenizer.json per model (processing.token_counter.tokenizer_files)
+#               gives exact counts when the `tokenizers` package is installed
+#   calibrated  otherwise chars are split into script classes (Ge'ez / Latin / other)
+#               and weighted with tokens-per-char learned from the input_tokens the
+#               server reports (ridge least squares, pulled towards the defaults,
+#               plus an intercept for the chat template); stored in calibration_file
+#   default     before enough samples exist: default_tokens_per_char per script
+# Stateful requests are not used for calibration (their input_tokens include the
+# whole previous conversation).
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "config.json")
+SCRIPTS = ("geez", "latin", "other")
+FEATURES = ("const",) + SCRIPTS
+DEFAULT_TOKENS_PER_CHAR = {"geez": 1.0, "latin": 0.3, "other": 0.5}
+PRIOR_WEIGHT = 500.0  # chars of pseudo-evidence per script behind the defaults
+SAVE_EVERY = 25
+
+_GEEZ_RE = re.compile("[\u1200-\u139f\u2d80-\u2ddf\uab00-\uab2f]")  # Ethiopic + Supplement + Extended-A
+_LATIN_RE = re.compile("[A-Za-z\u00c0-\u024f]")
+_INSTANCE_RE = re.compile(r":\d+$")
+
+
+def load_config():
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def counter_settings(cfg: dict | None = None) -> dict:
+    """Reads processing.token_counter (from config.json when cfg is None)."""
+    if cfg is None:
+        try:
+            cfg = load_config().get("processing", {}).get("token_counter", {})
+        except (OSError, ValueError):
+            cfg = {}
+    root = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    calibration_file = cfg.get("calibration_file", "cache/token_calibration.json")
+    if calibration_file and not os.path.isabs(calibration_file):
+        calibration_file = os.path.join(root, calibration_file)
+    files = {}
+    for model, path in (cfg.get("tokenizer_files") or {}).items():
+        files[model] = path if os.path.isabs(path) else os.path.join(root, path)
+    defaults = dict(DEFAULT_TOKENS_PER_CHAR)
+    defaults.update(cfg.get("default_tokens_per_char") or {})
+    return {
+        "enabled": bool(cfg.get("enabled", True)),
+        "calibrate": bool(cfg.get("calibrate", True)),
+        "calibration_file": calibration_file,
+        "tokenizer_files": files,
+        "defaults": defaults,
+        "min_samples": max(1, int(cfg.get("min_samples", 5))),
+        "safety_margin": float(cfg.get("safety_margin", 1.1)),
+    }
+
+
+def script_counts(text: str) -> dict:
+    text = text or ""
+    geez = len(_GEEZ_RE.findall(text))
+    latin = len(_LATIN_RE.findall(text))
+    return {"geez": geez, "latin": latin, "other": len(text) - geez - latin}
+
+
+def model_family(model: str | None) -> str:
+    """LM Studio instance ids ("name:2") share the tokenizer of "name"."""
+    return _INSTANCE_RE.sub("", model or "") or "default"
+
+
+def _solve(a: list[list[float]], b: list[float]) -> list[float] | None:
+    """Gaussian elimination with partial pivoting; None if singular."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col:
+                f = m[r][col] / m[col][col]
+                for c in range(col, n + 1):
+                    m[r][c] -= f * m[col][c]
+    return [m[i][n] / m[i][i] for i in range(n)]
+
+
+class Calibration:
+    """Per model family: normal equations of tokens ~ const + sum(chars[script] * w[script])."""
+
+    def __init__(self, defaults: dict, data: dict | None = None):
+        self.defaults = defaults
+        data = data or {}
+        size = len(FEATURES)
+        self.xtx = data.get("xtx") or [[0.0] * size for _ in range(size)]
+        self.xty = data.get("xty") or [0.0] * size
+        self.samples = int(data.get("samples", 0))
+        self.weights = data.get("weights")
+
+    def observe(self, counts: dict, tokens: int) -> None:
+        x = [1.0] + [float(counts[s]) for s in SCRIPTS]
+        for i in range(len(x)):
+            self.xty[i] += x[i] * tokens
+            for j in range(len(x)):
+                self.xtx[i][j] += x[i] * x[j]
+        self.samples += 1
+        self.weights = self._fit()
+
+    def _fit(self) -> dict | None:
+        # Ridge towards the defaults: (X'X + L) w = X'y + L w0 (intercept practically unpenalised).
+        lam = PRIOR_WEIGHT * PRIOR_WEIGHT
+        a = [row[:] for row in self.xtx]
+        b = self.xty[:]
+        for i, name in enumerate(FEATURES):
+            if name == "const":
+                a[i][i] += 1e-6
+                continue
+            a[i][i] += lam
+            b[i] += lam * float(self.defaults[name])
+        w = _solve(a, b)
+        if w is None:
+            return None
+        weights = {name: w[i] for i, name in enumerate(FEATURES)}
+        weights["const"] = max(0.0, weights["const"])
+        for name in SCRIPTS:
+            weights[name] = max(0.05, weights[name])
+        return weights
+
+    def to_json(self) -> dict:
+        return {"xtx": self.xtx, "xty": self.xty, "samples": self.samples, "weights": self.weights}
+
+
+class TokenCounter:
+    def __init__(self, settings: dict | None = None, log=None):
+        self.settings = settings or counter_settings()
+        self.log = log or print
+        self.tokenizers = {}
+        self.calibrations = {}
+        self.stats = {"tokenizer": 0, "calibrated": 0, "default": 0, "observed": 0}
+        self.errors = []
+        self._dirty = 0
+        self._load_calibration()
+
+    # -- sources --------------------------------------------------------------
+
+    def _tokenizer(self, family: str):
+        if family in self.tokenizers:
+            return self.tokenizers[family]
+        tok = None
+        files = self.settings["tokenizer_files"]
+        path = files.get(family) or files.get("default")
+        if path:
+            if Tokenizer is None:
+                self.log(f"⚠️ Tokenizer file configured for {family} but the 'tokenizers' package is not installed; using calibration.")
+            elif not os.path.exists(path):
+                self.log(f"⚠️ Tokenizer file not found: {path}")
+            else:
+                try:
+                    tok = Tokenizer.from_file(path)
+                except Exception as e:
+                    self.log(f"⚠️ Could not load tokenizer {path}: {e}")
+        self.tokenizers[family] = tok
+        return tok
+
+    def _calibration(self, family: str) -> Calibration:
+        if family not in self.calibrations:
+            self.calibrations[family] = Calibration(self.settings["defaults"])
+        return self.calibrations[family]
+
+    def _load_calibration(self) -> None:
+        path = self.settings["calibration_file"]
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for family, entry in (data.get("models") or {}).items():
+            self.calibrations[family] = Calibration(self.settings["defaults"], entry)
+
+    def save(self) -> None:
+        path = self.settings["calibration_file"]
+        if not path or not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = path + ".tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "models": {family: c.to_json() for family, c in self.calibrations.items()},
+                }, f, indent=2)
+            os.replace(temp, path)
+            self._dirty = 0
+        except OSError:
+            pass
+
+    # -- counting -------------------------------------------------------------
+
+    def source(self, model: str | None) -> str:
+        family = model_family(model)
+        if self._tokenizer(family) is not None:
+            return "tokenizer"
+        calib = self.calibrations.get(family)
+        if calib and calib.weights and calib.samples >= self.settings["min_samples"]:
+            return "calibrated"
+        return "default"
+
+    def count(self, text: str, model: str | None = None) -> int:
+        """Input tokens of `text` for `model` (a safety margin applies to estimates)."""
+        family = model_family(model)
+        tok = self._tokenizer(family)
+        if tok is not None:
+            self.stats["tokenizer"] += 1
+            return len(tok.encode(text or "", add_special_tokens=False).ids)
+        counts = script_counts(text)
+        calib = self.calibrations.get(family)
+        if calib and calib.weights and calib.samples >= self.settings["min_samples"]:
+            self.stats["calibrated"] += 1
+            w = calib.weights
+            estimate = w["const"] + sum(counts[s] * w[s] for s in SCRIPTS)
+        else:
+            self.stats["default"] += 1
+            estimate = sum(counts[s] * float(self.settings["defaults"][s]) for s in SCRIPTS)
+        return int(estimate * self.settings["safety_margin"]) + 1
+
+    def count_max(self, text: str, models: list[str]) -> int:
+        """Conservative count before the model is known (largest over the configured models)."""
+        families = {model_family(m) for m in models} or {"default"}
+        return max(self.count(text, f) for f in families)
+
+    def observe(self, model: str | None, text: str, tokens) -> None:
+        """Learns from the input_tokens the server reported for a fresh (non-stateful) request."""
+        if not self.settings["calibrate"] or not tokens or not text:
+            return
+        family = model_family(model)
+        calib = self._calibration(family)
+        counts = script_counts(text)
+        before = None
+        if calib.weights and calib.samples >= self.settings["min_samples"]:
+            before = calib.weights["const"] + sum(counts[s] * calib.weights[s] for s in SCRIPTS)
+        calib.observe(counts, int(tokens))
+        self.stats["observed"] += 1
+        if before is not None and before > 0:
+            self.errors.append(abs(before - int(tokens)) / float(tokens))
+        self._dirty += 1
+        if self._dirty >= SAVE_EVERY:
+            self.save()
+
+    def summary(self) -> str:
+        parts = [f"counts tokenizer={self.stats['tokenizer']} calibrated={self.stats['calibrated']} default={self.stats['default']}",
+                 f"observed={self.stats['observed']}"]
+        if self.errors:
+            parts.append(f"mean abs error={sum(self.errors) / len(self.errors) * 100:.1f}%")
+        for family, calib in sorted(self.calibrations.items()):
+            if calib.weights:
+                w = calib.weights
+                parts.append(
+                    f"{family}: n={calib.samples} tok/char geez={w['geez']:.3f} latin={w['latin']:.3f} "
+                    f"other={w['other']:.3f} const={w['const']:.0f}"
+                )
+        return " | ".join(parts)
+
+
+def server_input_tokens(result: dict):
+    """input_tokens from an LM Studio /api/v1/chat ("stats") or OpenAI-style ("usage") response."""
+    if not isinstance(result, dict):
+        return None
+    stats = result.get("stats") or {}
+    usage = result.get("usage") or {}
+    return stats.get("input_tokens") or usage.get("input_tokens") or usage.get("prompt_tokens")
+
+
+def server_output_tokens(result: dict):
+    """Generated tokens from an LM Studio ("stats") or OpenAI-style ("usage") response."""
+    if not isinstance(result, dict):
+        return None
+    stats = result.get("stats") or {}
+    usage = result.get("usage") or {}
+    return (stats.get("total_output_tokens") or stats.get("output_tokens")
+            or usage.get("output_tokens") or usage.get("completion_tokens"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the token counter calibration or count a file")
+    parser.add_argument("command", choices=["stats", "count", "reset"], help="stats | count FILE | reset (drop calibration)")
+    parser.add_argument("path", nargs="?", help="Text file for count")
+    parser.add_argument("--model", help="Model identifier (default: first configured model)")
+    args = parser.parse_args()
+
+    counter = TokenCounter()
+    if args.command == "reset":
+        path = counter.settings["calibration_file"]
+        if path and os.path.exists(path):
+            os.remove(path)
+        print(f"🧹 Removed {path}")
+        return
+    if args.command == "count":
+        if not args.path:
+            parser.error("count needs a file path")
+        model = args.model
+        if not model:
+            try:
+                model = (load_config().get("models") or [None])[0]
+            except (OSError, ValueError):
+                model = None
+        with open(args.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        counts = script_counts(text)
+        print(f"{args.path}: {counter.count(text, model)} tokens ({counter.source(model)}, model={model_family(model)}) "
+              f"chars geez={counts['geez']} latin={counts['latin']} other={counts['other']}")
+        return
+    print(f"{counter.settings['calibration_file']}: {counter.summary()}")
+
+
+if __name__ == "__main__":
+    main()